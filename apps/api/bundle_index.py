@@ -0,0 +1,91 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from bundle_schema import SORT_COLUMNS, unpack_payload
+from snapshots import content_etag
+
+Render = Callable[[List[dict]], bytes]
+
+
+class BundleIndex:
+    def __init__(self, path: str = "bundles/registry.db", max_pages: int = 64):
+        self.path = Path(path)
+        self.max_pages = max_pages
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_path: Optional[Path] = None
+        self._version: Optional[int] = None
+        self._pages: "OrderedDict[tuple, Tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None and self._conn_path == self.path:
+            return self._conn
+        self.close()
+        if not self.path.exists():
+            return None
+        # Read-only and long-lived: PRAGMA data_version only moves for commits made by other connections.
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn_path = self.path
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = self._conn_path = None
+        self._pages.clear()
+
+    def rendered_page(
+        self,
+        render: Render,
+        sort: str = "created_at",
+        descending: bool = True,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> Tuple[bytes, str]:
+        # Bodies and ETags are cached per registry version, so unchanged pages skip SQLite and pydantic.
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {SORT_COLUMNS}")
+        key = (sort, descending, limit, offset)
+        with self._lock:
+            conn = self._connection()
+            version = conn.execute("PRAGMA data_version").fetchone()[0] if conn is not None else None
+            if version != self._version:
+                self._pages.clear()
+                self._version = version
+            cached = self._pages.get(key)
+            if cached is not None:
+                self._pages.move_to_end(key)
+                return cached
+            body = render(self._rows(conn, sort, descending, limit, offset))
+            cached = self._pages[key] = (body, content_etag("bundles", body))
+            if len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+            return cached
+
+    @staticmethod
+    def _rows(
+        conn: Optional[sqlite3.Connection], sort: str, descending: bool, limit: int, offset: int
+    ) -> List[dict]:
+        if conn is None:
+            return []
+        direction = "DESC" if descending else "ASC"
+        # Only the requested page's payloads are loaded.
+        rows = conn.execute(
+            "SELECT b.bundle_id, b.name, b.created_at, b.active, p.body FROM bundles b"
+            " JOIN payloads p ON p.hash = b.payload_hash"
+            f" ORDER BY b.{sort} {direction}, b.bundle_id {direction} LIMIT ? OFFSET ?",
+            (limit, offset),
+        ).fetchall()
+        return [
+            {
+                "bundle_id": bundle_id,
+                "name": name,
+                "created_at": created_at,
+                "active": bool(active),
+                **unpack_payload(body),
+            }
+            for bundle_id, name, created_at, active, body in rows
+        ]
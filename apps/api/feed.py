@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from datetime import timezone
+from typing import AsyncIterable, AsyncIterator, Dict, List, Sequence
+
+import msgpack
+import numpy as np
+from redis.exceptions import RedisError
+
+from hub import BroadcastHub
+from snapshots import SnapshotStore
+from wire_schema import CHANNEL, FULL, RESOURCE_KEYS, decode
+
+logger = logging.getLogger(__name__)
+
+
+def _values(column: Sequence) -> list:
+    if not isinstance(column, np.ndarray):
+        return list(column)
+    if column.dtype.kind == "M":
+        return [value.replace(tzinfo=timezone.utc) for value in column.astype("datetime64[us]").tolist()]
+    return column.tolist()
+
+
+def table_records(table: Dict[str, Sequence]) -> List[dict]:
+    columns = [_values(column) for column in table.values()]
+    return [dict(zip(table, row)) for row in zip(*columns)]
+
+
+class SnapshotFeed:
+    def __init__(self, snapshots: SnapshotStore, hub: BroadcastHub):
+        self.snapshots = snapshots
+        self.topics = {"candidates": hub.candidates, "positions": hub.positions}
+        self.seq: Dict[str, int] = {}
+        self.gaps = 0
+        self._books: Dict[str, Dict[str, dict]] = {}
+
+    def apply(self, frame: bytes) -> bool:
+        message = decode(frame)
+        kind, resource, seq, data = message.kind, message.resource, message.seq, message.data
+        key = RESOURCE_KEYS.get(resource)
+        if key is None:
+            self.snapshots.update(resource, data)
+            self.seq[resource] = seq
+            return True
+
+        records = table_records(data)
+        removed = message.removed
+        if kind == FULL:
+            self._books[resource] = {record[key]: record for record in records}
+        elif self.seq.get(resource) != seq - 1:
+            # A missed delta cannot be patched; hold the last good snapshot until the next full frame.
+            self.gaps += 1
+            return False
+        else:
+            book = self._books[resource]
+            book.update((record[key], record) for record in records)
+            for name in removed:
+                book.pop(name, None)
+        self.seq[resource] = seq
+        self.snapshots.update(resource, list(self._books[resource].values()))
+        topic = self.topics.get(resource)
+        if topic is not None:
+            topic.publish(records, replace=kind == FULL, removed=removed)
+        return True
+
+    async def run(self, frames: AsyncIterable[bytes]) -> None:
+        async for frame in frames:
+            try:
+                self.apply(frame)
+            except (ValueError, KeyError, TypeError, msgpack.UnpackException):
+                logger.exception("dropping malformed snapshot frame")
+
+    async def follow_redis(self, url: str, channel: str = CHANNEL, retry_delay: float = 1.0) -> None:
+        while True:
+            try:
+                await self.run(redis_frames(url, channel))
+            except (OSError, RedisError) as exc:
+                logger.warning("snapshot feed disconnected (%s); retrying in %.1fs", exc, retry_delay)
+            await asyncio.sleep(retry_delay)
+
+
+async def redis_frames(url: str, channel: str = CHANNEL) -> AsyncIterator[bytes]:
+    from redis import asyncio as redis_asyncio
+
+    client = redis_asyncio.from_url(url)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    try:
+        await pubsub.subscribe(channel)
+        async for message in pubsub.listen():
+            yield message["data"]
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
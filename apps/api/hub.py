@@ -0,0 +1,112 @@
+import asyncio
+import json
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _encode(message: dict) -> str:
+    return json.dumps(message, default=_json_default, separators=(",", ":"))
+
+
+class Topic:
+    def __init__(self, key_field: str = "ticker", history: int = 256):
+        self.key_field = key_field
+        self.items: Dict[str, dict] = {}
+        self.seq = 0
+        self.resyncs = 0
+        self.subscribers = 0
+        self._log: Deque[Tuple[int, str]] = deque(maxlen=history)
+        self._changed = asyncio.Event()
+        self._snapshot: Optional[Tuple[int, str]] = None
+
+    def snapshot_message(self) -> str:
+        if self._snapshot is None or self._snapshot[0] != self.seq:
+            message = {"type": "snapshot", "seq": self.seq, "data": list(self.items.values())}
+            self._snapshot = (self.seq, _encode(message))
+        return self._snapshot[1]
+
+    def publish(self, items: Iterable[dict], replace: bool = False, removed: Iterable[str] = ()) -> bool:
+        upserts: List[dict] = []
+        seen = set()
+        for item in items:
+            key = item[self.key_field]
+            seen.add(key)
+            if self.items.get(key) != item:
+                self.items[key] = item
+                upserts.append(item)
+        gone = [key for key in removed if key in self.items]
+        if replace:
+            gone.extend(key for key in self.items if key not in seen)
+        for key in gone:
+            del self.items[key]
+        if not upserts and not gone:
+            return False
+
+        # One encode per tick regardless of how many clients are connected.
+        self.seq += 1
+        message = {"type": "delta", "seq": self.seq, "upserts": upserts, "removed": gone}
+        self._log.append((self.seq, _encode(message)))
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        return True
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        self.subscribers += 1
+        try:
+            cursor = self.seq
+            yield self.snapshot_message()
+            while True:
+                changed = self._changed
+                if cursor == self.seq:
+                    await changed.wait()
+                    continue
+                if not self._log or self._log[0][0] > cursor + 1:
+                    # The client fell further behind than the retained history: conflate to a snapshot.
+                    self.resyncs += 1
+                    cursor = self.seq
+                    yield self.snapshot_message()
+                    continue
+                for seq, message in list(self._log):
+                    if seq > cursor:
+                        cursor = seq
+                        yield message
+        finally:
+            self.subscribers -= 1
+
+
+class BroadcastHub:
+    def __init__(self, history: int = 256, send_timeout: float = 5.0):
+        self.send_timeout = send_timeout
+        self.candidates = Topic("ticker", history)
+        self.positions = Topic("ticker", history)
+
+    async def stream(self, socket: WebSocket, topic: Topic) -> None:
+        await socket.accept()
+
+        async def send() -> None:
+            async for message in topic.subscribe():
+                # A client that cannot take a message in time is dropped instead of holding others back.
+                await asyncio.wait_for(socket.send_text(message), self.send_timeout)
+
+        async def receive() -> None:
+            while True:
+                await socket.receive_text()
+
+        tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await socket.close()
+            except (RuntimeError, WebSocketDisconnect):
+                pass
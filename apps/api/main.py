@@ -1,13 +1,47 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime
 
-import httpx
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import TypeAdapter
 
+from bundle_index import SORT_COLUMNS, BundleIndex
+from feed import SnapshotFeed
+from hub import BroadcastHub
 from schemas import Bundle, Candidate, Order, Position, RiskState
+from snapshots import create_snapshot_store, etag_response
+from telemetry import Telemetry
+from upstream import TTLCache, check_alpaca, create_http_client
 
-app = FastAPI(title="Stock Predictor API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.http = create_http_client()
+    app.state.alpaca_health = TTLCache(
+        ttl=float(os.getenv("HEALTH_CACHE_TTL", "15")),
+        loader=lambda: check_alpaca(app.state.http),
+    )
+    redis_url = os.getenv("REDIS_URL")
+    feed_task = asyncio.create_task(feed.follow_redis(redis_url)) if redis_url else None
+    try:
+        yield
+    finally:
+        if feed_task is not None:
+            feed_task.cancel()
+        await app.state.http.aclose()
+
+
+app = FastAPI(title="Stock Predictor API", lifespan=lifespan)
+hub = BroadcastHub()
+snapshots = create_snapshot_store()
+feed = SnapshotFeed(snapshots, hub)
+bundle_index = BundleIndex(os.getenv("BUNDLE_REGISTRY", "bundles/registry.db"))
+bundle_list = TypeAdapter(list[Bundle])
+telemetry = Telemetry(hub, snapshots, feed, enabled=os.getenv("API_METRICS", "true").lower() != "false")
+
+app.middleware("http")(telemetry.middleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,77 +53,67 @@ app.add_middleware(
 
 
 @app.get("/health")
-async def health():
+async def health(request: Request):
     return {
         "status": "ok",
         "timestamp": datetime.utcnow(),
-        "alpaca": await alpaca_health(),
+        "alpaca": await request.app.state.alpaca_health.get(),
     }
 
 
 @app.get("/health/alpaca")
-async def alpaca_health():
-    base_url = os.getenv("ALPACA_BASE_URL", "https://paper-api.alpaca.markets")
-    api_key = os.getenv("ALPACA_API_KEY")
-    api_secret = os.getenv("ALPACA_API_SECRET")
-    if not api_key or not api_secret:
-        return {"status": "missing_keys"}
-
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        try:
-            resp = await client.get(
-                f"{base_url}/v2/account",
-                headers={
-                    "APCA-API-KEY-ID": api_key,
-                    "APCA-API-SECRET-KEY": api_secret,
-                },
-            )
-            return {"status": "ok" if resp.status_code == 200 else "error", "code": resp.status_code}
-        except httpx.RequestError:
-            return {"status": "unreachable"}
+async def alpaca_health(request: Request):
+    return await request.app.state.alpaca_health.get()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return telemetry.response()
 
 
 @app.get("/candidates", response_model=list[Candidate])
-async def list_candidates():
-    return []
+async def list_candidates(request: Request):
+    return snapshots.response("candidates", request)
 
 
 @app.get("/positions", response_model=list[Position])
-async def list_positions():
-    return []
+async def list_positions(request: Request):
+    return snapshots.response("positions", request)
 
 
 @app.get("/orders", response_model=list[Order])
-async def list_orders():
-    return []
+async def list_orders(request: Request):
+    return snapshots.response("orders", request)
 
 
 @app.get("/risk", response_model=RiskState)
-async def risk_state():
-    return RiskState(
-        equity=0,
-        gross_exposure=0,
-        max_positions=10,
-        daily_loss_limit=0.03,
-        drawdown_limit=0.1,
-        circuit_breaker_tripped=False,
-    )
+async def risk_state(request: Request):
+    return snapshots.response("risk", request)
+
+
+def render_bundles(rows: list) -> bytes:
+    return bundle_list.dump_json(bundle_list.validate_python(rows))
 
 
 @app.get("/bundles", response_model=list[Bundle])
-async def list_bundles():
-    return []
+def list_bundles(
+    request: Request,
+    sort: str = "created_at",
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    if sort not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {SORT_COLUMNS}")
+    body, etag = bundle_index.rendered_page(render_bundles, sort, order == "desc", limit, offset)
+    return etag_response(body, etag, request)
 
 
 @app.websocket("/ws/candidates")
 async def ws_candidates(socket: WebSocket):
-    await socket.accept()
-    await socket.send_json({"type": "snapshot", "data": []})
-    await socket.close()
+    await hub.stream(socket, hub.candidates)
 
 
 @app.websocket("/ws/positions")
 async def ws_positions(socket: WebSocket):
-    await socket.accept()
-    await socket.send_json({"type": "snapshot", "data": []})
-    await socket.close()
+    await hub.stream(socket, hub.positions)
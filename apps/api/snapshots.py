@@ -0,0 +1,82 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from schemas import Candidate, Order, Position, RiskState
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    body: bytes
+    etag: str
+
+
+def content_etag(name: str, body: bytes) -> str:
+    return '"' + name + "-" + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def etag_response(body: bytes, etag: str, request: Request) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+class SnapshotStore:
+    def __init__(self):
+        self._adapters: Dict[str, TypeAdapter] = {}
+        self._snapshots: Dict[str, Snapshot] = {}
+
+    def register(self, name: str, schema: Any, initial: Any) -> None:
+        self._adapters[name] = TypeAdapter(schema)
+        self._snapshots.pop(name, None)
+        self.update(name, initial)
+
+    def update(self, name: str, value: Any) -> Snapshot:
+        adapter = self._adapters[name]
+        # Validate and serialize once per version; reads only copy bytes.
+        body = adapter.dump_json(adapter.validate_python(value))
+        current = self._snapshots.get(name)
+        if current is not None and current.body == body:
+            return current
+        snapshot = Snapshot(0 if current is None else current.version + 1, body, content_etag(name, body))
+        self._snapshots[name] = snapshot
+        return snapshot
+
+    def get(self, name: str) -> Snapshot:
+        return self._snapshots[name]
+
+    def response(self, name: str, request: Request) -> Response:
+        snapshot = self._snapshots[name]
+        return etag_response(snapshot.body, snapshot.etag, request)
+
+
+def create_snapshot_store() -> SnapshotStore:
+    store = SnapshotStore()
+    store.register("candidates", list[Candidate], [])
+    store.register("positions", list[Position], [])
+    store.register("orders", list[Order], [])
+    store.register(
+        "risk",
+        RiskState,
+        RiskState(
+            equity=0,
+            gross_exposure=0,
+            max_positions=10,
+            daily_loss_limit=0.03,
+            drawdown_limit=0.1,
+            circuit_breaker_tripped=False,
+        ),
+    )
+    return store
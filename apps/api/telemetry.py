@@ -0,0 +1,67 @@
+import time
+from typing import Awaitable, Callable
+
+from fastapi import Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from feed import SnapshotFeed
+from hub import BroadcastHub
+from snapshots import SnapshotStore
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class StateCollector:
+    # Read at scrape time so the publish and request paths carry no metric updates.
+    def __init__(self, hub: BroadcastHub, snapshots: SnapshotStore, feed: SnapshotFeed):
+        self.topics = {"candidates": hub.candidates, "positions": hub.positions}
+        self.snapshots = snapshots
+        self.feed = feed
+
+    def collect(self):
+        subscribers = GaugeMetricFamily("ws_subscribers", "Connected websocket clients", labels=["topic"])
+        resyncs = CounterMetricFamily("ws_resyncs", "Slow clients conflated to a snapshot", labels=["topic"])
+        topic_seq = GaugeMetricFamily("ws_topic_seq", "Deltas published per topic", labels=["topic"])
+        for name, topic in self.topics.items():
+            subscribers.add_metric([name], topic.subscribers)
+            resyncs.add_metric([name], topic.resyncs)
+            topic_seq.add_metric([name], topic.seq)
+        versions = GaugeMetricFamily("snapshot_version", "Current serialized snapshot version", labels=["resource"])
+        for name in ("candidates", "positions", "orders", "risk"):
+            versions.add_metric([name], self.snapshots.get(name).version)
+        frames = GaugeMetricFamily("feed_seq", "Last applied worker frame sequence", labels=["resource"])
+        for name, seq in self.feed.seq.items():
+            frames.add_metric([name], seq)
+        gaps = CounterMetricFamily("feed_gaps", "Worker deltas dropped after a sequence gap")
+        gaps.add_metric([], self.feed.gaps)
+        return [subscribers, resyncs, topic_seq, versions, frames, gaps]
+
+
+class Telemetry:
+    def __init__(self, hub: BroadcastHub, snapshots: SnapshotStore, feed: SnapshotFeed, enabled: bool = True):
+        self.enabled = enabled
+        self.registry = CollectorRegistry()
+        self.requests = Histogram(
+            "http_request_seconds",
+            "Request handling time by route",
+            ["method", "route", "status"],
+            buckets=LATENCY_BUCKETS,
+            registry=self.registry,
+        )
+        self.registry.register(StateCollector(hub, snapshots, feed))
+
+    async def middleware(self, request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+        if not self.enabled:
+            return await call_next(request)
+        started = time.perf_counter()
+        response = await call_next(request)
+        # Label by route template, not raw path, to keep series bounded.
+        route = request.scope.get("route")
+        self.requests.labels(request.method, getattr(route, "path", "unmatched"), str(response.status_code)).observe(
+            time.perf_counter() - started
+        )
+        return response
+
+    def response(self) -> Response:
+        return Response(generate_latest(self.registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,62 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+
+class TTLCache(Generic[T]):
+    def __init__(self, ttl: float, loader: Callable[[], Awaitable[T]]):
+        self.ttl = ttl
+        self._loader = loader
+        self._value: Optional[T] = None
+        self._expires = 0.0
+        self._inflight: Optional[asyncio.Future] = None
+
+    async def get(self) -> T:
+        if self._value is not None and time.monotonic() < self._expires:
+            return self._value
+        # Single flight: concurrent callers share one refresh.
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh())
+        return await asyncio.shield(self._inflight)
+
+    async def _refresh(self) -> T:
+        try:
+            value = await self._loader()
+            self._value = value
+            self._expires = time.monotonic() + self.ttl
+            return value
+        finally:
+            self._inflight = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=5.0,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60.0),
+    )
+
+
+async def check_alpaca(client: httpx.AsyncClient) -> dict:
+    base_url = os.getenv("ALPACA_BASE_URL", "https://paper-api.alpaca.markets")
+    api_key = os.getenv("ALPACA_API_KEY")
+    api_secret = os.getenv("ALPACA_API_SECRET")
+    if not api_key or not api_secret:
+        return {"status": "missing_keys"}
+
+    try:
+        resp = await client.get(
+            f"{base_url}/v2/account",
+            headers={
+                "APCA-API-KEY-ID": api_key,
+                "APCA-API-SECRET-KEY": api_secret,
+            },
+        )
+        return {"status": "ok" if resp.status_code == 200 else "error", "code": resp.status_code}
+    except httpx.RequestError:
+        return {"status": "unreachable"}
@@ -0,0 +1 @@
+"""Code shared by the worker and the API."""
@@ -0,0 +1,18 @@
+import hashlib
+import json
+import zlib
+from typing import Tuple
+
+# Columns of the registry's bundles table that listings may sort by; each one has an index.
+METRIC_COLUMNS = ("sharpe", "max_drawdown", "trades", "win_rate")
+SORT_COLUMNS = ("created_at", "name") + METRIC_COLUMNS + ("holdout_sharpe",)
+
+
+def pack_payload(payload: dict) -> Tuple[str, bytes]:
+    # Canonical JSON so identical payloads share one content-addressed row.
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=float).encode()
+    return hashlib.sha256(body).hexdigest(), zlib.compress(body)
+
+
+def unpack_payload(body: bytes) -> dict:
+    return json.loads(zlib.decompress(body))
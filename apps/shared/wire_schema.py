@@ -0,0 +1,78 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import msgpack
+import numpy as np
+
+# Frame layout: [SCHEMA_VERSION, kind, resource, seq, data] plus the removed keys for a DELTA.
+SCHEMA_VERSION = 1
+FULL = 0
+DELTA = 1
+ARRAY_EXT = 1
+CHANNEL = "snapshots"
+
+# Row key per table resource; None marks a resource sent whole as a plain dict.
+RESOURCE_KEYS: Dict[str, Optional[str]] = {
+    "candidates": "ticker",
+    "positions": "ticker",
+    "orders": "order_id",
+    "risk": None,
+}
+
+
+@dataclass
+class SnapshotFrame:
+    kind: int
+    resource: str
+    seq: int
+    data: Any
+    removed: List[str] = field(default_factory=list)
+
+
+def as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind in "OUS":
+            return value.tolist()
+        # Numeric columns travel as one raw buffer: [dtype length][dtype][bytes].
+        dtype = value.dtype.str.encode()
+        return msgpack.ExtType(ARRAY_EXT, bytes([len(dtype)]) + dtype + np.ascontiguousarray(value).tobytes())
+    if isinstance(value, datetime):
+        return as_utc(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"cannot encode {type(value).__name__}")
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code != ARRAY_EXT:
+        return msgpack.ExtType(code, data)
+    size = data[0]
+    return np.frombuffer(data, dtype=np.dtype(data[1 : 1 + size].decode()), offset=1 + size)
+
+
+def _pack(payload: list) -> bytes:
+    return msgpack.packb(payload, default=_default, datetime=True)
+
+
+def encode_full(resource: str, seq: int, data: Any) -> bytes:
+    return _pack([SCHEMA_VERSION, FULL, resource, seq, data])
+
+
+def encode_delta(resource: str, seq: int, upserts: Any, removed: Sequence[str]) -> bytes:
+    return _pack([SCHEMA_VERSION, DELTA, resource, seq, upserts, list(removed)])
+
+
+def decode(frame: Union[bytes, bytearray]) -> SnapshotFrame:
+    message = msgpack.unpackb(frame, ext_hook=_ext_hook, timestamp=3, use_list=False)
+    if message[0] != SCHEMA_VERSION:
+        raise ValueError(f"unsupported snapshot schema version {message[0]}")
+    _, kind, resource, seq, data = message[:5]
+    return SnapshotFrame(kind, resource, seq, data, message[5] if kind == DELTA else [])
@@ -1,19 +1,38 @@
 import asyncio
 import hashlib
+import inspect
 import json
-from typing import Any, Dict, Optional
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Union
+from zoneinfo import ZoneInfo
 
 import httpx
 
+import instrumentation
 from config import Settings
-from rate_limiter import TokenBucket, with_retry
+from rate_limiter import RETRYABLE_STATUS, Priority, TokenBucket, with_retry
+
+MARKET_TZ = ZoneInfo("America/New_York")
+
+BarPage = Dict[str, List[Dict[str, Any]]]
+BarConsumer = Callable[[BarPage], Union[Awaitable[None], None]]
+
+
+def session_date(moment: Optional[datetime] = None) -> str:
+    return (moment or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ).date().isoformat()
 
 
 class AlpacaClient:
-    def __init__(self, settings: Settings):
+    def __init__(
+        self,
+        settings: Settings,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        bucket: Optional[TokenBucket] = None,
+    ):
         self.settings = settings
-        self._bucket = TokenBucket(rate_per_minute=200)
-        self._client = httpx.AsyncClient(timeout=10.0)
+        self._bucket = bucket or TokenBucket(rate_per_minute=200)
+        self._client = httpx.AsyncClient(timeout=10.0, transport=transport)
 
     async def _headers(self) -> Dict[str, str]:
         return {
@@ -22,34 +41,133 @@ class AlpacaClient:
             "Content-Type": "application/json",
         }
 
-    async def _request(self, method: str, path: str, payload: Optional[dict] = None):
-        limit = await self._bucket.acquire()
-        if not limit.allowed:
-            await asyncio.sleep(limit.wait_time)
-        url = f"{self.settings.alpaca_base_url}{path}"
-        return await with_retry(
-            self._client.request,
-            method,
-            url,
-            headers=await self._headers(),
-            json=payload,
-        )
-
-    def build_idempotency_key(self, order: Dict[str, Any]) -> str:
-        payload = json.dumps(order, sort_keys=True)
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        payload: Optional[dict] = None,
+        params: Optional[dict] = None,
+        base_url: Optional[str] = None,
+        priority: Priority = Priority.DEFAULT,
+    ):
+        url = f"{base_url or self.settings.alpaca_base_url}{path}"
+        headers = await self._headers()
+
+        async def send() -> httpx.Response:
+            # Every attempt, including retries, spends a rate-limit token.
+            await self._bucket.acquire(priority)
+            started = time.perf_counter()
+            try:
+                response = await self._client.request(method, url, headers=headers, json=payload, params=params)
+            except Exception:
+                instrumentation.observe(instrumentation.REQUEST_SECONDS, time.perf_counter() - started, method, "error")
+                raise
+            instrumentation.observe(
+                instrumentation.REQUEST_SECONDS, time.perf_counter() - started, method, str(response.status_code)
+            )
+            if response.status_code in RETRYABLE_STATUS:
+                response.raise_for_status()
+            return response
+
+        return await with_retry(send)
+
+    def build_idempotency_key(self, order: Dict[str, Any], session: Optional[str] = None) -> str:
+        # Scoped to the trading session so the same bracket on a later day is a new order.
+        payload = json.dumps({"order": order, "session": session or session_date()}, sort_keys=True)
         return hashlib.sha256(payload.encode()).hexdigest()
 
-    async def submit_order(self, order: Dict[str, Any]) -> Dict[str, Any]:
-        idempotency_key = self.build_idempotency_key(order)
-        payload = {**order, "client_order_id": idempotency_key}
-        response = await self._request("POST", "/v2/orders", payload)
+    async def submit_order(self, order: Dict[str, Any], client_order_id: Optional[str] = None) -> Dict[str, Any]:
+        payload = {**order, "client_order_id": client_order_id or self.build_idempotency_key(order)}
+        response = await self._request("POST", "/v2/orders", payload, priority=Priority.ORDERS)
         response.raise_for_status()
         return response.json()
 
+    async def cancel_order(self, order_id: str) -> None:
+        response = await self._request("DELETE", f"/v2/orders/{order_id}", priority=Priority.ORDERS)
+        response.raise_for_status()
+
     async def get_account(self) -> Dict[str, Any]:
         response = await self._request("GET", "/v2/account")
         response.raise_for_status()
         return response.json()
 
+    async def list_orders(
+        self, status: str = "open", after: Optional[str] = None, limit: int = 500
+    ) -> List[Dict[str, Any]]:
+        params: Dict[str, Any] = {"status": status, "limit": limit, "direction": "asc"}
+        if after:
+            params["after"] = after
+        response = await self._request("GET", "/v2/orders", params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def list_positions(self) -> List[Dict[str, Any]]:
+        response = await self._request("GET", "/v2/positions")
+        response.raise_for_status()
+        return response.json()
+
+    async def iter_bars(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        start: str,
+        end: Optional[str] = None,
+        limit: int = 10000,
+    ) -> AsyncIterator[BarPage]:
+        params = {"symbols": ",".join(symbols), "timeframe": timeframe, "start": start, "limit": limit}
+        if end:
+            params["end"] = end
+        while True:
+            response = await self._request(
+                "GET",
+                "/v2/stocks/bars",
+                params=params,
+                base_url=self.settings.alpaca_data_url,
+                priority=Priority.BULK,
+            )
+            response.raise_for_status()
+            body = response.json()
+            yield body.get("bars") or {}
+            token = body.get("next_page_token")
+            if not token:
+                return
+            params = {**params, "page_token": token}
+
+    async def fetch_bars_bulk(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        start: str,
+        consumer: BarConsumer,
+        end: Optional[str] = None,
+        chunk_size: int = 100,
+        concurrency: int = 4,
+        limit: int = 10000,
+    ) -> int:
+        chunks: asyncio.Queue = asyncio.Queue()
+        for idx in range(0, len(symbols), chunk_size):
+            chunks.put_nowait(list(symbols[idx : idx + chunk_size]))
+        delivered = 0
+
+        async def drain() -> None:
+            nonlocal delivered
+            while not chunks.empty():
+                chunk = chunks.get_nowait()
+                async for page in self.iter_bars(chunk, timeframe, start, end, limit):
+                    delivered += sum(len(bars) for bars in page.values())
+                    result = consumer(page)
+                    if inspect.isawaitable(result):
+                        await result
+
+        drains = [asyncio.create_task(drain()) for _ in range(max(1, min(concurrency, chunks.qsize())))]
+        try:
+            await asyncio.gather(*drains)
+        finally:
+            # A failed drain stops its siblings, and none outlives this call (the caller may close the client next).
+            for task in drains:
+                task.cancel()
+            await asyncio.gather(*drains, return_exceptions=True)
+        return delivered
+
     async def close(self):
         await self._client.aclose()
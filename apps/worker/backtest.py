@@ -0,0 +1,163 @@
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import numpy as np
+
+from research import MINUTE_BARS_PER_YEAR, performance_metrics
+
+EXIT_NONE = 0
+EXIT_STOP = 1
+EXIT_TARGET = 2
+EXIT_TIME = 3
+
+AMBIGUITY_RULES = ("stop", "target", "nearest")
+
+
+@dataclass
+class BacktestConfig:
+    entry_window: int = 390
+    max_hold: int = 390
+    ambiguity: str = "stop"
+    slippage_bps: float = 1.0
+    commission_per_share: float = 0.0
+    chunk_size: int = 4096
+
+
+@dataclass
+class TradeResults:
+    filled: np.ndarray
+    entry_bar: np.ndarray
+    exit_bar: np.ndarray
+    entry_price: np.ndarray
+    exit_price: np.ndarray
+    exit_reason: np.ndarray
+    pnl: np.ndarray
+
+
+def _first(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    return mask.any(axis=1), mask.argmax(axis=1)
+
+
+def simulate_brackets(
+    open_: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    symbols: np.ndarray,
+    bars: np.ndarray,
+    limit: np.ndarray,
+    stop: np.ndarray,
+    target: np.ndarray,
+    qty: np.ndarray,
+    config: BacktestConfig = BacktestConfig(),
+) -> TradeResults:
+    if config.ambiguity not in AMBIGUITY_RULES:
+        raise ValueError(f"ambiguity must be one of {AMBIGUITY_RULES}")
+    count = len(bars)
+    horizon = config.entry_window + config.max_hold
+    results = TradeResults(
+        filled=np.zeros(count, dtype=bool),
+        entry_bar=np.full(count, -1, dtype=np.int64),
+        exit_bar=np.full(count, -1, dtype=np.int64),
+        entry_price=np.full(count, np.nan),
+        exit_price=np.full(count, np.nan),
+        exit_reason=np.zeros(count, dtype=np.int8),
+        pnl=np.zeros(count),
+    )
+    steps = np.arange(horizon)
+    for lo in range(0, count, config.chunk_size):
+        chunk = slice(lo, min(count, lo + config.chunk_size))
+        _simulate_chunk(
+            (open_, high, low, close), symbols, bars, (limit, stop, target), chunk, steps, config, results
+        )
+
+    slip = config.slippage_bps / 10_000
+    filled = results.filled
+    results.entry_price[filled] *= 1 + slip
+    results.exit_price[filled] *= 1 - slip
+    shares = np.asarray(qty, dtype=float)
+    results.pnl = np.where(
+        filled,
+        shares * (results.exit_price - results.entry_price) - 2 * shares * config.commission_per_share,
+        0.0,
+    )
+    return results
+
+
+def _simulate_chunk(
+    prices: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+    symbols: np.ndarray,
+    bars: np.ndarray,
+    levels: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    chunk: slice,
+    steps: np.ndarray,
+    config: BacktestConfig,
+    out: TradeResults,
+) -> None:
+    open_, high, low, close = prices
+    limit, stop, target = levels
+    total = len(close)
+    # Orders are placed after the signal bar closes and work from the next bar.
+    rows = bars[chunk, None] + 1 + steps
+    valid = rows < total
+    rows = np.minimum(rows, total - 1)
+    cols = symbols[chunk, None]
+    bar_open, bar_high, bar_low = open_[rows, cols], high[rows, cols], low[rows, cols]
+    lim, stp, tgt = limit[chunk, None], stop[chunk, None], target[chunk, None]
+
+    can_enter = valid & (steps < config.entry_window) & (bar_low <= lim)
+    filled, entry_step = _first(can_enter)
+    entry_step = entry_step[:, None]
+    entry_open = np.take_along_axis(bar_open, entry_step, axis=1)[:, 0]
+    entry_price = np.minimum(entry_open, limit[chunk])
+
+    holding = valid & (steps >= entry_step) & (steps < entry_step + config.max_hold) & filled[:, None]
+    stop_hit = holding & (bar_low <= stp)
+    target_hit = holding & (bar_high >= tgt)
+    exited, exit_step = _first(stop_hit | target_hit)
+    pick = exit_step[:, None]
+    hit_stop = np.take_along_axis(stop_hit, pick, axis=1)[:, 0]
+    hit_target = np.take_along_axis(target_hit, pick, axis=1)[:, 0]
+    exit_open = np.take_along_axis(bar_open, pick, axis=1)[:, 0]
+    after_entry = exit_step > entry_step[:, 0]
+    gap_stop = after_entry & (exit_open <= stop[chunk])
+    gap_target = after_entry & (exit_open >= target[chunk])
+
+    if config.ambiguity == "stop":
+        prefer_stop = np.ones_like(hit_stop)
+    elif config.ambiguity == "target":
+        prefer_stop = np.zeros_like(hit_stop)
+    else:
+        prefer_stop = np.abs(exit_open - stop[chunk]) <= np.abs(target[chunk] - exit_open)
+    is_stop = gap_stop | (hit_stop & ~gap_target & (~hit_target | prefer_stop))
+
+    # A bar that opens through a level fills at the open; so does an entry that is already through it.
+    stop_price = np.where(gap_stop, exit_open, np.minimum(stop[chunk], entry_price))
+    target_price = np.where(gap_target, exit_open, np.maximum(target[chunk], entry_price))
+    last_step = np.maximum(holding.shape[1] - 1 - np.argmax(holding[:, ::-1], axis=1), 0)
+    last_close = close[np.minimum(bars[chunk] + 1 + last_step, total - 1), symbols[chunk]]
+
+    exit_price = np.where(exited, np.where(is_stop, stop_price, target_price), last_close)
+    reason = np.where(exited, np.where(is_stop, EXIT_STOP, EXIT_TARGET), EXIT_TIME)
+    base = bars[chunk] + 1
+    out.filled[chunk] = filled
+    out.entry_bar[chunk] = np.where(filled, base + entry_step[:, 0], -1)
+    out.exit_bar[chunk] = np.where(filled, base + np.where(exited, exit_step, last_step), -1)
+    out.entry_price[chunk] = np.where(filled, entry_price, np.nan)
+    out.exit_price[chunk] = np.where(filled, exit_price, np.nan)
+    out.exit_reason[chunk] = np.where(filled, reason, EXIT_NONE)
+
+
+def backtest_metrics(
+    results: TradeResults,
+    total_bars: int,
+    initial_equity: float = 100_000.0,
+    periods_per_year: float = MINUTE_BARS_PER_YEAR,
+) -> Dict[str, float]:
+    filled = results.filled
+    pnl_by_bar = np.bincount(results.exit_bar[filled], weights=results.pnl[filled], minlength=total_bars)
+    equity = initial_equity + np.concatenate([[0.0], np.cumsum(pnl_by_bar)])
+    returns = pnl_by_bar / equity[:-1]
+    trades = int(filled.sum())
+    wins = int((results.pnl[filled] > 0).sum())
+    return performance_metrics(returns, trades, wins, periods_per_year)
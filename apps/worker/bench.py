@@ -0,0 +1,294 @@
+import json
+import platform
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import instrumentation
+from certainty import CertaintyInputs, certainty_score
+from features import compute_feature_panel, session_starts
+from research import run_walk_forward
+from risk import RiskConfig, evaluate_trade
+from scanner import SCORE_WEIGHTS, FeatureSnapshot, rank_candidates, score_matrix
+from signals import ensemble_signals_batch
+from universe import UniverseBuilder, UniverseEntry
+
+BARS_PER_DAY = 390
+SESSION_OPEN_NS = (14 * 60 + 30) * 60 * 10**9
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+
+
+@dataclass
+class BenchConfig:
+    symbols: int = 10_000
+    days: int = 504
+    research_symbols: int = 10
+    train_window: int = BARS_PER_DAY * 60
+    val_window: int = BARS_PER_DAY * 20
+    step: int = BARS_PER_DAY * 20
+    records: int = 2_000
+    repeat: int = 5
+    seed: int = 7
+
+
+@dataclass
+class BenchResult:
+    name: str
+    items: int
+    median_s: float
+    min_s: float
+
+    @property
+    def per_second(self) -> float:
+        return self.items / self.median_s if self.median_s > 0 else float("inf")
+
+
+@dataclass
+class Regression:
+    name: str
+    baseline_s: float
+    current_s: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current_s / self.baseline_s
+
+
+@dataclass
+class BenchRun:
+    config: BenchConfig
+    results: Dict[str, BenchResult]
+    skipped: Dict[str, str] = field(default_factory=dict)
+    environment: Dict[str, object] = field(default_factory=dict)
+
+    def to_json(self) -> dict:
+        return {
+            "config": asdict(self.config),
+            "environment": self.environment,
+            "results": {
+                name: {**asdict(result), "per_second": result.per_second} for name, result in self.results.items()
+            },
+            "skipped": self.skipped,
+        }
+
+
+Case = Tuple[int, Callable[[], object]]
+
+
+def tickers(count: int) -> List[str]:
+    return [f"S{idx:05d}" for idx in range(count)]
+
+
+def synthetic_universe(config: BenchConfig) -> List[UniverseEntry]:
+    rng = np.random.default_rng(config.seed)
+    volume = rng.lognormal(16.0, 2.0, config.symbols)
+    price = rng.lognormal(3.5, 1.2, config.symbols)
+    spread = rng.uniform(0.0001, 0.01, config.symbols)
+    return [
+        UniverseEntry(ticker, float(v), float(p), float(s))
+        for ticker, v, p, s in zip(tickers(config.symbols), volume, price, spread)
+    ]
+
+
+def synthetic_features(config: BenchConfig) -> np.ndarray:
+    rng = np.random.default_rng(config.seed + 1)
+    matrix = np.empty((config.symbols, len(SCORE_WEIGHTS)))
+    matrix[:, 0] = rng.lognormal(0.0, 0.6, config.symbols)
+    matrix[:, 1] = rng.normal(0.0, 0.02, config.symbols)
+    matrix[:, 2] = rng.normal(0.0, 0.3, config.symbols)
+    matrix[:, 3] = rng.integers(0, 4, config.symbols) / 3
+    return matrix
+
+
+def synthetic_panel(config: BenchConfig) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(config.seed + 2)
+    rows, cols = config.days * BARS_PER_DAY, config.research_symbols
+    day = np.repeat(np.arange(config.days, dtype=np.int64), BARS_PER_DAY)
+    minute = np.tile(np.arange(BARS_PER_DAY, dtype=np.int64), config.days)
+    t = day * 86_400 * 10**9 + SESSION_OPEN_NS + minute * 60 * 10**9
+    returns = rng.normal(0.0, 0.001, (rows, cols))
+    close = 50.0 * np.exp(np.cumsum(returns, axis=0))
+    open_ = np.empty_like(close)
+    open_[0] = 50.0
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.normal(0.0, 0.0005, (rows, cols))) * close
+    return {
+        "t": t,
+        "open": open_,
+        "high": np.maximum(open_, close) + wick,
+        "low": np.minimum(open_, close) - wick,
+        "close": close,
+        "volume": rng.lognormal(8.0, 1.0, (rows, cols)),
+    }
+
+
+def candidate_records(config: BenchConfig) -> List[dict]:
+    timestamp = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+    return [
+        {
+            "ticker": ticker,
+            "side": "buy",
+            "entry_hint": 50.0 + idx % 97,
+            "stop": 49.0 + idx % 97,
+            "target": 52.0 + idx % 97,
+            "ev": 0.01 * (idx % 13),
+            "certainty": (idx % 100) / 100,
+            "rationale": ["momentum_breakout", "risk sizing ok"],
+            "timestamp": timestamp,
+        }
+        for idx, ticker in enumerate(tickers(config.records))
+    ]
+
+
+def bench_universe(config: BenchConfig) -> Case:
+    entries = synthetic_universe(config)
+    return len(entries), lambda: UniverseBuilder().build_universe(entries)
+
+
+def bench_rank(config: BenchConfig) -> Case:
+    rows = synthetic_features(config).tolist()
+    snapshots = [FeatureSnapshot(ticker, *row) for ticker, row in zip(tickers(config.symbols), rows)]
+    return len(snapshots), lambda: rank_candidates(snapshots)
+
+
+def bench_signals(config: BenchConfig) -> Case:
+    names = tickers(config.symbols)
+    matrix = synthetic_features(config)
+    margin = np.clip(score_matrix(matrix), 0.0, 1.0)
+
+    def run():
+        batch = ensemble_signals_batch(names, matrix)
+        return certainty_score(batch.confidence, CertaintyInputs(margin, 0.0, 0.5, 0.5))
+
+    return len(names), run
+
+
+def bench_risk(config: BenchConfig) -> Case:
+    rng = np.random.default_rng(config.seed + 3)
+    rows = list(
+        zip(
+            rng.lognormal(3.5, 1.0, config.symbols).tolist(),
+            rng.uniform(0.05, 2.0, config.symbols).tolist(),
+            rng.uniform(0.4, 1.0, config.symbols).tolist(),
+        )
+    )
+    risk_config = RiskConfig(
+        base_risk=0.0025,
+        c_min=0.55,
+        max_positions=10,
+        max_gross_exposure=1.5,
+        sector_concentration=0.25,
+        daily_max_loss=0.03,
+        drawdown_max=0.1,
+    )
+    return len(rows), lambda: [evaluate_trade(100_000.0, *row, risk_config) for row in rows]
+
+
+def bench_research(config: BenchConfig) -> Case:
+    panel = synthetic_panel(config)
+    params = {"weights": SCORE_WEIGHTS.tolist(), "quantile": 0.99}
+
+    def run():
+        features = compute_feature_panel(
+            panel["open"], panel["high"], panel["low"], panel["close"], panel["volume"], session_starts(panel["t"])
+        )
+        arrays = {"close": panel["close"], "features": features}
+        return run_walk_forward(arrays, config.train_window, config.val_window, config.step, params, max_workers=0)
+
+    return panel["close"].size, run
+
+
+def _api_schemas():
+    # The API is a separate deployable; benchmark its models only when its code and deps are importable.
+    if str(API_DIR) not in sys.path:
+        sys.path.append(str(API_DIR))
+    from pydantic import TypeAdapter
+
+    from schemas import Candidate
+
+    return TypeAdapter(list[Candidate])
+
+
+def bench_serialize(config: BenchConfig) -> Case:
+    adapter = _api_schemas()
+    records = candidate_records(config)
+    return len(records), lambda: adapter.dump_json(adapter.validate_python(records))
+
+
+CASES: Dict[str, Callable[[BenchConfig], Case]] = {
+    "universe": bench_universe,
+    "rank": bench_rank,
+    "signals_certainty": bench_signals,
+    "evaluate_trade": bench_risk,
+    "research": bench_research,
+    "api_serialize": bench_serialize,
+}
+
+
+def measure(func: Callable[[], object], repeat: int) -> List[float]:
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def environment() -> Dict[str, object]:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "metrics": instrumentation.enabled(),
+    }
+
+
+def run_suite(config: BenchConfig, only: Optional[Sequence[str]] = None) -> BenchRun:
+    names = list(only) if only else list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        raise ValueError(f"unknown benchmarks {unknown}; choose from {list(CASES)}")
+    results: Dict[str, BenchResult] = {}
+    skipped: Dict[str, str] = {}
+    for name in names:
+        try:
+            items, func = CASES[name](config)
+        except ImportError as exc:
+            skipped[name] = str(exc)
+            continue
+        timings = measure(func, config.repeat)
+        results[name] = BenchResult(name, items, statistics.median(timings), min(timings))
+    return BenchRun(config, results, skipped, environment())
+
+
+def save_baseline(run: BenchRun, path: str) -> Path:
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(json.dumps(run.to_json(), indent=2, sort_keys=True) + "\n")
+    return target
+
+
+def load_baseline(path: str) -> dict:
+    return json.loads(Path(path).read_text())
+
+
+def compare(run: BenchRun, baseline: dict, threshold: float = 0.25) -> List[Regression]:
+    # Timings from a different workload size are not comparable; the repeat count does not change the workload.
+    workload = {key: value for key, value in asdict(run.config).items() if key != "repeat"}
+    recorded = {key: value for key, value in baseline["config"].items() if key != "repeat"}
+    if workload != recorded:
+        raise ValueError("baseline was recorded with a different benchmark config")
+    regressions = []
+    for name, result in run.results.items():
+        previous = baseline["results"].get(name)
+        # The fastest run is the least disturbed by scheduler noise, so it is what gets gated.
+        if previous is not None and result.min_s > previous["min_s"] * (1 + threshold):
+            regressions.append(Regression(name, previous["min_s"], result.min_s))
+    return regressions
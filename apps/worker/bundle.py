@@ -1,7 +1,5 @@
-import json
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 from datetime import datetime
-from pathlib import Path
 from typing import Dict
 
 
@@ -16,14 +14,6 @@ class Bundle:
     created_at: str
 
 
-def save_bundle(bundle: Bundle, folder: str = "bundles") -> Path:
-    path = Path(folder)
-    path.mkdir(parents=True, exist_ok=True)
-    bundle_path = path / f"{bundle.bundle_id}.json"
-    bundle_path.write_text(json.dumps(asdict(bundle), indent=2))
-    return bundle_path
-
-
 def create_bundle(
     bundle_id: str,
     name: str,
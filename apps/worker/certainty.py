@@ -1,25 +1,38 @@
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List, Union
 
-from signals import StrategySignal
+import numpy as np
+
+from instrumentation import timed
+from signals import BatchSignals, StrategySignal
+
+Scalar = Union[float, np.ndarray]
 
 
 @dataclass
 class CertaintyInputs:
-    model_margin: float
-    liquidity_penalty: float
-    regime_score: float
-    calibration_score: float
+    model_margin: Scalar
+    liquidity_penalty: Scalar
+    regime_score: Scalar
+    calibration_score: Scalar
 
 
-def ensemble_agreement(signals: List[StrategySignal]) -> float:
+def ensemble_agreement(signals: Union[List[StrategySignal], np.ndarray]) -> Scalar:
+    if isinstance(signals, np.ndarray):
+        if signals.shape[0] == 0:
+            return np.zeros(signals.shape[1:])
+        return np.minimum(1.0, signals.mean(axis=0))
     if not signals:
         return 0.0
     avg_conf = sum(signal.confidence for signal in signals) / len(signals)
     return min(1.0, avg_conf)
 
 
-def certainty_score(signals: List[StrategySignal], inputs: CertaintyInputs) -> float:
+@timed("certainty_score")
+def certainty_score(
+    signals: Union[List[StrategySignal], np.ndarray],
+    inputs: CertaintyInputs,
+) -> Scalar:
     agreement = ensemble_agreement(signals)
     score = (
         0.35 * inputs.model_margin
@@ -28,8 +41,21 @@ def certainty_score(signals: List[StrategySignal], inputs: CertaintyInputs) -> f
         + 0.15 * inputs.calibration_score
         - 0.10 * inputs.liquidity_penalty
     )
+    if isinstance(score, np.ndarray):
+        return np.clip(score, 0.0, 1.0)
     return max(0.0, min(1.0, score))
 
 
+def passing_signals(
+    batch: BatchSignals,
+    certainty: np.ndarray,
+    c_min: float,
+) -> Dict[str, List[StrategySignal]]:
+    return {
+        batch.tickers[idx]: batch.signals_for(idx)
+        for idx in np.flatnonzero(certainty >= c_min)
+    }
+
+
 def expected_value(edge: float, costs: float) -> float:
     return edge - costs
@@ -1,52 +1,366 @@
 import argparse
+import asyncio
+import json
+from dataclasses import asdict
 from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
 
-from bundle import create_bundle, save_bundle
+import numpy as np
 
+import instrumentation
+from alpaca import AlpacaClient
+from bench import CASES, BenchConfig, compare, load_baseline, run_suite, save_baseline
+from bundle import create_bundle
+from config import LiveTradingDisabled, Settings, check_trading_mode, load_settings
+from covariance import RollingCovariance
+from execution import OrderLedger
+from features import FeatureParams, compute_feature_panel, session_starts
+from live import LatencyTracker, LivePipeline, LiveTrader, stream_bars
+from registry import SORT_COLUMNS, BundleRegistry
+from research import SharedArrays, run_walk_forward
+from scanner import FEATURE_COLUMNS, SCORE_WEIGHTS
+from store import BarStore, load_panel, to_ns
+from sweep import ArrayCache, ParameterSweep
+from trade_stream import TradeBook, TradeStream
+from wire import RedisTransport, SnapshotPublisher
 
-def ingest() -> None:
+
+async def _ingest(store: BarStore, symbols: List[str], timeframe: str, start: str, end: Optional[str]) -> int:
+    client = AlpacaClient(load_settings())
+    appended = 0
+
+    def consume(page) -> None:
+        nonlocal appended
+        appended += store.append_page(timeframe, page)
+
+    try:
+        await client.fetch_bars_bulk(symbols, timeframe, start, consume, end=end)
+    finally:
+        await client.close()
+    return appended
+
+
+def ingest(symbols: List[str], timeframe: str, start: str, end: Optional[str], root: str) -> None:
     print("Ingesting market data...")
+    store = BarStore(root)
+    last = [store.last_timestamp(symbol, timeframe) for symbol in symbols]
+    if all(ts is not None for ts in last):
+        # Only the missing tail is fetched; rows already on disk are skipped on append.
+        tail_start = max(to_ns(start), min(last) + 1)
+        start = str(np.datetime64(tail_start, "ns")) + "Z"
+    total = asyncio.run(_ingest(store, symbols, timeframe, start, end))
+    print(f"Appended {total} {timeframe} bars for {len(symbols)} symbols to {root}")
 
 
-def research() -> None:
+def research(
+    symbols: Optional[List[str]],
+    timeframe: str,
+    root: str,
+    train_window: int,
+    val_window: int,
+    step: int,
+    workers: Optional[int],
+    sweep_path: Optional[str] = None,
+    cache_mb: int = 1024,
+    registry_path: str = "bundles/registry.db",
+) -> None:
     print("Running walk-forward optimization...")
+    store = BarStore(root)
+    symbols = symbols or store.symbols(timeframe)
+    panel = load_panel(store, symbols, timeframe)
+    if len(panel["t"]) < train_window + val_window:
+        print(f"Not enough {timeframe} bars in {root}; run ingest first")
+        return
+    metadata = {"universe": f"{len(symbols)} symbols", "timeframe": timeframe, "commit": "dev"}
+
+    if sweep_path:
+        grid = json.loads(Path(sweep_path).read_text())
+        sweep = ParameterSweep(panel, train_window, val_window, step, ArrayCache(cache_mb << 20))
+        try:
+            result = sweep.run(grid)
+        except ValueError as exc:
+            print(f"Invalid sweep grid {sweep_path}: {exc}")
+            return
+        name = "sweep-best"
+        parameters = result.best.parameters
+        metrics = result.best.metrics
+        holdout_metrics = result.holdout_metrics
+        metadata.update(
+            folds=len(sweep.folds),
+            grid_points=len(result.points),
+            cache_hits=sweep.cache.hits,
+            cache_misses=sweep.cache.misses,
+        )
+    else:
+        feature_params = FeatureParams()
+        params = {"weights": SCORE_WEIGHTS.tolist(), "quantile": 0.99}
+        # Features are computed straight into shared memory, so the workers' view is the only copy.
+        with SharedArrays() as shared:
+            features = shared.allocate("features", panel["close"].shape + (len(FEATURE_COLUMNS),))
+            compute_feature_panel(
+                panel["open"],
+                panel["high"],
+                panel["low"],
+                panel["close"],
+                panel["volume"],
+                session_starts(panel["t"]),
+                feature_params,
+                out=features,
+            )
+            shared.allocate("close", panel["close"].shape)[...] = panel["close"]
+            # Only the shared blocks stay alive while the workers run.
+            del panel, features
+            result = run_walk_forward(shared, train_window, val_window, step, params, max_workers=workers)
+        name = "baseline"
+        parameters = {**params, **asdict(feature_params)}
+        metrics = result.metrics
+        holdout_metrics = result.holdout_metrics
+        metadata["folds"] = len(result.folds)
+
     bundle = create_bundle(
         bundle_id=f"bundle-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
-        name="baseline",
-        parameters={"c_min": 0.55},
-        metrics={"sharpe": 1.1, "max_drawdown": 0.08, "trades": 120, "win_rate": 0.52},
-        holdout_metrics={"sharpe": 0.9, "max_drawdown": 0.1, "trades": 30, "win_rate": 0.5},
-        metadata={"universe": "top2000", "commit": "dev"},
+        name=name,
+        parameters=parameters,
+        metrics=metrics,
+        holdout_metrics=holdout_metrics,
+        metadata=metadata,
     )
-    path = save_bundle(bundle)
-    print(f"Saved bundle to {path}")
+    registry = BundleRegistry(registry_path)
+    try:
+        registry.save(bundle)
+    finally:
+        registry.close()
+    print(f"Saved bundle {bundle.bundle_id} to {registry_path}")
+
+
+async def _run_live(
+    settings: Settings,
+    symbols: List[str],
+    ledger_path: str,
+    report_every: float,
+    max_age: float,
+    parameters: Optional[dict],
+) -> None:
+    client = AlpacaClient(settings)
+    try:
+        account = await client.get_account()
+        publisher = SnapshotPublisher(RedisTransport.from_url(settings.redis_url))
+        latency = LatencyTracker()
+        book = TradeBook()
+        ledger = OrderLedger(ledger_path)
+        await ledger.reconcile(client)
+        trader = LiveTrader(
+            client,
+            settings,
+            book,
+            ledger,
+            float(account.get("equity", 0.0)),
+            publish=publisher.publish,
+            latency=latency,
+            session_open=float(account.get("last_equity") or 0) or None,
+            covariance=RollingCovariance(
+                symbols, halflife=settings.covariance_halflife, rank=settings.covariance_rank
+            ),
+            parameters=parameters,
+        )
+        stream = TradeStream(settings, book, client, on_update=trader.publish_book, on_resync=trader.resync_equity)
+        pipeline = LivePipeline(stream_bars(settings, symbols), trader.stages(), max_age=max_age, latency=latency)
+
+        async def report() -> None:
+            while True:
+                await asyncio.sleep(report_every)
+                print(json.dumps(pipeline.report()))
 
+        await asyncio.gather(stream.run(), pipeline.run(), report())
+    finally:
+        await client.close()
 
-def run_live() -> None:
+
+def active_parameters(registry_path: str) -> Optional[dict]:
+    if not Path(registry_path).exists():
+        return None
+    registry = BundleRegistry(registry_path)
+    try:
+        bundle = registry.active()
+    finally:
+        registry.close()
+    return bundle.parameters if bundle is not None else None
+
+
+def run_live(
+    symbols: Optional[List[str]],
+    root: str = "data/bars",
+    timeframe: str = "1Min",
+    ledger_path: str = "data/orders.jsonl",
+    report_every: float = 60.0,
+    max_age: float = 5.0,
+    metrics_port: int = 0,
+    registry_path: str = "bundles/registry.db",
+) -> bool:
+    settings = load_settings()
+    try:
+        check_trading_mode(settings)
+    except LiveTradingDisabled as exc:
+        print(f"Refusing to start: {exc}")
+        return False
     print("Starting live worker (paper default)...")
+    symbols = symbols or BarStore(root).symbols(timeframe)
+    if not symbols:
+        print(f"No symbols given and none stored in {root}; pass --symbols or run ingest first")
+        return False
+    parameters = active_parameters(registry_path)
+    if parameters is None:
+        print(f"No active bundle in {registry_path}; trading with default parameters")
+    if metrics_port:
+        instrumentation.serve(metrics_port)
+    try:
+        asyncio.run(_run_live(settings, symbols, ledger_path, report_every, max_age, parameters))
+    except KeyboardInterrupt:
+        pass
+    return True
+
+
+def promote(bundle_id: str, registry_path: str = "bundles/registry.db") -> None:
+    registry = BundleRegistry(registry_path)
+    try:
+        registry.promote(bundle_id)
+    except KeyError:
+        print(f"Unknown bundle {bundle_id}")
+        return
+    finally:
+        registry.close()
+    print(f"Promoted bundle {bundle_id}")
 
 
-def promote(bundle_id: str) -> None:
-    print(f"Promoting bundle {bundle_id}")
+def select_bundle(bundle_id: str, registry_path: str = "bundles/registry.db") -> None:
+    registry = BundleRegistry(registry_path)
+    try:
+        registry.select(bundle_id)
+    except KeyError:
+        print(f"Unknown bundle {bundle_id}")
+        return
+    except ValueError as exc:
+        print(f"Cannot select bundle: {exc}")
+        return
+    finally:
+        registry.close()
+    print(f"Selected bundle {bundle_id} for trading")
 
 
-def select_bundle(bundle_id: str) -> None:
-    print(f"Selecting bundle {bundle_id} for trading")
+def list_bundles(
+    sort: str, limit: int, offset: int, registry_path: str = "bundles/registry.db", import_from: Optional[str] = None
+) -> None:
+    registry = BundleRegistry(registry_path)
+    try:
+        if import_from:
+            print(f"Imported {registry.import_folder(import_from)} bundles from {import_from}")
+        records = registry.query(sort=sort, limit=limit, offset=offset)
+    finally:
+        registry.close()
+    for record in records:
+        flags = ("*" if record.active else " ") + ("P" if record.promoted else " ")
+        print(f"{flags} {record.bundle_id}  {record.name}  sharpe={record.metrics['sharpe']}  {record.created_at}")
+
+
+def bench(
+    config: BenchConfig,
+    only: Optional[List[str]] = None,
+    baseline_path: str = "bench/baseline.json",
+    threshold: float = 0.25,
+    update_baseline: bool = False,
+    out: Optional[str] = None,
+) -> bool:
+    try:
+        run = run_suite(config, only)
+    except ValueError as exc:
+        print(f"Cannot run benchmarks: {exc}")
+        return False
+    for name, result in run.results.items():
+        print(f"{name:<18} {result.median_s * 1000:10.2f} ms  {result.per_second:14,.0f} items/s")
+    for name, reason in run.skipped.items():
+        print(f"{name:<18} skipped: {reason}")
+    if out:
+        save_baseline(run, out)
+    if update_baseline:
+        save_baseline(run, baseline_path)
+        print(f"Saved baseline to {baseline_path}")
+        return True
+    if not Path(baseline_path).exists():
+        # A missing baseline must not read as a pass in CI.
+        print(f"No baseline at {baseline_path}; record one with --update-baseline")
+        return False
+    try:
+        regressions = compare(run, load_baseline(baseline_path), threshold)
+    except ValueError as exc:
+        print(f"Cannot compare against {baseline_path}: {exc}; re-record it with --update-baseline")
+        return False
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression.name}: {regression.current_s * 1000:.2f} ms vs "
+            f"{regression.baseline_s * 1000:.2f} ms baseline ({regression.ratio:.2f}x)"
+        )
+    return not regressions
 
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Stock Predictor CLI")
+    parser.add_argument("--metrics-out", help="Write Prometheus-text metrics here when the command finishes")
     sub = parser.add_subparsers(dest="command", required=True)
 
-    sub.add_parser("ingest")
-    sub.add_parser("research")
-    sub.add_parser("run-live")
+    ingest_parser = sub.add_parser("ingest")
+    ingest_parser.add_argument("--symbols", required=True, help="Comma-separated tickers")
+    ingest_parser.add_argument("--timeframe", default="1Min")
+    ingest_parser.add_argument("--start", required=True)
+    ingest_parser.add_argument("--end")
+    ingest_parser.add_argument("--root", default="data/bars")
+    research_parser = sub.add_parser("research")
+    research_parser.add_argument("--symbols", help="Comma-separated tickers (default: all stored)")
+    research_parser.add_argument("--timeframe", default="1Min")
+    research_parser.add_argument("--root", default="data/bars")
+    research_parser.add_argument("--train-window", type=int, default=390 * 60)
+    research_parser.add_argument("--val-window", type=int, default=390 * 20)
+    research_parser.add_argument("--step", type=int, default=390 * 20)
+    research_parser.add_argument("--workers", type=int, help="Process pool size (0 runs in-process)")
+    research_parser.add_argument("--sweep", help="JSON file mapping parameter names to candidate values")
+    research_parser.add_argument("--cache-mb", type=int, default=1024)
+    research_parser.add_argument("--registry", default="bundles/registry.db")
+    live_parser = sub.add_parser("run-live")
+    live_parser.add_argument("--symbols", help="Comma-separated tickers (default: all stored)")
+    live_parser.add_argument("--root", default="data/bars")
+    live_parser.add_argument("--timeframe", default="1Min")
+    live_parser.add_argument("--ledger", default="data/orders.jsonl")
+    live_parser.add_argument("--report-every", type=float, default=60.0, help="Seconds between latency reports")
+    live_parser.add_argument("--max-tick-age", type=float, default=5.0, help="Drop ticks older than this")
+    live_parser.add_argument("--metrics-port", type=int, default=0, help="Serve /metrics on this port (0 disables)")
+    live_parser.add_argument("--registry", default="bundles/registry.db", help="Trade the active bundle's parameters")
 
     promote_parser = sub.add_parser("promote")
     promote_parser.add_argument("--bundle-id", required=True)
+    promote_parser.add_argument("--registry", default="bundles/registry.db")
 
     select_parser = sub.add_parser("select-bundle")
     select_parser.add_argument("--bundle-id", required=True)
+    select_parser.add_argument("--registry", default="bundles/registry.db")
+
+    bundles_parser = sub.add_parser("bundles")
+    bundles_parser.add_argument("--sort", choices=SORT_COLUMNS, default="created_at")
+    bundles_parser.add_argument("--limit", type=int, default=20)
+    bundles_parser.add_argument("--offset", type=int, default=0)
+    bundles_parser.add_argument("--registry", default="bundles/registry.db")
+    bundles_parser.add_argument("--import-from", help="Folder of legacy per-bundle JSON files to index")
+
+    bench_parser = sub.add_parser("bench")
+    bench_parser.add_argument("--only", help=f"Comma-separated subset of {','.join(CASES)}")
+    bench_parser.add_argument("--symbols", type=int, default=BenchConfig.symbols)
+    bench_parser.add_argument("--days", type=int, default=BenchConfig.days, help="Sessions of minute bars for research")
+    bench_parser.add_argument("--research-symbols", type=int, default=BenchConfig.research_symbols)
+    bench_parser.add_argument("--repeat", type=int, default=BenchConfig.repeat)
+    bench_parser.add_argument("--seed", type=int, default=BenchConfig.seed)
+    bench_parser.add_argument("--baseline", default="bench/baseline.json")
+    bench_parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing")
+    bench_parser.add_argument("--update-baseline", action="store_true")
+    bench_parser.add_argument("--out", help="Also write this run's results to a JSON file")
 
     return parser
 
@@ -54,17 +368,60 @@ def build_parser() -> argparse.ArgumentParser:
 def main() -> None:
     parser = build_parser()
     args = parser.parse_args()
+    failed = False
 
     if args.command == "ingest":
-        ingest()
+        ingest(args.symbols.split(","), args.timeframe, args.start, args.end, args.root)
     elif args.command == "research":
-        research()
+        research(
+            args.symbols.split(",") if args.symbols else None,
+            args.timeframe,
+            args.root,
+            args.train_window,
+            args.val_window,
+            args.step,
+            args.workers,
+            args.sweep,
+            args.cache_mb,
+            args.registry,
+        )
     elif args.command == "run-live":
-        run_live()
+        failed = not run_live(
+            args.symbols.split(",") if args.symbols else None,
+            args.root,
+            args.timeframe,
+            args.ledger,
+            args.report_every,
+            args.max_tick_age,
+            args.metrics_port,
+            args.registry,
+        )
     elif args.command == "promote":
-        promote(args.bundle_id)
+        promote(args.bundle_id, args.registry)
     elif args.command == "select-bundle":
-        select_bundle(args.bundle_id)
+        select_bundle(args.bundle_id, args.registry)
+    elif args.command == "bundles":
+        list_bundles(args.sort, args.limit, args.offset, args.registry, args.import_from)
+    elif args.command == "bench":
+        config = BenchConfig(
+            symbols=args.symbols,
+            days=args.days,
+            research_symbols=args.research_symbols,
+            repeat=args.repeat,
+            seed=args.seed,
+        )
+        failed = not bench(
+            config,
+            args.only.split(",") if args.only else None,
+            args.baseline,
+            args.threshold,
+            args.update_baseline,
+            args.out,
+        )
+    if args.metrics_out:
+        instrumentation.dump(args.metrics_out)
+    if failed:
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
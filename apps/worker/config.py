@@ -1,5 +1,13 @@
 import os
 from dataclasses import dataclass
+from urllib.parse import urlparse
+
+PAPER_HOST = "paper-api.alpaca.markets"
+PLACEHOLDER_SECRET = "change_me"
+
+
+class LiveTradingDisabled(RuntimeError):
+    pass
 
 
 @dataclass(frozen=True)
@@ -22,6 +30,9 @@ class Settings:
     sector_concentration: float
     daily_max_loss: float
     drawdown_max: float
+    max_portfolio_vol: float = 0.0
+    covariance_halflife: float = 390.0
+    covariance_rank: int = 0
 
 
 def load_settings() -> Settings:
@@ -46,4 +57,17 @@ def load_settings() -> Settings:
         sector_concentration=float(os.getenv("SECTOR_CONCENTRATION", "0.25")),
         daily_max_loss=float(os.getenv("DAILY_MAX_LOSS", "0.03")),
         drawdown_max=float(os.getenv("DRAWDOWN_MAX", "0.1")),
+        max_portfolio_vol=float(os.getenv("MAX_PORTFOLIO_VOL", "0")),
+        covariance_halflife=float(os.getenv("COVARIANCE_HALFLIFE", "390")),
+        covariance_rank=int(os.getenv("COVARIANCE_RANK", "0")),
     )
+
+
+def check_trading_mode(settings: Settings) -> None:
+    # Anything but the paper endpoint trades real money: require both explicit opt-ins.
+    if urlparse(settings.alpaca_base_url).hostname == PAPER_HOST:
+        return
+    if not settings.enable_live_trading:
+        raise LiveTradingDisabled(f"{settings.alpaca_base_url} is not the paper endpoint; set ENABLE_LIVE_TRADING=true")
+    if not settings.admin_secret or settings.admin_secret == PLACEHOLDER_SECRET:
+        raise LiveTradingDisabled("live trading requires a non-default ADMIN_SECRET")
@@ -0,0 +1,187 @@
+import math
+from datetime import datetime
+from typing import Iterable, Mapping, Optional, Sequence
+
+import numpy as np
+
+from features import Bar
+
+BARS_PER_DAY = 390
+DENSE_LIMIT = 2000
+DEFAULT_RANK = 32
+
+
+class RollingCovariance:
+    def __init__(
+        self,
+        tickers: Sequence[str],
+        halflife: float = BARS_PER_DAY,
+        rank: int = 0,
+        min_periods: int = 30,
+        periods_per_day: int = BARS_PER_DAY,
+    ):
+        self.tickers = list(tickers)
+        self.index = {ticker: idx for idx, ticker in enumerate(self.tickers)}
+        self.decay = 0.5 ** (1.0 / halflife)
+        if not rank and len(self.tickers) > DENSE_LIMIT:
+            rank = DEFAULT_RANK
+        # A sketch only saves memory when it is smaller than the universe.
+        self.rank = rank if 0 < rank < len(self.tickers) // 2 else 0
+        self.min_periods = min_periods
+        self.periods_per_day = periods_per_day
+        self.count = 0
+        n = len(self.tickers)
+        self.mean = np.zeros(n)
+        self.variance = np.zeros(n)
+        self._last = np.full(n, np.nan)
+        self._pending = np.full(n, np.nan)
+        self._stamp: Optional[datetime] = None
+        # Decay is applied lazily through a shared scale so each bar touches the state once.
+        self._scale = 1.0
+        if self.rank:
+            # Frequent-directions sketch: cov ~= scale * B.T @ B plus an exact diagonal residual.
+            self._sketch = np.zeros((2 * self.rank, n))
+            self._rows = 0
+            self._cov = None
+        else:
+            self._cov = np.zeros((n, n))
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.min_periods
+
+    def observe(self, bars: Iterable[Bar]) -> None:
+        # Bars for one minute accumulate; the return step runs once the next minute starts.
+        for bar in bars:
+            idx = self.index.get(bar.ticker)
+            if idx is None:
+                continue
+            if self._stamp is not None and bar.timestamp > self._stamp:
+                self.flush()
+            if self._stamp is None or bar.timestamp > self._stamp:
+                self._stamp = bar.timestamp
+            self._pending[idx] = bar.close
+
+    def flush(self) -> None:
+        seen = ~np.isnan(self._pending)
+        if not seen.any():
+            return
+        both = seen & ~np.isnan(self._last)
+        returns = np.zeros(len(self.tickers))
+        returns[both] = np.log(self._pending[both] / self._last[both])
+        self._last[seen] = self._pending[seen]
+        self._pending[:] = np.nan
+        if both.any():
+            self.update(returns)
+
+    def update(self, returns: np.ndarray) -> None:
+        decay = self.decay
+        delta = returns - self.mean
+        self.mean += (1 - decay) * delta
+        self.variance *= decay
+        self.variance += decay * (1 - decay) * delta * delta
+        self.count += 1
+        self._scale *= decay
+        if self._cov is not None:
+            if self._scale < 1e-150:
+                self._cov *= self._scale
+                self._scale = 1.0
+            scaled = delta * (decay * (1 - decay) / self._scale)
+            self._cov += scaled[:, None] * delta
+            return
+        if self._rows == len(self._sketch):
+            self._shrink()
+        self._sketch[self._rows] = delta * math.sqrt(decay * (1 - decay) / self._scale)
+        self._rows += 1
+
+    def _shrink(self) -> None:
+        _, singular, vt = np.linalg.svd(self._sketch, full_matrices=False)
+        shrunk = np.sqrt(np.maximum(singular**2 - singular[self.rank] ** 2, 0.0))
+        self._sketch[:] = 0.0
+        self._sketch[: self.rank] = shrunk[: self.rank, None] * vt[: self.rank]
+        # Fold the decay accumulated so far into the rows to keep the scale away from underflow.
+        self._sketch *= math.sqrt(self._scale)
+        self._scale = 1.0
+        self._rows = self.rank
+
+    def _residual(self) -> np.ndarray:
+        sketched = self._scale * np.einsum("ij,ij->j", self._sketch[: self._rows], self._sketch[: self._rows])
+        return np.maximum(self.variance - sketched, 0.0)
+
+    def diagonal(self) -> np.ndarray:
+        return self.variance * self.periods_per_day
+
+    def dot(self, weights: np.ndarray) -> np.ndarray:
+        if self._cov is not None:
+            return self._cov @ weights * (self._scale * self.periods_per_day)
+        rows = self._sketch[: self._rows]
+        return (self._scale * rows.T @ (rows @ weights) + self._residual() * weights) * self.periods_per_day
+
+    def column(self, idx: int) -> np.ndarray:
+        if self._cov is not None:
+            return self._cov[:, idx] * (self._scale * self.periods_per_day)
+        rows = self._sketch[: self._rows]
+        column = self._scale * rows.T @ rows[:, idx]
+        column[idx] = self.variance[idx]
+        return column * self.periods_per_day
+
+    def covariance(self, tickers: Sequence[str]) -> np.ndarray:
+        idx = np.array([self.index[ticker] for ticker in tickers], dtype=np.intp)
+        if self._cov is not None:
+            return self._cov[np.ix_(idx, idx)] * (self._scale * self.periods_per_day)
+        rows = self._sketch[: self._rows, idx]
+        block = self._scale * rows.T @ rows
+        block[np.diag_indices_from(block)] = self.variance[idx]
+        return block * self.periods_per_day
+
+    def correlation(self, tickers: Sequence[str]) -> np.ndarray:
+        block = self.covariance(tickers)
+        std = np.sqrt(np.diag(block))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = np.nan_to_num(block / np.outer(std, std))
+        np.fill_diagonal(corr, 1.0)
+        return np.clip(corr, -1.0, 1.0)
+
+    def exposure_vector(self, exposures: Mapping[str, float]) -> np.ndarray:
+        weights = np.zeros(len(self.tickers))
+        for ticker, notional in exposures.items():
+            idx = self.index.get(ticker)
+            if idx is not None:
+                weights[idx] += notional
+        return weights
+
+
+class PortfolioVariance:
+    # Daily dollar variance of the book, updated column by column as candidates are admitted.
+    def __init__(self, model: RollingCovariance, exposures: Mapping[str, float]):
+        self.model = model
+        self.weights = model.exposure_vector(exposures)
+        self.sigma_w = model.dot(self.weights)
+        self.variance = float(self.weights @ self.sigma_w)
+        self._diagonal = model.diagonal()
+
+    def marginal(self, ticker: str, notional: float) -> float:
+        idx = self.model.index.get(ticker)
+        if idx is None:
+            return 0.0
+        return 2 * notional * float(self.sigma_w[idx]) + notional * notional * float(self._diagonal[idx])
+
+    def max_notional(self, ticker: str, budget: float) -> float:
+        # Largest long notional keeping variance within budget: solve var_ii a^2 + 2 b a + (V - budget) <= 0.
+        idx = self.model.index.get(ticker)
+        if idx is None:
+            return math.inf
+        var_ii, b = float(self._diagonal[idx]), float(self.sigma_w[idx])
+        slack = budget - self.variance
+        if var_ii <= 0:
+            return math.inf if b <= 0 else max(0.0, slack / (2 * b))
+        disc = b * b + var_ii * slack
+        return max(0.0, (-b + math.sqrt(disc)) / var_ii) if disc >= 0 else 0.0
+
+    def add(self, ticker: str, notional: float) -> None:
+        idx = self.model.index.get(ticker)
+        if idx is None:
+            return
+        self.variance += self.marginal(ticker, notional)
+        self.weights[idx] += notional
+        self.sigma_w += notional * self.model.column(idx)
@@ -0,0 +1,156 @@
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+from zoneinfo import ZoneInfo
+
+from risk import DAILY_LOSS, CircuitBreakerState, RiskConfig, check_circuit_breaker
+
+logger = logging.getLogger(__name__)
+
+TripListener = Callable[[CircuitBreakerState], Union[Awaitable[Any], None]]
+
+OK = CircuitBreakerState(False, "ok")
+
+
+@dataclass
+class Holding:
+    qty: float
+    avg_entry: float
+    mark: float
+
+    @property
+    def unrealized(self) -> float:
+        return self.qty * (self.mark - self.avg_entry)
+
+
+class EquityTracker:
+    # Equity is kept as base + realized + unrealized so every fill or quote is an O(1) adjustment.
+    def __init__(
+        self,
+        config: RiskConfig,
+        equity: float,
+        session_open: Optional[float] = None,
+        on_trip: Optional[TripListener] = None,
+        tz: str = "America/New_York",
+    ):
+        self.config = config
+        self.on_trip = on_trip
+        self.tz = ZoneInfo(tz)
+        self.holdings: Dict[str, Holding] = {}
+        self.realized = 0.0
+        self.unrealized = 0.0
+        self.state = OK
+        self.session: Optional[date] = None
+        self._base = equity
+        self.session_open = session_open or equity
+        self.high_water = max(equity, self.session_open)
+        self._trip_task: Optional[asyncio.Future] = None
+
+    @property
+    def equity(self) -> float:
+        return self._base + self.realized + self.unrealized
+
+    @property
+    def daily_pnl(self) -> float:
+        return self.equity / self.session_open - 1 if self.session_open > 0 else 0.0
+
+    @property
+    def drawdown(self) -> float:
+        return 1 - self.equity / self.high_water if self.high_water > 0 else 0.0
+
+    def reset(
+        self,
+        equity: float,
+        holdings: Optional[Dict[str, Holding]] = None,
+        session_open: Optional[float] = None,
+    ) -> CircuitBreakerState:
+        # Re-anchor on broker truth after a reconnect; the only O(positions) path.
+        self.holdings = dict(holdings or {})
+        self.realized = 0.0
+        self.unrealized = sum(holding.unrealized for holding in self.holdings.values())
+        self._base = equity - self.unrealized
+        if session_open:
+            self.session_open = session_open
+        return self._check(None)
+
+    def on_quote(self, ticker: str, price: float, timestamp: Optional[datetime] = None) -> CircuitBreakerState:
+        holding = self.holdings.get(ticker)
+        if holding is None:
+            if timestamp is not None:
+                self._roll(timestamp)
+            return self.state
+        self.unrealized += holding.qty * (price - holding.mark)
+        holding.mark = price
+        return self._check(timestamp)
+
+    def on_fill(
+        self, ticker: str, side: str, qty: float, price: float, timestamp: Optional[datetime] = None
+    ) -> CircuitBreakerState:
+        signed = qty if side == "buy" else -qty
+        holding = self.holdings.get(ticker)
+        if holding is None:
+            holding = self.holdings[ticker] = Holding(0.0, price, price)
+        self.unrealized -= holding.unrealized
+        old = holding.qty
+        new = old + signed
+        if old and (old > 0) != (signed > 0):
+            closed = min(abs(signed), abs(old))
+            self.realized += closed * (price - holding.avg_entry) * (1 if old > 0 else -1)
+        if new == 0:
+            del self.holdings[ticker]
+            return self._check(timestamp)
+        if old == 0 or (old > 0) != (new > 0):
+            holding.avg_entry = price
+        elif abs(new) > abs(old):
+            holding.avg_entry = (holding.avg_entry * abs(old) + price * (abs(new) - abs(old))) / abs(new)
+        holding.qty = new
+        holding.mark = price
+        self.unrealized += holding.unrealized
+        return self._check(timestamp)
+
+    def clear(self) -> None:
+        self.state = OK
+
+    def _roll(self, timestamp: datetime) -> None:
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        session = timestamp.astimezone(self.tz).date()
+        if session == self.session:
+            return
+        if self.session is not None:
+            self.session_open = self.equity
+            # A daily-loss halt ends with the session; a drawdown halt stays latched until cleared.
+            if self.state.reason == DAILY_LOSS:
+                self.state = OK
+        self.session = session
+
+    def _check(self, timestamp: Optional[datetime]) -> CircuitBreakerState:
+        if timestamp is not None:
+            self._roll(timestamp)
+        equity = self.equity
+        if equity > self.high_water:
+            self.high_water = equity
+        if self.state.tripped:
+            return self.state
+        state = check_circuit_breaker(self.daily_pnl, self.drawdown, self.config)
+        if state.tripped:
+            self.state = state
+            self._fire(state)
+        return self.state
+
+    def _fire(self, state: CircuitBreakerState) -> None:
+        if self.on_trip is None:
+            return
+        result = self.on_trip(state)
+        if inspect.isawaitable(result):
+            self._trip_task = asyncio.ensure_future(result)
+            self._trip_task.add_done_callback(_log_trip_failure)
+
+
+def _log_trip_failure(task: asyncio.Future) -> None:
+    # Keep a failed halt visible instead of leaving an unretrieved task exception.
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("circuit breaker handler failed", exc_info=task.exception())
@@ -1,8 +1,14 @@
+import asyncio
+import json
+import os
+import time
 from dataclasses import dataclass
-from typing import Dict, Optional
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional
 
-from alpaca import AlpacaClient
-from rate_limiter import with_retry
+from alpaca import MARKET_TZ, AlpacaClient, session_date
+from rate_limiter import Priority, with_retry
 
 
 @dataclass
@@ -12,6 +18,137 @@ class ExecutionResult:
     message: str
 
 
+@dataclass
+class OrderSubmission:
+    key: str
+    result: ExecutionResult
+    latency: float
+
+
+class OrderLedger:
+    # Keys in these states are never sent again; "error" entries may be retried.
+    BLOCKING = ("inflight", "submitted")
+
+    def __init__(self, path: Optional[str] = None, session: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self.session = session or session_date()
+        self.entries: Dict[str, Dict[str, Optional[str]]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Lines recorded but not yet on disk, and how many records have been queued/made durable.
+        self._buffer: List[str] = []
+        self._queued = 0
+        self._durable = 0
+        self._io_lock = asyncio.Lock()
+        lines = 0
+        if self.path and self.path.exists():
+            for line in self.path.read_text().splitlines():
+                if line.strip():
+                    lines += 1
+                    entry = json.loads(line)
+                    # Keys are scoped to a session, so earlier sessions can never match again.
+                    if entry.get("session") == self.session:
+                        self.entries[entry["key"]] = entry
+        if lines > len(self.entries):
+            self.compact()
+
+    def status(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        return entry["status"] if entry else None
+
+    def waiter(self, key: str) -> Optional[asyncio.Future]:
+        return self._pending.get(key)
+
+    async def begin(self, key: str) -> None:
+        self._pending[key] = asyncio.get_running_loop().create_future()
+        self.record(key, "inflight")
+        # The intent must be on disk before the order can reach the broker.
+        await self.flush()
+
+    def finish(self, key: str, result: ExecutionResult) -> None:
+        # Synchronous so it can run while cancelled; the line goes out with the next flush.
+        self.record(key, result.status, result.order_id, result.message)
+        self._pending.pop(key).set_result(result)
+
+    def record(self, key: str, status: str, order_id: Optional[str] = None, message: str = "") -> None:
+        entry = {"key": key, "status": status, "order_id": order_id, "message": message, "session": self.session}
+        self.entries[key] = entry
+        if self.path:
+            self._buffer.append(json.dumps(entry) + "\n")
+            self._queued += 1
+
+    async def flush(self) -> None:
+        # Group commit: everything queued when the lock frees is written by one thread call with one fsync.
+        target = self._queued
+        async with self._io_lock:
+            if self._durable >= target:
+                return
+            lines, self._buffer = self._buffer, []
+            queued = self._queued
+            try:
+                await asyncio.to_thread(self._append, lines)
+            except BaseException:
+                self._buffer[:0] = lines
+                raise
+            self._durable = queued
+
+    def _append(self, lines: List[str]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as handle:
+            handle.writelines(lines)
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    async def roll(self, session: str) -> None:
+        if session == self.session:
+            return
+        self.session = session
+        self.entries = {key: entry for key, entry in self.entries.items() if key in self._pending}
+        lines = self._lines()
+        async with self._io_lock:
+            # The rewrite holds every live entry, so queued lines from the old session are dropped.
+            self._buffer = []
+            self._durable = self._queued
+            if self.path:
+                await asyncio.to_thread(self._rewrite, lines)
+
+    def compact(self) -> None:
+        if self.path:
+            self._rewrite(self._lines())
+
+    def _lines(self) -> List[str]:
+        return [json.dumps(entry) + "\n" for entry in self.entries.values()]
+
+    def _rewrite(self, lines: List[str]) -> None:
+        # Replace the append-only log with one line per live key.
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w") as handle:
+            handle.writelines(lines)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, self.path)
+
+    async def reconcile(self, client: AlpacaClient) -> int:
+        # An "inflight" entry left by a crash may or may not have reached the broker; ask it.
+        inflight = [
+            key for key, entry in self.entries.items() if entry["status"] == "inflight" and key not in self._pending
+        ]
+        if not inflight:
+            return 0
+        start = datetime.combine(date.fromisoformat(self.session), datetime.min.time(), MARKET_TZ)
+        orders = await client.list_orders("all", after=start.isoformat())
+        placed = {order.get("client_order_id"): order for order in orders}
+        for key in inflight:
+            order = placed.get(key)
+            if order is not None:
+                self.record(key, "submitted", order["id"], "reconciled")
+            else:
+                # Safe to retry: the broker rejects a reused client_order_id if the order did land.
+                self.record(key, "error", None, "not found at broker")
+        await self.flush()
+        return len(inflight)
+
+
 def build_bracket_order(
     ticker: str,
     qty: int,
@@ -32,9 +169,11 @@ def build_bracket_order(
     }
 
 
-async def place_order(client: AlpacaClient, order: Dict[str, object]) -> ExecutionResult:
+async def place_order(
+    client: AlpacaClient, order: Dict[str, object], client_order_id: Optional[str] = None
+) -> ExecutionResult:
     try:
-        response = await with_retry(client.submit_order, order)
+        response = await with_retry(client.submit_order, order, client_order_id)
         return ExecutionResult(response.get("id"), "submitted", "ok")
     except Exception as exc:
         return ExecutionResult(None, "error", str(exc))
@@ -42,8 +181,51 @@ async def place_order(client: AlpacaClient, order: Dict[str, object]) -> Executi
 
 async def flatten_all(client: AlpacaClient) -> ExecutionResult:
     try:
-        response = await with_retry(client._request, "DELETE", "/v2/positions")
+        # Open orders are cancelled first so resting entries and brackets cannot reopen positions.
+        response = await with_retry(
+            client._request, "DELETE", "/v2/positions", params={"cancel_orders": "true"}, priority=Priority.ORDERS
+        )
         response.raise_for_status()
         return ExecutionResult(None, "submitted", "flattened")
     except Exception as exc:
         return ExecutionResult(None, "error", str(exc))
+
+
+async def submit_orders(
+    client: AlpacaClient,
+    orders: List[Dict[str, object]],
+    ledger: OrderLedger,
+    concurrency: int = 8,
+) -> List[OrderSubmission]:
+    semaphore = asyncio.Semaphore(concurrency)
+    await ledger.roll(session_date())
+
+    async def submit(order: Dict[str, object]) -> OrderSubmission:
+        key = client.build_idempotency_key(order, ledger.session)
+        waiter = ledger.waiter(key)
+        if waiter is not None:
+            first = await asyncio.shield(waiter)
+            return OrderSubmission(key, ExecutionResult(first.order_id, "duplicate", "already in flight"), 0.0)
+        status = ledger.status(key)
+        if status in OrderLedger.BLOCKING:
+            entry = ledger.entries[key]
+            return OrderSubmission(key, ExecutionResult(entry["order_id"], "duplicate", f"already {status}"), 0.0)
+
+        # Until the broker answers the order may or may not have landed; reconcile settles it.
+        result = ExecutionResult(None, "inflight", "submission interrupted")
+        latency = 0.0
+        try:
+            await ledger.begin(key)
+            async with semaphore:
+                started = time.perf_counter()
+                result = await place_order(client, order, key)
+                latency = time.perf_counter() - started
+        finally:
+            # Always resolve the waiter, even when cancelled, so duplicates of this key cannot hang.
+            ledger.finish(key, result)
+        return OrderSubmission(key, result, latency)
+
+    try:
+        return list(await asyncio.gather(*(submit(order) for order in orders)))
+    finally:
+        await ledger.flush()
@@ -0,0 +1,226 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from instrumentation import timed
+from scanner import FEATURE_COLUMNS, FeatureSnapshot
+
+
+@dataclass
+class Bar:
+    ticker: str
+    timestamp: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+@dataclass(frozen=True)
+class FeatureParams:
+    volume_window: int = 20
+    atr_fast: int = 5
+    atr_slow: int = 20
+    ma_fast: int = 10
+    ma_slow: int = 30
+
+
+class RollingWindow:
+    __slots__ = ("size", "values", "index", "count", "total")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = [0.0] * size
+        self.index = 0
+        self.count = 0
+        self.total = 0.0
+
+    def push(self, value: float) -> None:
+        self.total += value - self.values[self.index]
+        self.values[self.index] = value
+        self.index += 1
+        if self.count < self.size:
+            self.count += 1
+        if self.index == self.size:
+            # Re-sum once per wrap so floating-point drift can't accumulate.
+            self.index = 0
+            self.total = sum(self.values)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class SymbolState:
+    __slots__ = (
+        "volume",
+        "tr_fast",
+        "tr_slow",
+        "ma_fast",
+        "ma_slow",
+        "session",
+        "session_open",
+        "prior_close",
+        "last_close",
+        "pv",
+        "cum_volume",
+    )
+
+    def __init__(self, params: FeatureParams):
+        self.volume = RollingWindow(params.volume_window)
+        self.tr_fast = RollingWindow(params.atr_fast)
+        self.tr_slow = RollingWindow(params.atr_slow)
+        self.ma_fast = RollingWindow(params.ma_fast)
+        self.ma_slow = RollingWindow(params.ma_slow)
+        self.session: Optional[date] = None
+        self.session_open = 0.0
+        self.prior_close: Optional[float] = None
+        self.last_close: Optional[float] = None
+        self.pv = 0.0
+        self.cum_volume = 0.0
+
+    def update(self, bar: Bar) -> FeatureSnapshot:
+        session = bar.timestamp.date()
+        if session != self.session:
+            self.session = session
+            self.session_open = bar.open
+            self.prior_close = self.last_close
+            self.pv = 0.0
+            self.cum_volume = 0.0
+
+        prev_close = self.last_close if self.last_close is not None else bar.open
+        true_range = max(bar.high, prev_close) - min(bar.low, prev_close)
+        self.tr_fast.push(true_range)
+        self.tr_slow.push(true_range)
+        self.volume.push(bar.volume)
+        self.ma_fast.push(bar.close)
+        self.ma_slow.push(bar.close)
+        self.pv += (bar.high + bar.low + bar.close) / 3 * bar.volume
+        self.cum_volume += bar.volume
+        self.last_close = bar.close
+
+        mean_volume = self.volume.mean
+        atr_slow = self.tr_slow.mean
+        vwap = self.pv / self.cum_volume if self.cum_volume else bar.close
+        ma_fast = self.ma_fast.mean
+        alignment = (
+            int(bar.close > vwap) + int(bar.close > ma_fast) + int(ma_fast > self.ma_slow.mean)
+        ) / 3
+        return FeatureSnapshot(
+            ticker=bar.ticker,
+            volume_surge=bar.volume / mean_volume if mean_volume else 0.0,
+            gap_pct=(self.session_open - self.prior_close) / self.prior_close if self.prior_close else 0.0,
+            volatility_expansion=self.tr_fast.mean / atr_slow - 1 if atr_slow else 0.0,
+            trend_alignment=alignment,
+        )
+
+
+class FeatureEngine:
+    def __init__(self, params: FeatureParams = FeatureParams()):
+        self.params = params
+        self._states: Dict[str, SymbolState] = {}
+        self.latest: Dict[str, FeatureSnapshot] = {}
+
+    @timed("feature_update")
+    def update(self, bars: Iterable[Bar]) -> List[FeatureSnapshot]:
+        changed: Dict[str, FeatureSnapshot] = {}
+        for bar in bars:
+            state = self._states.get(bar.ticker)
+            if state is None:
+                state = self._states[bar.ticker] = SymbolState(self.params)
+            changed[bar.ticker] = state.update(bar)
+        self.latest.update(changed)
+        return list(changed.values())
+
+    def last_close(self, ticker: str) -> Optional[float]:
+        state = self._states.get(ticker)
+        return state.last_close if state is not None else None
+
+    def drop(self, tickers: Iterable[str]) -> None:
+        for ticker in tickers:
+            self._states.pop(ticker, None)
+            self.latest.pop(ticker, None)
+
+    def levels(self, tickers: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        states = [self._states[ticker] for ticker in tickers]
+        closes = np.array([state.last_close for state in states], dtype=float)
+        atrs = np.array([state.tr_slow.mean for state in states], dtype=float)
+        return closes, atrs
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    # NaN rows (a symbol not yet listed) count as missing instead of poisoning every later sum.
+    valid = ~np.isnan(values)
+    totals = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    totals[window:] = totals[window:] - totals[:-window].copy()
+    counts[window:] = counts[window:] - counts[:-window].copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+def true_range_panel(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    prev_close = np.empty_like(close)
+    prev_close[0] = open_[0]
+    prev_close[1:] = close[:-1]
+    prev_close = np.where(np.isnan(prev_close), open_, prev_close)
+    return np.maximum(high, prev_close) - np.minimum(low, prev_close)
+
+
+def compute_feature_panel(
+    open_: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    volume: np.ndarray,
+    session_start: Optional[np.ndarray] = None,
+    params: FeatureParams = FeatureParams(),
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    total = len(close)
+    if session_start is None:
+        session_start = np.zeros(total, dtype=bool)
+    session_start = session_start.copy()
+    session_start[0] = True
+    rows = np.arange(total)
+    start_row = np.maximum.accumulate(np.where(session_start, rows, 0))
+
+    # Columns are valid from their first bar; earlier rows are masked from every rolling sum.
+    listed = np.maximum.accumulate(~np.isnan(close), axis=0)
+
+    true_range = true_range_panel(open_, high, low, close)
+    atr_slow = rolling_mean(true_range, params.atr_slow)
+    mean_volume = rolling_mean(np.where(listed, volume, np.nan), params.volume_window)
+    ma_fast = rolling_mean(close, params.ma_fast)
+    ma_slow = rolling_mean(close, params.ma_slow)
+
+    pv = np.cumsum(np.where(listed, (high + low + close) / 3 * volume, 0.0), axis=0)
+    cum_volume = np.cumsum(np.where(listed, volume, 0.0), axis=0)
+    base = start_row - 1
+    has_base = (base >= 0)[:, None]
+    pv = pv - np.where(has_base, pv[base], 0.0)
+    cum_volume = cum_volume - np.where(has_base, cum_volume[base], 0.0)
+
+    prior_close = np.where(has_base, close[base], np.nan)
+    session_open = open_[start_row]
+
+    # `out` lets callers fill a preallocated (e.g. shared-memory) block instead of copying the result.
+    panel = out if out is not None else np.empty(close.shape + (len(FEATURE_COLUMNS),))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vwap = np.where(cum_volume > 0, pv / cum_volume, close)
+        panel[..., 0] = np.where(mean_volume > 0, volume / mean_volume, 0.0)
+        panel[..., 1] = np.nan_to_num((session_open - prior_close) / prior_close, nan=0.0, posinf=0.0, neginf=0.0)
+        panel[..., 2] = np.where(atr_slow > 0, rolling_mean(true_range, params.atr_fast) / atr_slow - 1, 0.0)
+    panel[..., 3] = ((close > vwap).astype(float) + (close > ma_fast) + (ma_fast > ma_slow)) / 3
+    panel[~listed] = np.nan
+    return panel
+
+
+def session_starts(timestamps: np.ndarray) -> np.ndarray:
+    days = np.asarray(timestamps, dtype=np.int64) // (86_400 * 10**9)
+    starts = np.ones(len(days), dtype=bool)
+    starts[1:] = days[1:] != days[:-1]
+    return starts
@@ -0,0 +1,123 @@
+import functools
+import inspect
+import os
+import time
+from pathlib import Path
+from typing import Callable, TypeVar
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, start_http_server
+
+F = TypeVar("F", bound=Callable)
+
+REGISTRY = CollectorRegistry()
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+STAGE_SECONDS = Histogram(
+    "worker_stage_seconds", "Time spent in hot-path functions", ["stage"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+REQUEST_SECONDS = Histogram(
+    "alpaca_request_seconds",
+    "Alpaca HTTP round trip per attempt",
+    ["method", "status"],
+    buckets=LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+RATE_LIMIT_WAIT = Histogram(
+    "rate_limiter_wait_seconds",
+    "Time spent waiting for a rate-limit token",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+RETRIES = Counter("retries_total", "Retried attempts by cause", ["reason"], registry=REGISTRY)
+RETRIES_EXHAUSTED = Counter(
+    "retries_exhausted_total", "Calls that failed after their retry allowance or budget ran out", registry=REGISTRY
+)
+QUEUE_DEPTH = Gauge("live_queue_depth", "Ticks waiting in front of a live stage", ["stage"], registry=REGISTRY)
+TICKS_DROPPED = Counter("live_ticks_dropped_total", "Superseded or stale ticks dropped", ["stage"], registry=REGISTRY)
+LIVE_LATENCY = Histogram(
+    "live_latency_seconds",
+    "Bar arrival to stage completion",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+
+_enabled = os.getenv("WORKER_METRICS", "true").lower() != "false"
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(flag: bool) -> None:
+    global _enabled
+    _enabled = flag
+
+
+def timed(stage: str) -> Callable[[F], F]:
+    # Bind the labelled child once so the hot path skips the label lookup.
+    child = STAGE_SECONDS.labels(stage)
+
+    def decorate(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def timed_async(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - started)
+
+            return timed_async
+
+        @functools.wraps(func)
+        def timed_sync(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+
+        return timed_sync
+
+    return decorate
+
+
+def observe(histogram: Histogram, value: float, *labels: str) -> None:
+    if _enabled:
+        histogram.labels(*labels).observe(value)
+
+
+def increment(counter: Counter, *labels: str) -> None:
+    if _enabled:
+        (counter.labels(*labels) if labels else counter).inc()
+
+
+def set_gauge(gauge: Gauge, value: float, *labels: str) -> None:
+    if _enabled:
+        gauge.labels(*labels).set(value)
+
+
+def render() -> bytes:
+    return generate_latest(REGISTRY)
+
+
+def dump(path: str) -> Path:
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(target.suffix + ".tmp")
+    tmp.write_bytes(render())
+    tmp.replace(target)
+    return target
+
+
+def serve(port: int, addr: str = "0.0.0.0") -> None:
+    start_http_server(port, addr, registry=REGISTRY)
@@ -0,0 +1,448 @@
+import asyncio
+import inspect
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import websockets
+
+import instrumentation
+from alpaca import AlpacaClient
+from certainty import CertaintyInputs, certainty_score, expected_value
+from config import Settings, check_trading_mode
+from covariance import PortfolioVariance, RollingCovariance
+from equity import EquityTracker, Holding
+from execution import OrderLedger, build_bracket_order, flatten_all, submit_orders
+from features import Bar, FeatureEngine, FeatureParams
+from rate_limiter import RetryPolicy
+from risk import CircuitBreakerState, RiskConfig, allocate_trades
+from scanner import SCORE_WEIGHTS, TOP_K, features_to_matrix, score_matrix, top_k_indices
+from signals import ensemble_signals_batch
+from trade_stream import STREAM_ERRORS, TradeBook
+
+logger = logging.getLogger(__name__)
+
+StageFunc = Callable[["Tick"], Union[Awaitable[Optional[bool]], Optional[bool]]]
+Publish = Callable[[str, Any], Awaitable[Any]]
+
+
+@dataclass
+class Tick:
+    seq: int
+    bars: List[Bar]
+    arrived: float
+    stamps: Dict[str, float] = field(default_factory=dict)
+    data: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def age(self) -> float:
+        return time.perf_counter() - self.arrived
+
+    def merge(self, later: "Tick") -> "Tick":
+        # Latency is measured from the oldest bar in the batch.
+        return Tick(later.seq, self.bars + later.bars, min(self.arrived, later.arrived))
+
+
+@dataclass
+class Stage:
+    name: str
+    func: StageFunc
+    coalesce: bool = False
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 10_000):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+        samples.append(seconds)
+        instrumentation.observe(instrumentation.LIVE_LATENCY, seconds, name)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for name, samples in self._samples.items():
+            if samples:
+                p50, p99 = np.percentile(np.fromiter(samples, dtype=float), [50, 99]) * 1000
+                report[name] = {"count": len(samples), "p50_ms": float(p50), "p99_ms": float(p99)}
+        return report
+
+
+class LivePipeline:
+    def __init__(
+        self,
+        source: AsyncIterable[List[Bar]],
+        stages: Sequence[Stage],
+        queue_size: int = 1,
+        inbox_size: int = 1024,
+        max_age: float = 5.0,
+        latency: Optional[LatencyTracker] = None,
+    ):
+        self.source = source
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.inbox_size = inbox_size
+        self.max_age = max_age
+        self.latency = latency or LatencyTracker()
+        self.processed = {stage.name: 0 for stage in self.stages}
+        self.dropped = {stage.name: 0 for stage in self.stages}
+        self.errors = {stage.name: 0 for stage in self.stages}
+
+    async def run(self) -> None:
+        queues = [
+            asyncio.Queue(self.inbox_size if stage.coalesce else self.queue_size) for stage in self.stages
+        ]
+        tasks = [asyncio.create_task(self._read(queues[0]))]
+        for idx, stage in enumerate(self.stages):
+            last = idx + 1 == len(self.stages)
+            outbox = None if last else queues[idx + 1]
+            receiver = None if last else self.stages[idx + 1]
+            tasks.append(asyncio.create_task(self._stage(stage, queues[idx], outbox, receiver)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _offer(self, queue: asyncio.Queue, tick: Optional[Tick], receiver: Stage) -> None:
+        # Stateful (coalescing) stages must see every bar, so the producer waits for room. Everything after
+        # works on the latest state, where a newer tick supersedes one still waiting.
+        if tick is None or receiver.coalesce:
+            await queue.put(tick)
+            return
+        if queue.full():
+            queue.get_nowait()
+            self._drop(receiver.name)
+        queue.put_nowait(tick)
+        instrumentation.set_gauge(instrumentation.QUEUE_DEPTH, queue.qsize(), receiver.name)
+
+    def _drop(self, name: str) -> None:
+        self.dropped[name] += 1
+        instrumentation.increment(instrumentation.TICKS_DROPPED, name)
+
+    async def _read(self, inbox: asyncio.Queue) -> None:
+        seq = 0
+        async for bars in self.source:
+            seq += 1
+            await self._offer(inbox, Tick(seq, list(bars), time.perf_counter()), self.stages[0])
+        await self._offer(inbox, None, self.stages[0])
+
+    async def _stage(
+        self, stage: Stage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue], receiver: Optional[Stage]
+    ) -> None:
+        finished = False
+        while not finished:
+            tick = await inbox.get()
+            if tick is None:
+                break
+            if stage.coalesce:
+                while not inbox.empty():
+                    later = inbox.get_nowait()
+                    if later is None:
+                        finished = True
+                        break
+                    tick = tick.merge(later)
+            elif tick.age > self.max_age:
+                self._drop(stage.name)
+                continue
+            instrumentation.set_gauge(instrumentation.QUEUE_DEPTH, inbox.qsize(), stage.name)
+            try:
+                result = stage.func(tick)
+                if inspect.isawaitable(result):
+                    result = await result
+            except Exception:
+                self.errors[stage.name] += 1
+                logger.exception("live stage %s failed on tick %d", stage.name, tick.seq)
+                continue
+            now = time.perf_counter()
+            tick.stamps[stage.name] = now
+            self.processed[stage.name] += 1
+            self.latency.record(stage.name, now - tick.arrived)
+            if outbox is not None and result is not False:
+                await self._offer(outbox, tick, receiver)
+        if outbox is not None:
+            await self._offer(outbox, None, receiver)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency.summary(),
+            "processed": dict(self.processed),
+            "dropped": dict(self.dropped),
+            "errors": dict(self.errors),
+        }
+
+
+class LiveTrader:
+    def __init__(
+        self,
+        client: AlpacaClient,
+        settings: Settings,
+        book: TradeBook,
+        ledger: OrderLedger,
+        equity: float,
+        sectors: Optional[Dict[str, str]] = None,
+        top_k: int = TOP_K,
+        regime_score: float = 0.5,
+        calibration_score: float = 0.5,
+        resubmit_after: float = 300.0,
+        publish: Optional[Publish] = None,
+        latency: Optional[LatencyTracker] = None,
+        session_open: Optional[float] = None,
+        covariance: Optional[RollingCovariance] = None,
+        flatten_backoff: Optional[RetryPolicy] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+    ):
+        # Refuse to build a trader that could send orders to a live account without the opt-ins.
+        check_trading_mode(settings)
+        self.client = client
+        self.book = book
+        self.ledger = ledger
+        self.sectors = sectors or {}
+        self.top_k = top_k
+        self.regime_score = regime_score
+        self.calibration_score = calibration_score
+        self.resubmit_after = resubmit_after
+        self.publish = publish
+        self.latency = latency or LatencyTracker()
+        self.covariance = covariance
+        self.flatten_backoff = flatten_backoff or RetryPolicy(base_delay=0.5, max_delay=30.0)
+        # Parameters of the active research bundle override the defaults they were tuned against.
+        parameters = parameters or {}
+        feature_params = {item.name: parameters[item.name] for item in fields(FeatureParams) if item.name in parameters}
+        self.engine = FeatureEngine(FeatureParams(**feature_params))
+        self.weights = np.asarray(parameters.get("weights", SCORE_WEIGHTS), dtype=float)
+        self.config = RiskConfig(
+            base_risk=settings.base_risk,
+            c_min=float(parameters.get("c_min", settings.c_min)),
+            max_positions=settings.max_positions,
+            max_gross_exposure=settings.max_gross_exposure,
+            sector_concentration=settings.sector_concentration,
+            daily_max_loss=settings.daily_max_loss,
+            drawdown_max=settings.drawdown_max,
+            max_portfolio_vol=settings.max_portfolio_vol,
+            stop_mult=parameters.get("stop_mult"),
+            target_mult=parameters.get("target_mult"),
+        )
+        self.tracker = EquityTracker(self.config, equity, session_open, on_trip=self._halt)
+        book.fill_listeners.append(self.tracker.on_fill)
+        self._submitted: Dict[str, float] = {}
+
+    @property
+    def equity(self) -> float:
+        return self.tracker.equity
+
+    def stages(self) -> List[Stage]:
+        return [
+            Stage("features", self.features, coalesce=True),
+            Stage("signals", self.signals),
+            Stage("risk", self.risk),
+            Stage("execute", self.execute),
+        ]
+
+    def features(self, tick: Tick) -> bool:
+        for bar in tick.bars:
+            self.tracker.on_quote(bar.ticker, bar.close, bar.timestamp)
+        if self.covariance is not None:
+            self.covariance.observe(tick.bars)
+        return bool(self.engine.update(tick.bars)) and not self.tracker.state.tripped
+
+    def signals(self, tick: Tick) -> bool:
+        latest = list(self.engine.latest.values())
+        matrix = features_to_matrix(latest)
+        scores = score_matrix(matrix, self.weights)
+        top = top_k_indices(scores, self.top_k)
+        tickers = [latest[idx].ticker for idx in top]
+        batch = ensemble_signals_batch(tickers, matrix[top])
+        inputs = CertaintyInputs(np.clip(scores[top], 0.0, 1.0), 0.0, self.regime_score, self.calibration_score)
+        certainty = certainty_score(batch.confidence, inputs)
+        keep = np.flatnonzero(certainty >= self.config.c_min)
+        if not len(keep):
+            return False
+        tick.data["tickers"] = [tickers[idx] for idx in keep]
+        tick.data["certainty"] = certainty[keep]
+        tick.data["rationale"] = [
+            [signal.rationale for signal in batch.signals_for(idx) if signal.confidence > 0] for idx in keep
+        ]
+        return True
+
+    def _busy(self) -> set:
+        now = time.monotonic()
+        recent = {ticker for ticker, at in self._submitted.items() if now - at < self.resubmit_after}
+        working = {state.ticker for state in self.book.orders.values() if state.is_open}
+        return recent | working | set(self.book.positions)
+
+    async def risk(self, tick: Tick) -> bool:
+        # The breaker can trip on a fill or quote while this tick waits between stages.
+        if self.tracker.state.tripped:
+            return False
+        # Names already working or held must not take slots, gross, sector or variance room.
+        busy = self._busy()
+        keep = [idx for idx, ticker in enumerate(tick.data["tickers"]) if ticker not in busy]
+        if not keep:
+            return False
+        tick.data["tickers"] = [tick.data["tickers"][idx] for idx in keep]
+        tick.data["certainty"] = tick.data["certainty"][keep]
+        tick.data["rationale"] = [tick.data["rationale"][idx] for idx in keep]
+        tickers = tick.data["tickers"]
+        certainty = tick.data["certainty"]
+        entries, atrs = self.engine.levels(tickers)
+        sectors = [self.sectors.get(ticker, "unknown") for ticker in tickers]
+        portfolio = None
+        if self.covariance is not None and self.covariance.ready and self.config.max_portfolio_vol:
+            portfolio = PortfolioVariance(self.covariance, self.book.exposures(self.engine.last_close))
+        decisions = allocate_trades(
+            self.equity,
+            entries,
+            atrs,
+            certainty,
+            sectors,
+            self.config,
+            **self.book.risk_inputs(self.sectors, self.engine.last_close),
+            tickers=tickers,
+            portfolio=portfolio,
+        )
+        if self.publish is not None:
+            await self._publish("candidates", self._candidates(tick, entries, decisions))
+        tick.data["orders"] = [
+            build_bracket_order(
+                ticker, decision.qty, round(float(entry), 2), round(decision.stop, 2), round(decision.target, 2)
+            )
+            for ticker, entry, decision in zip(tickers, entries, decisions)
+            if decision.allowed
+        ]
+        return bool(tick.data["orders"])
+
+    def _candidates(self, tick: Tick, entries: np.ndarray, decisions: list) -> List[Dict[str, Any]]:
+        timestamp = datetime.now(timezone.utc)
+        records = []
+        for ticker, entry, certainty, rationale, decision in zip(
+            tick.data["tickers"], entries.tolist(), tick.data["certainty"].tolist(), tick.data["rationale"], decisions
+        ):
+            edge = certainty * (decision.target - entry) - (1 - certainty) * (entry - decision.stop)
+            records.append(
+                {
+                    "ticker": ticker,
+                    "side": "buy",
+                    "entry_hint": entry,
+                    "stop": decision.stop,
+                    "target": decision.target,
+                    "ev": expected_value(edge, 0.0),
+                    "certainty": certainty,
+                    "rationale": rationale + [decision.rationale],
+                    "timestamp": timestamp,
+                }
+            )
+        return records
+
+    async def execute(self, tick: Tick) -> None:
+        orders = tick.data["orders"]
+        if self.tracker.state.tripped:
+            logger.warning("circuit breaker tripped; dropping %d orders", len(orders))
+            return
+        for order in orders:
+            self._submitted[order["symbol"]] = time.monotonic()
+        submissions = await submit_orders(self.client, orders, self.ledger)
+        done = time.perf_counter()
+        for submission in submissions:
+            if submission.result.status == "submitted":
+                self.latency.record("bar_to_order", done - tick.arrived)
+
+    async def _halt(self, state: CircuitBreakerState) -> None:
+        logger.warning("circuit breaker tripped (%s); flattening all positions", state.reason)
+        attempt = 0
+        while True:
+            result = await flatten_all(self.client)
+            if result.status == "submitted" or not self.book.positions:
+                break
+            attempt += 1
+            delay = self.flatten_backoff.delay(attempt)
+            logger.error("flatten after circuit breaker failed (%s); retrying in %.1fs", result.message, delay)
+            await asyncio.sleep(delay)
+        if self.publish is not None:
+            await self._publish("risk", self.risk_record())
+
+    async def resync_equity(self, book: TradeBook) -> None:
+        account = await self.client.get_account()
+        holdings = {
+            ticker: Holding(state.qty, state.avg_entry, state.mark) for ticker, state in book.positions.items()
+        }
+        self.tracker.reset(float(account["equity"]), holdings, float(account.get("last_equity") or 0) or None)
+
+    def risk_record(self) -> Dict[str, Any]:
+        return {
+            "equity": self.tracker.equity,
+            "gross_exposure": self.book.risk_inputs(self.sectors, self.engine.last_close)["gross_exposure"],
+            "max_positions": self.config.max_positions,
+            "daily_loss_limit": self.config.daily_max_loss,
+            "drawdown_limit": self.config.drawdown_max,
+            "circuit_breaker_tripped": self.tracker.state.tripped,
+        }
+
+    async def publish_book(self, book: TradeBook) -> None:
+        if self.publish is not None:
+            await self._publish("orders", book.order_records())
+            await self._publish("positions", book.position_records())
+            await self._publish("risk", self.risk_record())
+
+    async def _publish(self, resource: str, data: Any) -> None:
+        try:
+            await self.publish(resource, data)
+        except Exception as exc:
+            # Publishing is best effort; trading never waits on the dashboard.
+            logger.warning("publishing %s failed: %s", resource, exc)
+
+
+async def stream_bars(
+    settings: Settings, symbols: Sequence[str], url: Optional[str] = None, backoff: Optional[RetryPolicy] = None
+) -> AsyncIterator[List[Bar]]:
+    backoff = backoff or RetryPolicy(base_delay=0.5, max_delay=30.0)
+    failures = 0
+    while True:
+        try:
+            async with websockets.connect(url or settings.alpaca_stream_url, open_timeout=10) as socket:
+                await socket.send(
+                    json.dumps(
+                        {"action": "auth", "key": settings.alpaca_api_key, "secret": settings.alpaca_api_secret}
+                    )
+                )
+                await socket.send(json.dumps({"action": "subscribe", "bars": list(symbols)}))
+                failures = 0
+                async for raw in socket:
+                    try:
+                        messages = json.loads(raw)
+                    except ValueError as exc:
+                        logger.warning("skipping undecodable market data frame: %s", exc)
+                        continue
+                    bars = []
+                    for message in messages:
+                        kind = message.get("T")
+                        if kind == "error":
+                            raise RuntimeError(f"market data stream error {message.get('code')}: {message.get('msg')}")
+                        if kind == "b":
+                            bars.append(
+                                Bar(
+                                    ticker=message["S"],
+                                    timestamp=datetime.fromisoformat(message["t"]),
+                                    open=message["o"],
+                                    high=message["h"],
+                                    low=message["l"],
+                                    close=message["c"],
+                                    volume=message["v"],
+                                )
+                            )
+                    if bars:
+                        yield bars
+        except STREAM_ERRORS:
+            failures += 1
+        except Exception:
+            logger.exception("market data stream failed; reconnecting")
+            failures += 1
+        await asyncio.sleep(backoff.delay(max(1, failures)))
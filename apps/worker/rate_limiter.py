@@ -1,7 +1,17 @@
 import asyncio
+import random
 import time
-from dataclasses import dataclass
-from typing import Callable
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
+
+import httpx
+
+import instrumentation
 
 
 @dataclass
@@ -10,40 +20,236 @@ class RateLimitResult:
     wait_time: float
 
 
+class Priority(IntEnum):
+    ORDERS = 0
+    DEFAULT = 1
+    BULK = 2
+
+
+class LocalTokenStore:
+    def __init__(self):
+        self._state: Dict[str, Tuple[float, float]] = {}
+
+    async def take(self, key: str, capacity: float, refill_rate: float) -> float:
+        now = time.monotonic()
+        tokens, last = self._state.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - last) * refill_rate)
+        if tokens >= 1:
+            self._state[key] = (tokens - 1, now)
+            return 0.0
+        self._state[key] = (tokens, now)
+        return (1 - tokens) / refill_rate
+
+
+class RedisTokenStore:
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+    return tostring(wait)
+    """
+
+    def __init__(self, redis):
+        self._script = redis.register_script(self.SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisTokenStore":
+        from redis import asyncio as redis_asyncio
+
+        return cls(redis_asyncio.from_url(url))
+
+    async def take(self, key: str, capacity: float, refill_rate: float) -> float:
+        return float(await self._script(keys=[key], args=[capacity, refill_rate]))
+
+
+TokenStore = Union[LocalTokenStore, RedisTokenStore]
+
+
 class TokenBucket:
-    def __init__(self, rate_per_minute: int):
-        self.capacity = rate_per_minute
-        self.tokens = rate_per_minute
+    def __init__(
+        self,
+        rate_per_minute: int,
+        capacity: Optional[int] = None,
+        store: Optional[TokenStore] = None,
+        key: str = "alpaca:rate",
+    ):
+        self.capacity = capacity or rate_per_minute
         self.refill_rate = rate_per_minute / 60.0
-        self.last_check = time.monotonic()
-        self._lock = asyncio.Lock()
-
-    async def acquire(self) -> RateLimitResult:
-        async with self._lock:
-            now = time.monotonic()
-            elapsed = now - self.last_check
-            self.last_check = now
-            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
-            if self.tokens >= 1:
-                self.tokens -= 1
+        self.key = key
+        self._store = store or LocalTokenStore()
+        self._lanes: List[Deque[asyncio.Future]] = [deque() for _ in Priority]
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def waiting(self) -> int:
+        return sum(len(lane) for lane in self._lanes)
+
+    async def try_acquire(self) -> RateLimitResult:
+        if self.waiting():
+            return RateLimitResult(False, 1 / self.refill_rate)
+        wait_time = await self._store.take(self.key, self.capacity, self.refill_rate)
+        return RateLimitResult(wait_time == 0, wait_time)
+
+    async def acquire(self, priority: Priority = Priority.DEFAULT) -> RateLimitResult:
+        if not self.waiting():
+            if await self._store.take(self.key, self.capacity, self.refill_rate) == 0:
+                instrumentation.observe(instrumentation.RATE_LIMIT_WAIT, 0.0, priority.name.lower())
                 return RateLimitResult(True, 0.0)
-            wait_time = (1 - self.tokens) / self.refill_rate
-            return RateLimitResult(False, wait_time)
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._lanes[priority].append(future)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+        waited = time.monotonic() - started
+        instrumentation.observe(instrumentation.RATE_LIMIT_WAIT, waited, priority.name.lower())
+        return RateLimitResult(True, waited)
+
+    def _next_lane(self) -> Optional[Deque[asyncio.Future]]:
+        # Highest-priority lane first; FIFO within a lane. Cancelled waiters are skipped.
+        for lane in self._lanes:
+            while lane and lane[0].done():
+                lane.popleft()
+            if lane:
+                return lane
+        return None
+
+    async def _dispatch(self) -> None:
+        while self._next_lane() is not None:
+            wait_time = await self._store.take(self.key, self.capacity, self.refill_rate)
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+                continue
+            lane = self._next_lane()
+            if lane is not None:
+                lane.popleft().set_result(None)
+
+
+RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    jitter: bool = True
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class RetryBudget:
+    def __init__(self, max_retries: int = 30, window: float = 60.0):
+        self.max_retries = max_retries
+        self.window = window
+        self._spent: Deque[float] = deque()
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        while self._spent and now - self._spent[0] > self.window:
+            self._spent.popleft()
+        if len(self._spent) >= self.max_retries:
+            return False
+        self._spent.append(now)
+        return True
+
+
+DEFAULT_RETRY_BUDGET = RetryBudget()
+
+
+@dataclass
+class _CallBudget:
+    remaining: int
+    policy: RetryPolicy
+    budget: RetryBudget
+
+
+_active_call: ContextVar[Optional[_CallBudget]] = ContextVar("active_retry_call", default=None)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    return isinstance(exc, (httpx.TransportError, asyncio.TimeoutError, ConnectionError))
+
+
+def retry_reason(exc: BaseException) -> str:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return str(exc.response.status_code)
+    return type(exc).__name__
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    header = response.headers.get("Retry-After") if response is not None else None
+    if not header:
+        return None
+    try:
+        return max(0.0, float(header))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
 
 
 async def with_retry(
     func: Callable,
     *args,
-    retries: int = 3,
-    backoff: float = 0.5,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None,
+    policy: Optional[RetryPolicy] = None,
+    budget: Optional[RetryBudget] = None,
     **kwargs,
 ):
-    attempt = 0
-    while True:
-        try:
-            return await func(*args, **kwargs)
-        except Exception:
-            attempt += 1
-            if attempt > retries:
-                raise
-            await asyncio.sleep(backoff * attempt)
+    policy = policy or RetryPolicy()
+    if retries is not None or backoff is not None:
+        policy = replace(
+            policy,
+            max_retries=policy.max_retries if retries is None else retries,
+            base_delay=policy.base_delay if backoff is None else backoff,
+        )
+    # Nested wrappers (e.g. place_order -> submit_order -> _request) run under the outermost call's
+    # policy and retry allowance instead of multiplying them.
+    call = _active_call.get()
+    token = None
+    if call is None:
+        call = _CallBudget(policy.max_retries, policy, budget or DEFAULT_RETRY_BUDGET)
+        token = _active_call.set(call)
+    try:
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as exc:
+                if not is_retryable(exc):
+                    raise
+                if call.remaining <= 0 or not call.budget.try_spend():
+                    instrumentation.increment(instrumentation.RETRIES_EXHAUSTED)
+                    raise
+                instrumentation.increment(instrumentation.RETRIES, retry_reason(exc))
+                call.remaining -= 1
+                attempt = call.policy.max_retries - call.remaining
+                await asyncio.sleep(call.policy.delay(attempt, retry_after(exc)))
+    finally:
+        if token is not None:
+            _active_call.reset(token)
@@ -0,0 +1,173 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from bundle import Bundle
+from bundle_schema import METRIC_COLUMNS, SORT_COLUMNS, pack_payload, unpack_payload
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS payloads (
+    hash TEXT PRIMARY KEY,
+    body BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bundles (
+    bundle_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    promoted INTEGER NOT NULL DEFAULT 0,
+    active INTEGER NOT NULL DEFAULT 0,
+    sharpe REAL,
+    max_drawdown REAL,
+    trades INTEGER,
+    win_rate REAL,
+    holdout_sharpe REAL,
+    payload_hash TEXT NOT NULL REFERENCES payloads (hash)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS bundles_single_active ON bundles (active) WHERE active = 1;
+""" + "".join(
+    f"CREATE INDEX IF NOT EXISTS bundles_by_{column} ON bundles ({column}, bundle_id);\n" for column in SORT_COLUMNS
+)
+
+
+@dataclass
+class BundleRecord:
+    bundle_id: str
+    name: str
+    created_at: str
+    promoted: bool
+    active: bool
+    metrics: Dict[str, Optional[float]]
+    holdout_sharpe: Optional[float]
+    payload_hash: str
+
+
+def encode_payload(bundle: Bundle) -> Tuple[str, bytes]:
+    payload = {
+        "parameters": bundle.parameters,
+        "metrics": bundle.metrics,
+        "holdout_metrics": bundle.holdout_metrics,
+        "metadata": bundle.metadata,
+    }
+    return pack_payload(payload)
+
+
+class BundleRegistry:
+    def __init__(self, path: str = "bundles/registry.db"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        # WAL lets the API read the index while the worker writes.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def save(self, bundle: Bundle) -> str:
+        digest, body = encode_payload(bundle)
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO payloads (hash, body) VALUES (?, ?)", (digest, body))
+            conn.execute(
+                "INSERT INTO bundles (bundle_id, name, created_at, sharpe, max_drawdown, trades, win_rate,"
+                " holdout_sharpe, payload_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    bundle.bundle_id,
+                    bundle.name,
+                    bundle.created_at,
+                    *(bundle.metrics.get(column) for column in METRIC_COLUMNS),
+                    bundle.holdout_metrics.get("sharpe"),
+                    digest,
+                ),
+            )
+        return digest
+
+    def import_folder(self, folder: str = "bundles") -> int:
+        imported = 0
+        for path in sorted(Path(folder).glob("*.json")):
+            bundle = Bundle(**json.loads(path.read_text()))
+            if self.record(bundle.bundle_id) is None:
+                self.save(bundle)
+                imported += 1
+        return imported
+
+    def _record(self, row: sqlite3.Row) -> BundleRecord:
+        return BundleRecord(
+            bundle_id=row["bundle_id"],
+            name=row["name"],
+            created_at=row["created_at"],
+            promoted=bool(row["promoted"]),
+            active=bool(row["active"]),
+            metrics={column: row[column] for column in METRIC_COLUMNS},
+            holdout_sharpe=row["holdout_sharpe"],
+            payload_hash=row["payload_hash"],
+        )
+
+    def record(self, bundle_id: str) -> Optional[BundleRecord]:
+        row = self._conn.execute("SELECT * FROM bundles WHERE bundle_id = ?", (bundle_id,)).fetchone()
+        return self._record(row) if row is not None else None
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM bundles").fetchone()[0]
+
+    def query(
+        self,
+        sort: str = "created_at",
+        descending: bool = True,
+        limit: int = 50,
+        offset: int = 0,
+        promoted_only: bool = False,
+    ) -> List[BundleRecord]:
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {SORT_COLUMNS}")
+        direction = "DESC" if descending else "ASC"
+        where = "WHERE promoted = 1" if promoted_only else ""
+        rows = self._conn.execute(
+            f"SELECT * FROM bundles {where} ORDER BY {sort} {direction}, bundle_id {direction} LIMIT ? OFFSET ?",
+            (limit, offset),
+        )
+        return [self._record(row) for row in rows]
+
+    def load(self, bundle_id: str) -> Optional[Bundle]:
+        row = self._conn.execute(
+            "SELECT b.bundle_id, b.name, b.created_at, p.body FROM bundles b"
+            " JOIN payloads p ON p.hash = b.payload_hash WHERE b.bundle_id = ?",
+            (bundle_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return Bundle(
+            bundle_id=row["bundle_id"], name=row["name"], created_at=row["created_at"], **unpack_payload(row["body"])
+        )
+
+    def promote(self, bundle_id: str) -> None:
+        with self._transaction() as conn:
+            if conn.execute("UPDATE bundles SET promoted = 1 WHERE bundle_id = ?", (bundle_id,)).rowcount == 0:
+                raise KeyError(bundle_id)
+
+    def select(self, bundle_id: str) -> None:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT promoted FROM bundles WHERE bundle_id = ?", (bundle_id,)).fetchone()
+            if row is None:
+                raise KeyError(bundle_id)
+            if not row["promoted"]:
+                raise ValueError(f"bundle {bundle_id} has not been promoted")
+            conn.execute("UPDATE bundles SET active = 0 WHERE active = 1")
+            conn.execute("UPDATE bundles SET active = 1 WHERE bundle_id = ?", (bundle_id,))
+
+    def active(self) -> Optional[Bundle]:
+        row = self._conn.execute("SELECT bundle_id FROM bundles WHERE active = 1").fetchone()
+        return self.load(row["bundle_id"]) if row is not None else None
@@ -1,5 +1,17 @@
-from dataclasses import dataclass
-from typing import Iterable, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from scanner import SCORE_WEIGHTS
+
+FoldMetrics = Dict[str, float]
+Evaluator = Callable[[Dict[str, np.ndarray], slice, slice, dict], FoldMetrics]
+
+MINUTE_BARS_PER_YEAR = 252 * 390
 
 
 @dataclass
@@ -9,6 +21,27 @@ class TimeSplit:
     holdout: slice
 
 
+@dataclass
+class LookaheadReport:
+    passed: bool
+    leaking_cutoffs: List[int]
+
+
+@dataclass
+class FoldResult:
+    train: slice
+    val: slice
+    metrics: FoldMetrics
+
+
+@dataclass
+class WalkForwardResult:
+    folds: List[FoldResult]
+    metrics: FoldMetrics
+    holdout_metrics: FoldMetrics
+    parameters: dict = field(default_factory=dict)
+
+
 def time_split(total: int) -> TimeSplit:
     train_end = int(total * 0.7)
     val_end = int(total * 0.85)
@@ -31,7 +64,240 @@ def walk_forward_splits(
         start += step
 
 
-def no_lookahead(features: List[float]) -> List[float]:
+def _shift_into(out: np.ndarray, panel: np.ndarray, periods: int) -> None:
+    total = len(panel)
+    if periods == 0:
+        out[...] = panel
+    elif abs(periods) >= total:
+        out[...] = np.nan
+    elif periods > 0:
+        out[:periods] = np.nan
+        out[periods:] = panel[:-periods]
+    else:
+        out[periods:] = np.nan
+        out[:periods] = panel[-periods:]
+
+
+def lag(
+    panel: np.ndarray,
+    periods: Union[int, Sequence[int], np.ndarray] = 1,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    # Rows move forward in time with NaN padding; an array of periods applies per column.
+    if out is None:
+        out = np.empty(panel.shape, dtype=np.result_type(panel.dtype, np.float32))
+    if np.ndim(periods) == 0:
+        _shift_into(out, panel, int(periods))
+        return out
+    periods = np.asarray(periods)
+    for step in np.unique(periods):
+        columns = periods == step
+        shifted = np.empty(panel[..., columns].shape, dtype=out.dtype)
+        _shift_into(shifted, panel[..., columns], int(step))
+        out[..., columns] = shifted
+    return out
+
+
+def lag_view(panel: np.ndarray, periods: int = 1) -> Tuple[np.ndarray, slice]:
+    # Zero-copy lag: the first T - periods rows and the target slice they line up with.
+    total = len(panel)
+    periods = min(max(periods, 0), total)
+    return panel[: total - periods], slice(periods, total)
+
+
+def no_lookahead(features: Union[List[float], np.ndarray]) -> Union[List[float], np.ndarray]:
+    if isinstance(features, np.ndarray):
+        return lag(features, 1)
     shifted = [None]
     shifted.extend(features[:-1])
     return shifted
+
+
+def check_lookahead(
+    pipeline: Callable[[np.ndarray], np.ndarray],
+    panel: np.ndarray,
+    cutoffs: Optional[Sequence[int]] = None,
+    seed: int = 0,
+) -> LookaheadReport:
+    # Perturbing rows after a cutoff must leave the output up to the cutoff unchanged.
+    total = len(panel)
+    if cutoffs is None:
+        cutoffs = np.linspace(0, total - 2, num=min(5, max(total - 1, 0)), dtype=int).tolist()
+    rng = np.random.default_rng(seed)
+    baseline = pipeline(panel)
+    scale = np.nanstd(panel) or 1.0
+    leaking = []
+    for cutoff in cutoffs:
+        perturbed = np.array(panel, dtype=float, copy=True)
+        future = perturbed[cutoff + 1 :]
+        future += rng.normal(0.0, scale, future.shape)
+        # Keep values positive so price-like pipelines (ratios, logs) stay defined.
+        np.abs(future, out=future)
+        result = pipeline(perturbed)
+        if not np.allclose(baseline[: cutoff + 1], result[: cutoff + 1], equal_nan=True):
+            leaking.append(int(cutoff))
+    return LookaheadReport(passed=not leaking, leaking_cutoffs=leaking)
+
+
+def performance_metrics(
+    returns: np.ndarray,
+    trades: int,
+    wins: int,
+    periods_per_year: float = MINUTE_BARS_PER_YEAR,
+) -> FoldMetrics:
+    std = returns.std() if len(returns) else 0.0
+    sharpe = float(returns.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0
+    equity = np.cumprod(1 + returns)
+    peak = np.maximum.accumulate(np.maximum(equity, 1.0)) if len(equity) else equity
+    max_drawdown = float(np.max(1 - equity / peak)) if len(equity) else 0.0
+    return {
+        "sharpe": sharpe,
+        "max_drawdown": max_drawdown,
+        "trades": int(trades),
+        "win_rate": wins / trades if trades else 0.0,
+    }
+
+
+def fold_threshold(train_scores: np.ndarray, params: dict) -> float:
+    return float(np.nanquantile(train_scores, params.get("quantile", 0.99)))
+
+
+def fold_picks(
+    scores: np.ndarray,
+    close: np.ndarray,
+    threshold: float,
+    val: slice,
+    offset: int = 0,
+    gate: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Bar t is traded at its close and marked at t + 1, which must stay inside the fold.
+    # `scores` (and `gate`, when given) start at row `offset` of `close`.
+    bars = slice(val.start, val.stop - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        forward = close[val.start + 1 : val.stop] / close[bars] - 1
+    picks = (scores[val.start - offset : val.stop - 1 - offset] >= threshold) & np.isfinite(forward)
+    if gate is not None:
+        picks &= gate[val.start - offset : val.stop - 1 - offset]
+    return picks, forward
+
+
+def evaluate_scores(
+    scores: np.ndarray,
+    close: np.ndarray,
+    threshold: float,
+    val: slice,
+    params: dict,
+    offset: int = 0,
+    gate: Optional[np.ndarray] = None,
+) -> FoldMetrics:
+    picks, forward = fold_picks(scores, close, threshold, val, offset, gate)
+    counts = picks.sum(axis=1)
+    returns = np.where(picks, forward, 0.0).sum(axis=1) / np.maximum(counts, 1)
+    wins = int((picks & (forward > 0)).sum())
+    return performance_metrics(
+        returns, int(counts.sum()), wins, params.get("periods_per_year", MINUTE_BARS_PER_YEAR)
+    )
+
+
+def evaluate_fold(arrays: Dict[str, np.ndarray], train: slice, val: slice, params: dict) -> FoldMetrics:
+    weights = np.asarray(params.get("weights", SCORE_WEIGHTS), dtype=float)
+    # The entry threshold is fitted on the train window only.
+    threshold = fold_threshold(arrays["features"][train] @ weights, params)
+    scores = arrays["features"][val] @ weights
+    return evaluate_scores(scores, arrays["close"], threshold, val, params, offset=val.start)
+
+
+def aggregate_metrics(folds: List[FoldMetrics]) -> FoldMetrics:
+    if not folds:
+        return performance_metrics(np.empty(0), 0, 0)
+    trades = sum(fold["trades"] for fold in folds)
+    return {
+        "sharpe": float(np.mean([fold["sharpe"] for fold in folds])),
+        "max_drawdown": max(fold["max_drawdown"] for fold in folds),
+        "trades": trades,
+        "win_rate": sum(fold["win_rate"] * fold["trades"] for fold in folds) / trades if trades else 0.0,
+    }
+
+
+class SharedArrays:
+    def __init__(self, arrays: Optional[Dict[str, np.ndarray]] = None):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.specs: Dict[str, Tuple[str, tuple, str]] = {}
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, array in (arrays or {}).items():
+            self.allocate(name, array.shape, array.dtype)[...] = array
+
+    def allocate(self, name: str, shape: tuple, dtype: Union[str, np.dtype] = np.float64) -> np.ndarray:
+        # Filling the returned view in place avoids building the array privately and copying it in.
+        dtype = np.dtype(dtype)
+        block = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+        self._blocks.append(block)
+        self.specs[name] = (block.name, tuple(shape), dtype.str)
+        self.arrays[name] = np.ndarray(shape, dtype, buffer=block.buf)
+        return self.arrays[name]
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        # Views must be dropped before the blocks can be closed.
+        self.arrays.clear()
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+
+
+_WORKER_ARRAYS: Dict[str, np.ndarray] = {}
+_WORKER_BLOCKS: List[shared_memory.SharedMemory] = []
+
+
+def _attach_shared(specs: Dict[str, Tuple[str, tuple, str]]) -> None:
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _WORKER_BLOCKS.append(block)
+        _WORKER_ARRAYS[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+
+
+def _run_fold(evaluate: Evaluator, train: slice, val: slice, params: dict) -> FoldMetrics:
+    return evaluate(_WORKER_ARRAYS, train, val, params)
+
+
+def run_walk_forward(
+    arrays: Union[Dict[str, np.ndarray], SharedArrays],
+    train_window: int,
+    val_window: int,
+    step: int,
+    params: Optional[dict] = None,
+    evaluate: Evaluator = evaluate_fold,
+    expanding: bool = True,
+    max_workers: Optional[int] = None,
+) -> WalkForwardResult:
+    params = params or {}
+    shared = arrays if isinstance(arrays, SharedArrays) else None
+    if shared is not None:
+        arrays = shared.arrays
+    total = len(arrays["close"])
+    split = time_split(total)
+    searchable = split.val.stop
+    folds = list(walk_forward_splits(searchable, train_window, val_window, step, expanding))
+    holdout_train = slice(0, searchable)
+
+    if max_workers == 0:
+        fold_metrics = [evaluate(arrays, train, val, params) for train, val in folds]
+        holdout = evaluate(arrays, holdout_train, split.holdout, params)
+    else:
+        # Arrays already in shared memory go to the workers as they are; anything else is copied in once.
+        with nullcontext(shared) if shared is not None else SharedArrays(arrays) as blocks, ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_attach_shared, initargs=(blocks.specs,)
+        ) as pool:
+            pending = [pool.submit(_run_fold, evaluate, train, val, params) for train, val in folds]
+            holdout_future = pool.submit(_run_fold, evaluate, holdout_train, split.holdout, params)
+            fold_metrics = [future.result() for future in pending]
+            holdout = holdout_future.result()
+
+    return WalkForwardResult(
+        folds=[FoldResult(train, val, metrics) for (train, val), metrics in zip(folds, fold_metrics)],
+        metrics=aggregate_metrics(fold_metrics),
+        holdout_metrics=holdout,
+        parameters=params,
+    )
@@ -1,4 +1,15 @@
 from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from covariance import PortfolioVariance
+from instrumentation import timed
+
+DAILY_LOSS = "daily loss limit exceeded"
+DRAWDOWN = "drawdown limit exceeded"
+
+Scalar = Union[float, np.ndarray]
 
 
 @dataclass
@@ -10,6 +21,9 @@ class RiskConfig:
     sector_concentration: float
     daily_max_loss: float
     drawdown_max: float
+    max_portfolio_vol: float = 0.0
+    stop_mult: Optional[float] = None
+    target_mult: Optional[float] = None
 
 
 @dataclass
@@ -27,18 +41,38 @@ class CircuitBreakerState:
     reason: str
 
 
-def risk_multiplier(certainty: float) -> float:
-    return min(2.0, 0.5 + certainty * 1.5)
+def risk_multiplier(certainty: Scalar) -> Scalar:
+    # np.minimum keeps these usable for one candidate or a whole batch.
+    return np.minimum(2.0, 0.5 + certainty * 1.5)
 
 
-def reward_multiplier(certainty: float) -> float:
-    return min(4.0, 1.5 + certainty * 2.0)
+def reward_multiplier(certainty: Scalar) -> Scalar:
+    return np.minimum(4.0, 1.5 + certainty * 2.0)
 
 
-def compute_bracket(entry: float, atr: float, certainty: float) -> tuple[float, float]:
-    stop = entry - (1 + certainty) * atr
-    target = entry + reward_multiplier(certainty) * (entry - stop)
-    return stop, target
+def compute_bracket(
+    entry: float,
+    atr: float,
+    certainty: float,
+    stop_mult: Optional[float] = None,
+    target_mult: Optional[float] = None,
+) -> tuple[float, float]:
+    stop, target = compute_brackets(entry, atr, certainty, stop_mult, target_mult)
+    return float(stop), float(target)
+
+
+def compute_brackets(
+    entries: Scalar,
+    atrs: Scalar,
+    certainties: Scalar,
+    stop_mult: Optional[float] = None,
+    target_mult: Optional[float] = None,
+) -> tuple[Scalar, Scalar]:
+    # Multipliers fixed by a research bundle replace the certainty-scaled defaults.
+    stops = entries - ((1 + certainties) if stop_mult is None else stop_mult) * atrs
+    reward = reward_multiplier(certainties) if target_mult is None else target_mult
+    targets = entries + reward * (entries - stops)
+    return stops, targets
 
 
 def position_size(equity: float, entry: float, stop: float, risk_per_trade: float) -> int:
@@ -47,6 +81,7 @@ def position_size(equity: float, entry: float, stop: float, risk_per_trade: floa
     return max(0, qty)
 
 
+@timed("evaluate_trade")
 def evaluate_trade(
     equity: float,
     entry: float,
@@ -57,16 +92,95 @@ def evaluate_trade(
     if certainty < config.c_min:
         return RiskDecision(False, 0, 0.0, 0.0, "certainty below threshold")
 
-    risk_per_trade = config.base_risk * risk_multiplier(certainty)
-    stop, target = compute_bracket(entry, atr, certainty)
+    risk_per_trade = config.base_risk * float(risk_multiplier(certainty))
+    stop, target = compute_bracket(entry, atr, certainty, config.stop_mult, config.target_mult)
     qty = position_size(equity, entry, stop, risk_per_trade)
     allowed = qty > 0
     return RiskDecision(allowed, qty, stop, target, "risk sizing ok")
 
 
+@timed("allocate_trades")
+def allocate_trades(
+    equity: float,
+    entries: np.ndarray,
+    atrs: np.ndarray,
+    certainties: np.ndarray,
+    sectors: Sequence[str],
+    config: RiskConfig,
+    open_positions: int = 0,
+    gross_exposure: float = 0.0,
+    sector_exposure: Optional[Dict[str, float]] = None,
+    tickers: Optional[Sequence[str]] = None,
+    portfolio: Optional[PortfolioVariance] = None,
+) -> List[RiskDecision]:
+    entries = np.asarray(entries, dtype=float)
+    certainties = np.asarray(certainties, dtype=float)
+    stops, targets = compute_brackets(
+        entries, np.asarray(atrs, dtype=float), certainties, config.stop_mult, config.target_mult
+    )
+    risk_per_trade = config.base_risk * risk_multiplier(certainties)
+    per_share_risk = np.maximum(0.01, entries - stops)
+    qtys = np.maximum(0, np.floor(equity * risk_per_trade / per_share_risk)).astype(np.int64)
+
+    decisions = [
+        RiskDecision(False, 0, 0.0, 0.0, "certainty below threshold")
+        if certainty < config.c_min
+        else RiskDecision(False, 0, stop, target, "position size rounds to zero")
+        for certainty, stop, target in zip(certainties.tolist(), stops.tolist(), targets.tolist())
+    ]
+
+    slots = config.max_positions - open_positions
+    gross_room = config.max_gross_exposure * equity - gross_exposure
+    sector_cap = config.sector_concentration * equity
+    sector_used = dict(sector_exposure or {})
+    # Daily dollar variance budget; correlated names use it up faster than their notional alone suggests.
+    variance_budget = (config.max_portfolio_vol * equity) ** 2 if portfolio is not None and tickers else 0.0
+
+    eligible = np.flatnonzero((certainties >= config.c_min) & (qtys > 0))
+    # Highest certainty first; ties keep candidate order.
+    for idx in eligible[np.argsort(-certainties[eligible], kind="stable")].tolist():
+        decision = decisions[idx]
+        if slots <= 0:
+            decision.rationale = "max positions reached"
+            continue
+        sector = sectors[idx]
+        entry = entries[idx]
+        sector_room = sector_cap - sector_used.get(sector, 0.0)
+        qty = int(qtys[idx])
+        rationale = "risk sizing ok"
+        blocked = "position size rounds to zero"
+        if qty * entry > gross_room:
+            qty = int(max(0.0, gross_room) // entry)
+            rationale = "trimmed to gross exposure limit"
+            blocked = "gross exposure limit reached"
+        if qty * entry > sector_room:
+            qty = int(max(0.0, sector_room) // entry)
+            rationale = "trimmed to sector concentration limit"
+            blocked = "sector concentration limit reached"
+        if variance_budget and qty > 0:
+            variance_room = portfolio.max_notional(tickers[idx], variance_budget)
+            if qty * entry > variance_room:
+                qty = int(variance_room // entry)
+                rationale = "trimmed to portfolio variance limit"
+                blocked = "portfolio variance limit reached"
+        if qty <= 0:
+            decision.rationale = blocked
+            continue
+        notional = qty * entry
+        if variance_budget:
+            portfolio.add(tickers[idx], notional)
+        slots -= 1
+        gross_room -= notional
+        sector_used[sector] = sector_used.get(sector, 0.0) + notional
+        decision.allowed = True
+        decision.qty = qty
+        decision.rationale = rationale
+    return decisions
+
+
 def check_circuit_breaker(daily_loss: float, drawdown: float, config: RiskConfig) -> CircuitBreakerState:
     if daily_loss <= -config.daily_max_loss:
-        return CircuitBreakerState(True, "daily loss limit exceeded")
+        return CircuitBreakerState(True, DAILY_LOSS)
     if drawdown >= config.drawdown_max:
-        return CircuitBreakerState(True, "drawdown limit exceeded")
+        return CircuitBreakerState(True, DRAWDOWN)
     return CircuitBreakerState(False, "ok")
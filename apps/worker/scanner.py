@@ -1,6 +1,14 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from instrumentation import timed
+
+FEATURE_COLUMNS = ("volume_surge", "gap_pct", "volatility_expansion", "trend_alignment")
+SCORE_WEIGHTS = np.array([0.35, 0.25, 0.25, 0.15])
+TOP_K = 200
 
 
 @dataclass
@@ -29,15 +37,60 @@ def compute_score(features: FeatureSnapshot) -> float:
     )
 
 
-def rank_candidates(features: List[FeatureSnapshot]) -> List[ScanCandidate]:
-    ranked = [
+def features_to_matrix(features: Sequence[FeatureSnapshot]) -> np.ndarray:
+    rows = [
+        (item.volume_surge, item.gap_pct, item.volatility_expansion, item.trend_alignment)
+        for item in features
+    ]
+    return np.array(rows, dtype=float).reshape(len(rows), len(FEATURE_COLUMNS))
+
+
+def snapshot_from_row(ticker: str, row: np.ndarray) -> FeatureSnapshot:
+    return FeatureSnapshot(ticker, *(float(value) for value in row))
+
+
+def score_matrix(matrix: np.ndarray, weights: np.ndarray = SCORE_WEIGHTS) -> np.ndarray:
+    return matrix @ weights
+
+
+def top_k_indices(values: np.ndarray, k: int) -> np.ndarray:
+    n = len(values)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        cutoff = values[np.argpartition(-values, k - 1)[k - 1]]
+        above = np.flatnonzero(values > cutoff)
+        ties = np.flatnonzero(values == cutoff)[: k - len(above)]
+        picked = np.concatenate([above, ties])
+    else:
+        picked = np.arange(n)
+    # Stable descending order, matching a full sort of the original list.
+    return picked[np.lexsort((picked, -values[picked]))]
+
+
+@timed("rank_matrix")
+def rank_matrix(
+    tickers: Sequence[str],
+    matrix: np.ndarray,
+    top_k: int = TOP_K,
+    weights: np.ndarray = SCORE_WEIGHTS,
+    snapshots: Optional[Sequence[FeatureSnapshot]] = None,
+    timestamp: Optional[datetime] = None,
+) -> List[ScanCandidate]:
+    scores = score_matrix(matrix, weights)
+    order = top_k_indices(scores, top_k)
+    timestamp = timestamp or datetime.utcnow()
+    return [
         ScanCandidate(
-            ticker=item.ticker,
-            score=compute_score(item),
-            features=item,
-            timestamp=datetime.utcnow(),
+            ticker=tickers[idx],
+            score=float(scores[idx]),
+            features=snapshots[idx] if snapshots is not None else snapshot_from_row(tickers[idx], matrix[idx]),
+            timestamp=timestamp,
         )
-        for item in features
+        for idx in order
     ]
-    ranked.sort(key=lambda item: item.score, reverse=True)
-    return ranked[:200]
+
+
+def rank_candidates(features: List[FeatureSnapshot]) -> List[ScanCandidate]:
+    tickers = [item.ticker for item in features]
+    return rank_matrix(tickers, features_to_matrix(features), snapshots=features)
@@ -1,5 +1,12 @@
 from dataclasses import dataclass
-from typing import List
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from instrumentation import timed
+from scanner import FEATURE_COLUMNS
+
+COLUMN = {name: idx for idx, name in enumerate(FEATURE_COLUMNS)}
 
 
 @dataclass
@@ -10,6 +17,42 @@ class StrategySignal:
     rationale: str
 
 
+@dataclass
+class Strategy:
+    name: str
+    rationale: str
+    evaluate: Callable[[dict], StrategySignal]
+    batch: Callable[[np.ndarray], np.ndarray]
+    direction: int = 1
+
+
+@dataclass
+class BatchSignals:
+    tickers: Sequence[str]
+    strategies: List[Strategy]
+    direction: np.ndarray
+    confidence: np.ndarray
+
+    def signals_for(self, idx: int) -> List[StrategySignal]:
+        return [
+            StrategySignal(
+                name=strategy.name,
+                direction=int(self.direction[row, idx]),
+                confidence=float(self.confidence[row, idx]),
+                rationale=strategy.rationale,
+            )
+            for row, strategy in enumerate(self.strategies)
+        ]
+
+
+STRATEGIES: Dict[str, Strategy] = {}
+
+
+def register_strategy(strategy: Strategy) -> Strategy:
+    STRATEGIES[strategy.name] = strategy
+    return strategy
+
+
 def momentum_breakout(features: dict) -> StrategySignal:
     score = min(1.0, max(0.0, features.get("trend_alignment", 0)))
     return StrategySignal(
@@ -40,9 +83,50 @@ def volatility_breakout(features: dict) -> StrategySignal:
     )
 
 
+register_strategy(
+    Strategy(
+        name="momentum_breakout",
+        rationale="VWAP/MA alignment with volume surge",
+        evaluate=momentum_breakout,
+        batch=lambda matrix: np.clip(matrix[:, COLUMN["trend_alignment"]], 0.0, 1.0),
+    )
+)
+register_strategy(
+    Strategy(
+        name="mean_reversion",
+        rationale="Deviation from VWAP reversion potential",
+        evaluate=mean_reversion,
+        batch=lambda matrix: np.clip(1 - np.abs(matrix[:, COLUMN["gap_pct"]]), 0.0, 1.0),
+    )
+)
+register_strategy(
+    Strategy(
+        name="volatility_breakout",
+        rationale="ATR/true range expansion",
+        evaluate=volatility_breakout,
+        batch=lambda matrix: np.clip(matrix[:, COLUMN["volatility_expansion"]], 0.0, 1.0),
+    )
+)
+
+
+@timed("ensemble_signals")
 def ensemble_signals(features: dict) -> List[StrategySignal]:
-    return [
-        momentum_breakout(features),
-        mean_reversion(features),
-        volatility_breakout(features),
-    ]
+    return [strategy.evaluate(features) for strategy in STRATEGIES.values()]
+
+
+@timed("ensemble_signals_batch")
+def ensemble_signals_batch(
+    tickers: Sequence[str],
+    matrix: np.ndarray,
+    strategies: Optional[List[Strategy]] = None,
+) -> BatchSignals:
+    strategies = strategies if strategies is not None else list(STRATEGIES.values())
+    confidence = np.empty((len(strategies), len(tickers)))
+    for row, strategy in enumerate(strategies):
+        confidence[row] = strategy.batch(matrix)
+    direction = np.repeat(
+        np.array([strategy.direction for strategy in strategies], dtype=np.int8)[:, None],
+        len(tickers),
+        axis=1,
+    )
+    return BatchSignals(tickers, strategies, direction, confidence)
@@ -0,0 +1,154 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+BAR_DTYPE = np.dtype(
+    [
+        ("t", "<i8"),
+        ("open", "<f8"),
+        ("high", "<f8"),
+        ("low", "<f8"),
+        ("close", "<f8"),
+        ("volume", "<f8"),
+    ]
+)
+
+Timestamp = Union[int, str, np.datetime64, None]
+
+
+def to_ns(value: Timestamp) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = value.rstrip("Z")
+    return int(np.datetime64(value, "ns").astype(np.int64))
+
+
+def bars_to_records(bars: List[Dict[str, Any]]) -> np.ndarray:
+    records = np.empty(len(bars), dtype=BAR_DTYPE)
+    records["t"] = np.array([bar["t"].rstrip("Z") for bar in bars], dtype="datetime64[ns]").astype(np.int64)
+    records["open"] = [bar["o"] for bar in bars]
+    records["high"] = [bar["h"] for bar in bars]
+    records["low"] = [bar["l"] for bar in bars]
+    records["close"] = [bar["c"] for bar in bars]
+    records["volume"] = [bar["v"] for bar in bars]
+    return records
+
+
+class BarStore:
+    def __init__(self, root: str = "data/bars"):
+        self.root = Path(root)
+        self._indexes: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+    def _dir(self, timeframe: str) -> Path:
+        return self.root / timeframe
+
+    def _path(self, symbol: str, timeframe: str) -> Path:
+        return self._dir(timeframe) / f"{symbol}.bars"
+
+    def index(self, timeframe: str) -> Dict[str, Dict[str, int]]:
+        if timeframe not in self._indexes:
+            path = self._dir(timeframe) / "index.json"
+            self._indexes[timeframe] = json.loads(path.read_text()) if path.exists() else {}
+        return self._indexes[timeframe]
+
+    def flush(self, timeframe: str) -> None:
+        folder = self._dir(timeframe)
+        folder.mkdir(parents=True, exist_ok=True)
+        tmp = folder / "index.json.tmp"
+        tmp.write_text(json.dumps(self.index(timeframe), sort_keys=True))
+        os.replace(tmp, folder / "index.json")
+
+    def symbols(self, timeframe: str) -> List[str]:
+        return sorted(self.index(timeframe))
+
+    def last_timestamp(self, symbol: str, timeframe: str) -> Optional[int]:
+        meta = self.index(timeframe).get(symbol)
+        return meta["last"] if meta else None
+
+    def append(self, symbol: str, timeframe: str, records: np.ndarray) -> int:
+        index = self.index(timeframe)
+        meta = index.get(symbol)
+        if meta:
+            records = records[records["t"] > meta["last"]]
+        if not len(records):
+            return 0
+        records = np.sort(records, order="t")
+        path = self._path(symbol, timeframe)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rows = meta["rows"] if meta else 0
+        with open(path, "ab") as handle:
+            # Drop any bytes written after the last indexed row (e.g. an interrupted append).
+            handle.truncate(rows * BAR_DTYPE.itemsize)
+            handle.write(records.astype(BAR_DTYPE, copy=False).tobytes())
+        index[symbol] = {
+            "rows": rows + len(records),
+            "first": meta["first"] if meta else int(records["t"][0]),
+            "last": int(records["t"][-1]),
+        }
+        return len(records)
+
+    def append_page(self, timeframe: str, page: Dict[str, List[Dict[str, Any]]]) -> int:
+        appended = sum(
+            self.append(symbol, timeframe, bars_to_records(bars)) for symbol, bars in page.items() if bars
+        )
+        self.flush(timeframe)
+        return appended
+
+    def read(
+        self,
+        symbol: str,
+        timeframe: str,
+        start: Timestamp = None,
+        end: Timestamp = None,
+    ) -> np.ndarray:
+        meta = self.index(timeframe).get(symbol)
+        if not meta or not meta["rows"]:
+            return np.empty(0, dtype=BAR_DTYPE)
+        bars = np.memmap(self._path(symbol, timeframe), dtype=BAR_DTYPE, mode="r", shape=(meta["rows"],))
+        times = bars["t"]
+        lo = 0 if start is None else int(np.searchsorted(times, to_ns(start), side="left"))
+        hi = len(bars) if end is None else int(np.searchsorted(times, to_ns(end), side="right"))
+        return bars[lo:hi]
+
+    def read_many(
+        self,
+        symbols: Iterable[str],
+        timeframe: str,
+        start: Timestamp = None,
+        end: Timestamp = None,
+    ) -> Dict[str, np.ndarray]:
+        return {symbol: self.read(symbol, timeframe, start, end) for symbol in symbols}
+
+
+def load_panel(
+    store: BarStore,
+    symbols: List[str],
+    timeframe: str,
+    start: Timestamp = None,
+    end: Timestamp = None,
+) -> Dict[str, np.ndarray]:
+    series = store.read_many(symbols, timeframe, start, end)
+    times = np.unique(np.concatenate([bars["t"] for bars in series.values()] or [np.empty(0, np.int64)]))
+    panel = {field: np.full((len(times), len(symbols)), np.nan) for field in BAR_DTYPE.names[1:]}
+    for col, symbol in enumerate(symbols):
+        bars = series[symbol]
+        rows = np.searchsorted(times, bars["t"])
+        for field in panel:
+            panel[field][rows, col] = bars[field]
+    # Forward-fill gaps with the last close; missing bars carry no volume. Rows before a
+    # symbol's first bar have nothing to fill from and stay NaN so features can mask them.
+    rows = np.arange(len(times))[:, None]
+    last = np.maximum.accumulate(np.where(np.isnan(panel["close"]), 0, rows), axis=0)
+    filled_close = np.take_along_axis(panel["close"], last, axis=0)
+    for field in ("open", "high", "low"):
+        panel[field] = np.where(np.isnan(panel[field]), filled_close, panel[field])
+    panel["close"] = filled_close
+    panel["volume"] = np.nan_to_num(panel["volume"])
+    panel["t"] = times
+    return panel
@@ -0,0 +1,228 @@
+import hashlib
+import itertools
+import json
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, fields
+from typing import Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+from backtest import BacktestConfig, simulate_brackets
+from certainty import CertaintyInputs, certainty_score
+from features import FeatureParams, compute_feature_panel, rolling_mean, session_starts, true_range_panel
+from research import (
+    MINUTE_BARS_PER_YEAR,
+    FoldMetrics,
+    aggregate_metrics,
+    evaluate_scores,
+    fold_picks,
+    fold_threshold,
+    performance_metrics,
+    time_split,
+    walk_forward_splits,
+)
+from risk import compute_brackets
+from scanner import SCORE_WEIGHTS
+from signals import STRATEGIES
+
+FEATURE_KEYS = tuple(item.name for item in fields(FeatureParams))
+# Any of these switches a point from close-to-close returns to simulated bracket orders.
+BRACKET_KEYS = ("stop_mult", "target_mult", "max_hold")
+SWEEP_KEYS = frozenset(FEATURE_KEYS + ("weights", "quantile", "periods_per_year", "c_min") + BRACKET_KEYS)
+# Live defaults for the regime and calibration inputs to certainty, which have no history to replay.
+NEUTRAL_SCORE = 0.5
+
+
+def params_hash(params: dict) -> str:
+    payload = json.dumps(params, sort_keys=True, default=lambda value: np.asarray(value).tolist())
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def expand_grid(grid: Dict[str, List[object]]) -> List[dict]:
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+class ArrayCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object]) -> object:
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        value = compute()
+        size = getattr(value, "nbytes", 64)
+        if size <= self.max_bytes:
+            self._entries[key] = value
+            self.used_bytes += size
+            while self.used_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.used_bytes -= getattr(evicted, "nbytes", 64)
+        return value
+
+
+@dataclass
+class SweepPoint:
+    parameters: dict
+    metrics: FoldMetrics
+
+
+@dataclass
+class SweepResult:
+    points: List[SweepPoint]
+    best: SweepPoint
+    holdout_metrics: FoldMetrics
+
+
+class ParameterSweep:
+    def __init__(
+        self,
+        panel: Dict[str, np.ndarray],
+        train_window: int,
+        val_window: int,
+        step: int,
+        cache: Optional[ArrayCache] = None,
+        expanding: bool = True,
+    ):
+        self.panel = panel
+        self.cache = cache or ArrayCache(1 << 30)
+        self.split = time_split(len(panel["close"]))
+        self.folds = list(walk_forward_splits(self.split.val.stop, train_window, val_window, step, expanding))
+        self._sessions = session_starts(panel["t"])
+        # Features are causal, so one pass over the full range serves every fold and the holdout.
+        self._range = (int(panel["t"][0]), int(panel["t"][-1])) if len(panel["t"]) else (0, 0)
+
+    def features(self, feature_params: FeatureParams) -> np.ndarray:
+        key = ("features", self._range, params_hash(asdict(feature_params)))
+        return self.cache.get_or_compute(
+            key,
+            lambda: compute_feature_panel(
+                self.panel["open"],
+                self.panel["high"],
+                self.panel["low"],
+                self.panel["close"],
+                self.panel["volume"],
+                self._sessions,
+                feature_params,
+            ),
+        )
+
+    def scores(self, feature_params: FeatureParams, weights: np.ndarray) -> np.ndarray:
+        key = ("scores", self._range, params_hash(asdict(feature_params)), params_hash(weights))
+        return self.cache.get_or_compute(key, lambda: self.features(feature_params) @ weights)
+
+    def certainty(self, feature_params: FeatureParams, weights: np.ndarray) -> np.ndarray:
+        key = ("certainty", self._range, params_hash(asdict(feature_params)), params_hash(weights))
+        return self.cache.get_or_compute(key, lambda: self._certainty(feature_params, weights))
+
+    def _certainty(self, feature_params: FeatureParams, weights: np.ndarray) -> np.ndarray:
+        # The inputs the live signal stage gives certainty_score, for every (bar, symbol) at once.
+        features = self.features(feature_params)
+        matrix = features.reshape(-1, features.shape[-1])
+        confidence = np.stack([strategy.batch(matrix) for strategy in STRATEGIES.values()])
+        margin = np.clip(self.scores(feature_params, weights).reshape(-1), 0.0, 1.0)
+        inputs = CertaintyInputs(margin, 0.0, NEUTRAL_SCORE, NEUTRAL_SCORE)
+        return certainty_score(confidence, inputs).reshape(features.shape[:-1])
+
+    def atr(self, feature_params: FeatureParams) -> np.ndarray:
+        key = ("atr", self._range, feature_params.atr_slow)
+        panel = self.panel
+        return self.cache.get_or_compute(
+            key,
+            lambda: rolling_mean(
+                true_range_panel(panel["open"], panel["high"], panel["low"], panel["close"]), feature_params.atr_slow
+            ),
+        )
+
+    def _threshold(self, score_key: tuple, scores: np.ndarray, train: slice, params: dict) -> float:
+        key = ("threshold", score_key, train.start, train.stop, params.get("quantile", 0.99))
+        return self.cache.get_or_compute(key, lambda: fold_threshold(scores[train], params))
+
+    def _split_params(self, params: dict):
+        unknown = sorted(set(params) - SWEEP_KEYS)
+        if unknown:
+            raise ValueError(f"unsupported sweep parameters {unknown}; expected some of {sorted(SWEEP_KEYS)}")
+        feature_params = FeatureParams(**{key: params[key] for key in FEATURE_KEYS if key in params})
+        weights = np.asarray(params.get("weights", SCORE_WEIGHTS), dtype=float)
+        return feature_params, weights
+
+    def _bracket_metrics(
+        self,
+        feature_params: FeatureParams,
+        picks: np.ndarray,
+        certainty: np.ndarray,
+        val: slice,
+        params: dict,
+    ) -> FoldMetrics:
+        panel = self.panel
+        rows, symbols = np.nonzero(picks)
+        bars = rows + val.start
+        atrs = self.atr(feature_params)[bars, symbols]
+        sized = np.isfinite(atrs) & (atrs > 0)
+        bars, symbols, atrs = bars[sized], symbols[sized], atrs[sized]
+        # Same levels live trading would send: a limit at the signal close and the risk module's bracket.
+        entries = panel["close"][bars, symbols]
+        stops, targets = compute_brackets(
+            entries, atrs, certainty[bars, symbols], params.get("stop_mult"), params.get("target_mult")
+        )
+        # Prices end with the fold, so no order can fill or exit on a later bar.
+        fold = slice(0, val.stop)
+        results = simulate_brackets(
+            panel["open"][fold],
+            panel["high"][fold],
+            panel["low"][fold],
+            panel["close"][fold],
+            symbols,
+            bars,
+            entries,
+            stops,
+            targets,
+            np.ones(len(bars)),
+            BacktestConfig(entry_window=1, max_hold=int(params.get("max_hold", BacktestConfig.max_hold))),
+        )
+        filled = results.filled
+        trade_returns = results.pnl[filled] / results.entry_price[filled]
+        exits = results.exit_bar[filled] - val.start
+        length = val.stop - val.start
+        counts = np.bincount(exits, minlength=length)
+        returns = np.bincount(exits, weights=trade_returns, minlength=length) / np.maximum(counts, 1)
+        return performance_metrics(
+            returns,
+            int(filled.sum()),
+            int((trade_returns > 0).sum()),
+            params.get("periods_per_year", MINUTE_BARS_PER_YEAR),
+        )
+
+    def evaluate(self, params: dict, val_folds: Optional[List[tuple]] = None) -> List[FoldMetrics]:
+        feature_params, weights = self._split_params(params)
+        scores = self.scores(feature_params, weights)
+        score_key = (params_hash(asdict(feature_params)), params_hash(weights))
+        brackets = any(key in params for key in BRACKET_KEYS)
+        certainty = self.certainty(feature_params, weights) if brackets or "c_min" in params else None
+        gate = certainty >= params["c_min"] if "c_min" in params else None
+        results = []
+        for train, val in val_folds if val_folds is not None else self.folds:
+            threshold = self._threshold(score_key, scores, train, params)
+            if brackets:
+                picks, _ = fold_picks(scores, self.panel["close"], threshold, val, gate=gate)
+                results.append(self._bracket_metrics(feature_params, picks, certainty, val, params))
+            else:
+                results.append(evaluate_scores(scores, self.panel["close"], threshold, val, params, gate=gate))
+        return results
+
+    def run(self, grid: Dict[str, List[object]], objective: str = "sharpe") -> SweepResult:
+        points = [
+            SweepPoint(params, aggregate_metrics(self.evaluate(params))) for params in expand_grid(grid)
+        ]
+        best = max(points, key=lambda point: point.metrics[objective])
+        # The holdout is only ever scored for the selected configuration.
+        holdout_fold = (slice(0, self.split.val.stop), self.split.holdout)
+        holdout = self.evaluate(best.parameters, [holdout_fold])[0]
+        return SweepResult(points, best, holdout)
@@ -0,0 +1,371 @@
+import asyncio
+import inspect
+import json
+import logging
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Mapping, Optional, Set, Union
+
+import httpx
+import websockets
+
+from alpaca import AlpacaClient
+from config import Settings
+from rate_limiter import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+STATUS_MAP = {
+    "filled": "filled",
+    "partially_filled": "partially_filled",
+    "canceled": "canceled",
+    "expired": "canceled",
+    "done_for_day": "canceled",
+    "replaced": "canceled",
+    "rejected": "rejected",
+}
+OPEN_STATUSES = ("new", "partially_filled")
+FILL_EVENTS = ("fill", "partial_fill")
+
+STREAM_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    websockets.ConnectionClosed,
+    websockets.InvalidHandshake,
+    httpx.HTTPError,
+)
+
+BookListener = Callable[["TradeBook"], Union[Awaitable[None], None]]
+FillListener = Callable[[str, str, float, float, Optional[datetime]], Any]
+MarkLookup = Callable[[str], Optional[float]]
+
+
+class TradeStreamError(RuntimeError):
+    pass
+
+
+def _moment(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+def _micros(value: Optional[str]) -> int:
+    moment = _moment(value)
+    return int(moment.timestamp() * 1_000_000) if moment is not None else 0
+
+
+def _float(value: Any, default: Optional[float] = 0.0) -> Optional[float]:
+    return float(value) if value not in (None, "") else default
+
+
+@dataclass
+class OrderState:
+    order_id: str
+    ticker: str
+    side: str
+    qty: float
+    order_type: str
+    status: str
+    submitted_at: str
+    filled_qty: float
+    limit_price: Optional[float]
+    updated_at: int
+
+    @property
+    def is_open(self) -> bool:
+        return self.status in OPEN_STATUSES
+
+    def record(self) -> Dict[str, Any]:
+        return {
+            "order_id": self.order_id,
+            "ticker": self.ticker,
+            "side": self.side,
+            "qty": self.qty,
+            "order_type": self.order_type,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "filled_qty": self.filled_qty,
+        }
+
+
+@dataclass
+class PositionState:
+    ticker: str
+    qty: float
+    avg_entry: float
+    mark: float
+    updated_at: int
+
+    def record(self) -> Dict[str, Any]:
+        return {
+            "ticker": self.ticker,
+            "qty": abs(self.qty),
+            "avg_entry": self.avg_entry,
+            "unrealized_pl": (self.mark - self.avg_entry) * self.qty,
+            "side": "buy" if self.qty > 0 else "sell",
+        }
+
+
+class TradeBook:
+    def __init__(self, dedup_window: int = 10_000):
+        self.orders: Dict[str, OrderState] = {}
+        self.positions: Dict[str, PositionState] = {}
+        self.version = 0
+        self.fill_listeners: List[FillListener] = []
+        self._executions: Set[str] = set()
+        self._execution_order: Deque[str] = deque(maxlen=dedup_window)
+
+    def _seen(self, execution_id: Optional[str]) -> bool:
+        if not execution_id:
+            return False
+        if execution_id in self._executions:
+            return True
+        if len(self._execution_order) == self._execution_order.maxlen:
+            self._executions.discard(self._execution_order[0])
+        self._execution_order.append(execution_id)
+        self._executions.add(execution_id)
+        return False
+
+    def upsert_order(self, order: Mapping[str, Any]) -> bool:
+        updated_at = _micros(order.get("updated_at") or order.get("submitted_at"))
+        current = self.orders.get(order["id"])
+        # Events and REST pages can arrive out of order; never let an older view overwrite a newer one.
+        if current is not None and updated_at < current.updated_at:
+            return False
+        state = OrderState(
+            order_id=order["id"],
+            ticker=order["symbol"],
+            side=order["side"],
+            qty=_float(order.get("qty")),
+            order_type=order.get("type") or order.get("order_type") or "market",
+            status=STATUS_MAP.get(order.get("status", ""), "new"),
+            submitted_at=order.get("submitted_at") or order.get("created_at"),
+            filled_qty=_float(order.get("filled_qty")),
+            limit_price=_float(order.get("limit_price"), None),
+            updated_at=updated_at,
+        )
+        if state == current:
+            return False
+        self.orders[state.order_id] = state
+        return True
+
+    def apply_fill(
+        self, ticker: str, side: str, qty: float, price: float, position_qty: Optional[float], timestamp: int
+    ) -> bool:
+        current = self.positions.get(ticker)
+        if current is not None and timestamp < current.updated_at:
+            return False
+        old = current.qty if current else 0.0
+        new = position_qty if position_qty is not None else old + (qty if side == "buy" else -qty)
+        if new == 0:
+            return self.positions.pop(ticker, None) is not None
+        avg = current.avg_entry if current else price
+        if old == 0 or (old > 0) != (new > 0):
+            avg = price
+        elif abs(new) > abs(old):
+            avg = (avg * abs(old) + price * (abs(new) - abs(old))) / abs(new)
+        self.positions[ticker] = PositionState(ticker, new, avg, price, timestamp)
+        return True
+
+    def apply(self, update: Mapping[str, Any]) -> bool:
+        if self._seen(update.get("execution_id")):
+            return False
+        order = update["order"]
+        changed = self.upsert_order(order)
+        if update.get("event") in FILL_EVENTS:
+            position_qty = update.get("position_qty")
+            qty, price, moment = _float(update.get("qty")), _float(update.get("price")), _moment(update.get("timestamp"))
+            filled = self.apply_fill(
+                order["symbol"],
+                order["side"],
+                qty,
+                price,
+                None if position_qty is None else float(position_qty),
+                int(moment.timestamp() * 1_000_000) if moment is not None else 0,
+            )
+            if filled:
+                for listener in self.fill_listeners:
+                    listener(order["symbol"], order["side"], qty, price, moment)
+            changed |= filled
+        if changed:
+            self.version += 1
+        return changed
+
+    def resync(self, orders: Iterable[Mapping[str, Any]], positions: Iterable[Mapping[str, Any]], as_of: int) -> None:
+        for order in orders:
+            self.upsert_order(order)
+        book: Dict[str, PositionState] = {}
+        for position in positions:
+            qty = _float(position.get("qty"))
+            if position.get("side") == "short" and qty > 0:
+                qty = -qty
+            avg = _float(position.get("avg_entry_price"))
+            book[position["symbol"]] = PositionState(
+                position["symbol"], qty, avg, _float(position.get("current_price"), avg), as_of
+            )
+        # Fills stamped before the REST snapshot are already reflected in it.
+        for ticker, state in self.positions.items():
+            if state.updated_at > as_of:
+                book[ticker] = state
+        self.positions = book
+        self.version += 1
+
+    def oldest_open_order(self) -> Optional[str]:
+        times = [state.submitted_at for state in self.orders.values() if state.is_open and state.submitted_at]
+        return min(times, key=_micros) if times else None
+
+    def order_records(self) -> List[Dict[str, Any]]:
+        return [state.record() for state in self.orders.values()]
+
+    def position_records(self) -> List[Dict[str, Any]]:
+        return [state.record() for state in self.positions.values()]
+
+    def _order_price(self, state: OrderState, marks: Optional[MarkLookup]) -> float:
+        # Market orders carry no limit: value them at the held mark, else the caller's last quote.
+        if state.limit_price:
+            return state.limit_price
+        position = self.positions.get(state.ticker)
+        if position is not None:
+            return position.mark
+        return (marks(state.ticker) if marks is not None else None) or 0.0
+
+    def exposures(self, marks: Optional[MarkLookup] = None) -> Dict[str, float]:
+        notional: Dict[str, float] = {}
+        for state in self.positions.values():
+            notional[state.ticker] = state.qty * state.mark
+        for state in self.orders.values():
+            if state.is_open and state.side == "buy":
+                price = self._order_price(state, marks)
+                notional[state.ticker] = notional.get(state.ticker, 0.0) + (state.qty - state.filled_qty) * price
+        return notional
+
+    def risk_inputs(
+        self, sectors: Optional[Mapping[str, str]] = None, marks: Optional[MarkLookup] = None
+    ) -> Dict[str, Any]:
+        sectors = sectors or {}
+        held = set(self.positions)
+        exposure: Dict[str, float] = {}
+        for state in self.positions.values():
+            sector = sectors.get(state.ticker, "unknown")
+            exposure[sector] = exposure.get(sector, 0.0) + abs(state.qty) * state.mark
+        pending = set()
+        for state in self.orders.values():
+            if not state.is_open or state.side != "buy":
+                continue
+            price = self._order_price(state, marks)
+            sector = sectors.get(state.ticker, "unknown")
+            exposure[sector] = exposure.get(sector, 0.0) + (state.qty - state.filled_qty) * price
+            pending.add(state.ticker)
+        return {
+            "open_positions": len(held | pending),
+            "gross_exposure": sum(exposure.values()),
+            "sector_exposure": exposure,
+        }
+
+
+class TradeStream:
+    def __init__(
+        self,
+        settings: Settings,
+        book: TradeBook,
+        client: Optional[AlpacaClient] = None,
+        on_update: Optional[BookListener] = None,
+        backoff: Optional[RetryPolicy] = None,
+        url: Optional[str] = None,
+        on_resync: Optional[BookListener] = None,
+    ):
+        self.settings = settings
+        self.book = book
+        self.client = client
+        self.on_update = on_update
+        self.on_resync = on_resync
+        self.backoff = backoff or RetryPolicy(base_delay=0.5, max_delay=30.0)
+        self.url = url or settings.alpaca_trade_stream_url
+        self.connected = asyncio.Event()
+        self.connects = 0
+        self.events = 0
+
+    async def run(self) -> None:
+        failures = 0
+        while True:
+            try:
+                await self._session()
+                failures = 0
+            except STREAM_ERRORS:
+                failures += 1
+            except Exception:
+                # A bad update or a rejected handshake must not end the loop; reconnecting resyncs the book.
+                logger.exception("trade stream session failed; reconnecting")
+                failures += 1
+            self.connected.clear()
+            await asyncio.sleep(self.backoff.delay(max(1, failures)))
+
+    async def _session(self) -> None:
+        async with websockets.connect(self.url, open_timeout=10) as socket:
+            await socket.send(
+                json.dumps(
+                    {"action": "auth", "key": self.settings.alpaca_api_key, "secret": self.settings.alpaca_api_secret}
+                )
+            )
+            await self._expect(socket, "authorization")
+            await socket.send(json.dumps({"action": "listen", "data": {"streams": ["trade_updates"]}}))
+            await self._expect(socket, "listening")
+            self.connects += 1
+            # The stream has no replay: updates missed while disconnected come from REST. Subscribing first
+            # means nothing falls between the snapshot and the live feed.
+            await self.resync()
+            self.connected.set()
+            async for raw in socket:
+                try:
+                    messages = self._messages(raw)
+                except ValueError as exc:
+                    logger.warning("skipping undecodable trade stream frame: %s", exc)
+                    continue
+                for message in messages:
+                    if message.get("stream") == "trade_updates":
+                        self.events += 1
+                        if self.book.apply(message["data"]):
+                            await self._notify()
+
+    async def _expect(self, socket, stream: str) -> None:
+        while True:
+            for message in self._messages(await asyncio.wait_for(socket.recv(), 10)):
+                if message.get("stream") != stream:
+                    continue
+                status = message.get("data", {}).get("status")
+                if stream == "authorization" and status != "authorized":
+                    raise TradeStreamError(f"trade stream authorization failed: {status}")
+                return
+
+    @staticmethod
+    def _messages(raw: Union[str, bytes]) -> List[Dict[str, Any]]:
+        message = json.loads(raw)
+        return message if isinstance(message, list) else [message]
+
+    async def resync(self) -> None:
+        if self.client is None:
+            return
+        as_of = _micros(datetime.now(timezone.utc).isoformat())
+        orders = await self.client.list_orders("open")
+        since = self.book.oldest_open_order()
+        if since:
+            # Orders that were open before the gap may have closed during it.
+            after = (datetime.fromisoformat(since) - timedelta(seconds=1)).isoformat()
+            orders += await self.client.list_orders("closed", after=after)
+        positions = await self.client.list_positions()
+        self.book.resync(orders, positions, as_of)
+        if self.on_resync is not None:
+            await self._call(self.on_resync)
+        await self._notify()
+
+    async def _notify(self) -> None:
+        if self.on_update is not None:
+            await self._call(self.on_update)
+
+    async def _call(self, listener: BookListener) -> None:
+        result = listener(self.book)
+        if inspect.isawaitable(result):
+            await result
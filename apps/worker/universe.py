@@ -1,6 +1,10 @@
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from scanner import top_k_indices
 
 
 @dataclass
@@ -11,10 +15,22 @@ class UniverseEntry:
     spread: float
 
 
+@dataclass
+class UniverseDelta:
+    added: List[str]
+    removed: List[str]
+    unchanged: List[str]
+
+
 class UniverseBuilder:
-    def __init__(self):
+    def __init__(self, size: int = 2000):
+        self.size = size
         self.last_refresh: datetime | None = None
         self.universe: List[UniverseEntry] = []
+        self._slots: Dict[str, int] = {}
+        self._entries: List[Optional[UniverseEntry]] = []
+        self._free: List[int] = []
+        self._volume = np.empty(0)
 
     def refresh_needed(self) -> bool:
         if not self.last_refresh:
@@ -22,13 +38,57 @@ class UniverseBuilder:
         return datetime.utcnow() - self.last_refresh > timedelta(minutes=60)
 
     def build_universe(self, raw_universe: List[UniverseEntry]) -> List[UniverseEntry]:
-        filtered = [
-            entry
-            for entry in raw_universe
-            if 2 <= entry.last_price <= 500
-        ]
-        filtered = sorted(filtered, key=lambda item: item.avg_dollar_volume, reverse=True)
-        top = filtered[:2000]
-        self.universe = top
+        self.universe = []
+        self._slots = {}
+        self._entries = []
+        self._free = []
+        self._volume = np.empty(max(16, len(raw_universe)))
+        self.update_universe(raw_universe)
+        return self.universe
+
+    def update_universe(
+        self,
+        updates: Iterable[UniverseEntry],
+        delisted: Iterable[str] = (),
+    ) -> UniverseDelta:
+        for entry in updates:
+            slot = self._slots.get(entry.ticker)
+            if slot is None:
+                slot = self._allocate(entry.ticker)
+            self._entries[slot] = entry
+            eligible = 2 <= entry.last_price <= 500
+            self._volume[slot] = entry.avg_dollar_volume if eligible else -np.inf
+        for ticker in delisted:
+            slot = self._slots.pop(ticker, None)
+            if slot is not None:
+                self._entries[slot] = None
+                self._volume[slot] = -np.inf
+                self._free.append(slot)
+
+        volume = self._volume[: len(self._entries)]
+        picked = top_k_indices(volume, self.size)
+        picked = picked[volume[picked] > -np.inf]
+        previous = {entry.ticker for entry in self.universe}
+        self.universe = [self._entries[slot] for slot in picked.tolist()]
         self.last_refresh = datetime.utcnow()
-        return top
+
+        current = [entry.ticker for entry in self.universe]
+        current_set = set(current)
+        return UniverseDelta(
+            added=[ticker for ticker in current if ticker not in previous],
+            removed=sorted(previous - current_set),
+            unchanged=[ticker for ticker in current if ticker in previous],
+        )
+
+    def _allocate(self, ticker: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._entries)
+            self._entries.append(None)
+            if slot >= len(self._volume):
+                grown = np.empty(max(16, 2 * len(self._volume)))
+                grown[: len(self._volume)] = self._volume
+                self._volume = grown
+        self._slots[ticker] = slot
+        return slot
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, Dict, Optional, Sequence, Union
+
+import numpy as np
+
+from wire_schema import CHANNEL, RESOURCE_KEYS, as_utc, encode_delta, encode_full
+
+Column = Union[np.ndarray, list]
+Table = Dict[str, Column]
+
+
+def _column(values: list) -> Column:
+    if not values:
+        return values
+    first = values[0]
+    if isinstance(first, datetime):
+        micros = [int(as_utc(value).timestamp() * 1_000_000) for value in values]
+        return np.array(micros, dtype="datetime64[us]")
+    if isinstance(first, Enum):
+        return [value.value for value in values]
+    if isinstance(first, (int, float, np.number)) and not isinstance(first, bool):
+        column = np.asarray(values)
+        if column.dtype.kind in "iuf":
+            return column
+    return values
+
+
+def table_from_records(records: Sequence[dict]) -> Table:
+    if not records:
+        return {}
+    return {name: _column([record[name] for record in records]) for name in records[0]}
+
+
+def table_length(table: Table) -> int:
+    return len(next(iter(table.values()))) if table else 0
+
+
+def take_rows(table: Table, rows: np.ndarray) -> Table:
+    return {
+        name: column[rows] if isinstance(column, np.ndarray) else [column[row] for row in rows]
+        for name, column in table.items()
+    }
+
+
+def _changed_rows(current: Table, previous: Table, keys: Sequence[str], key: str) -> np.ndarray:
+    positions = {name: row for row, name in enumerate(previous[key])}
+    old = np.array([positions.get(name, -1) for name in keys], dtype=np.int64)
+    changed = old < 0
+    source = np.maximum(old, 0)
+    for name, column in current.items():
+        before = previous.get(name)
+        if before is None:
+            return np.ones(len(keys), dtype=bool)
+        if isinstance(column, np.ndarray) and isinstance(before, np.ndarray):
+            differs = before[source] != column
+            if column.dtype.kind == "f":
+                differs &= ~(np.isnan(before[source]) & np.isnan(column))
+            changed |= differs
+        else:
+            changed |= np.fromiter(
+                (before[row] != value for row, value in zip(source, column)), dtype=bool, count=len(keys)
+            )
+    return changed
+
+
+class MemoryTransport:
+    def __init__(self, maxsize: int = 0):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    async def send(self, frame: bytes) -> None:
+        await self._queue.put(frame)
+
+    async def frames(self) -> AsyncIterator[bytes]:
+        while True:
+            yield await self._queue.get()
+
+
+class RedisTransport:
+    def __init__(self, redis, channel: str = CHANNEL):
+        self._redis = redis
+        self.channel = channel
+
+    @classmethod
+    def from_url(cls, url: str, channel: str = CHANNEL) -> "RedisTransport":
+        from redis import asyncio as redis_asyncio
+
+        return cls(redis_asyncio.from_url(url), channel)
+
+    async def send(self, frame: bytes) -> None:
+        await self._redis.publish(self.channel, frame)
+
+
+class SnapshotPublisher:
+    def __init__(self, transport, full_every: int = 60):
+        self.transport = transport
+        self.full_every = full_every
+        self._seq: Dict[str, int] = {}
+        self._tables: Dict[str, Table] = {}
+
+    async def publish(self, resource: str, data: Union[dict, Table, Sequence[dict]]) -> Optional[bytes]:
+        key = RESOURCE_KEYS[resource]
+        seq = self._seq.get(resource, -1) + 1
+        if key is None:
+            frame = encode_full(resource, seq, data)
+        else:
+            table = table_from_records(data) if isinstance(data, (list, tuple)) else data
+            frame = self._encode_table(resource, key, seq, table)
+            if frame is None:
+                return None
+        self._seq[resource] = seq
+        await self.transport.send(frame)
+        return frame
+
+    def _encode_table(self, resource: str, key: str, seq: int, table: Table) -> Optional[bytes]:
+        previous = self._tables.get(resource)
+        self._tables[resource] = table
+        if previous is None or seq % self.full_every == 0 or not table or not previous:
+            return encode_full(resource, seq, table)
+        keys = list(table[key])
+        changed = _changed_rows(table, previous, keys, key)
+        current = set(keys)
+        removed = [name for name in previous[key] if name not in current]
+        count = int(changed.sum())
+        if not count and not removed:
+            return None
+        # A delta touching most of the book is no smaller than a full frame.
+        if count * 2 > len(keys):
+            return encode_full(resource, seq, table)
+        return encode_delta(resource, seq, take_rows(table, np.flatnonzero(changed)), removed)
@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from apps.api.hub import Topic
+from apps.api.main import app, hub, snapshots
+from apps.api.upstream import TTLCache
+
+
+def test_ttl_cache_single_flight():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"status": "ok"}
+
+    async def scenario():
+        cache = TTLCache(ttl=60, loader=loader)
+        return await asyncio.gather(*(cache.get() for _ in range(100)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result == {"status": "ok"} for result in results)
+
+
+def test_health_probes_share_cached_upstream_call(monkeypatch):
+    monkeypatch.setenv("ALPACA_API_KEY", "key")
+    monkeypatch.setenv("ALPACA_API_SECRET", "secret")
+    upstream_calls = []
+
+    def fake_alpaca(request: httpx.Request) -> httpx.Response:
+        upstream_calls.append(request.url.path)
+        return httpx.Response(200, json={})
+
+    with TestClient(app) as client:
+        app.state.http = httpx.AsyncClient(transport=httpx.MockTransport(fake_alpaca))
+        for _ in range(20):
+            assert client.get("/health").json()["alpaca"] == {"status": "ok", "code": 200}
+        assert client.get("/health/alpaca").json()["status"] == "ok"
+    assert upstream_calls == ["/v2/account"]
+
+
+def test_topic_delta_and_slow_consumer_resync():
+    async def scenario():
+        topic = Topic(history=2)
+        topic.publish([{"ticker": "AAA", "score": 1}, {"ticker": "BBB", "score": 2}])
+        stream = topic.subscribe()
+        snapshot = json.loads(await stream.__anext__())
+        assert not topic.publish([{"ticker": "AAA", "score": 1}])
+        topic.publish([{"ticker": "AAA", "score": 3}], removed=["BBB"])
+        delta = json.loads(await stream.__anext__())
+        for score in range(5):
+            topic.publish([{"ticker": "CCC", "score": score}])
+        resync = json.loads(await stream.__anext__())
+        await stream.aclose()
+        return snapshot, delta, resync, topic
+
+    snapshot, delta, resync, topic = asyncio.run(scenario())
+    assert snapshot["type"] == "snapshot" and len(snapshot["data"]) == 2
+    assert delta == {"type": "delta", "seq": 2, "upserts": [{"ticker": "AAA", "score": 3}], "removed": ["BBB"]}
+    assert resync["type"] == "snapshot" and resync["seq"] == topic.seq
+    assert topic.resyncs == 1 and topic.subscribers == 0
+
+
+def test_ws_candidates_streams_snapshot_then_deltas():
+    with TestClient(app) as client:
+        client.portal.call(hub.candidates.publish, [{"ticker": "AAA", "score": 1}], True)
+        with client.websocket_connect("/ws/candidates") as socket:
+            assert socket.receive_json()["data"] == [{"ticker": "AAA", "score": 1}]
+            client.portal.call(hub.candidates.publish, [{"ticker": "BBB", "score": 2}])
+            message = socket.receive_json()
+            assert message["type"] == "delta"
+            assert message["upserts"] == [{"ticker": "BBB", "score": 2}]
+
+
+def test_snapshot_endpoints_serve_etag_and_304():
+    candidate = {
+        "ticker": "AAA",
+        "entry_hint": 10.0,
+        "stop": 9.5,
+        "target": 11.0,
+        "ev": 0.4,
+        "certainty": 0.8,
+        "rationale": ["volume surge"],
+        "timestamp": "2024-01-02T15:30:00Z",
+    }
+    with TestClient(app) as client:
+        first = snapshots.update("candidates", [candidate])
+        resp = client.get("/candidates")
+        assert resp.status_code == 200
+        assert resp.json()[0]["ticker"] == "AAA"
+        etag = resp.headers["etag"]
+        assert client.get("/candidates", headers={"If-None-Match": etag}).status_code == 304
+        assert snapshots.update("candidates", [candidate]) is first
+
+        snapshots.update("candidates", [])
+        resp = client.get("/candidates", headers={"If-None-Match": etag})
+        assert resp.status_code == 200 and resp.json() == []
+        assert resp.headers["etag"] != etag
+        assert client.get("/risk").json()["max_positions"] == 10
+
+
+def test_metrics_endpoint_reports_routes_and_hub_state():
+    with TestClient(app) as client:
+        client.get("/candidates")
+        body = client.get("/metrics").text
+
+    assert 'http_request_seconds_count{method="GET",route="/candidates",status="200"}' in body
+    assert 'ws_subscribers{topic="candidates"} 0.0' in body
+    assert 'snapshot_version{resource="risk"}' in body
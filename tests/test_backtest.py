@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+import pytest
+
+from apps.worker.backtest import (
+    EXIT_NONE,
+    EXIT_STOP,
+    EXIT_TARGET,
+    EXIT_TIME,
+    BacktestConfig,
+    backtest_metrics,
+    simulate_brackets,
+)
+
+
+def ohlc(rows):
+    array = np.array(rows, dtype=float)[:, None, :]
+    return array[..., 0], array[..., 1], array[..., 2], array[..., 3]
+
+
+def run(rows, limit, stop, target, **config):
+    open_, high, low, close = ohlc(rows)
+    return simulate_brackets(
+        open_, high, low, close,
+        symbols=np.array([0]), bars=np.array([0]),
+        limit=np.array([limit]), stop=np.array([stop]), target=np.array([target]), qty=np.array([10]),
+        config=BacktestConfig(slippage_bps=0.0, **config),
+    )
+
+
+def test_limit_entry_then_target():
+    rows = [(100, 100, 100, 100), (101, 101, 99, 100), (100, 106, 100, 105)]
+    result = run(rows, limit=99.5, stop=97, target=105)
+    assert result.exit_reason[0] == EXIT_TARGET
+    assert result.entry_bar[0] == 1 and result.exit_bar[0] == 2
+    assert result.pnl[0] == pytest.approx(10 * (105 - 99.5))
+
+
+def test_same_bar_ambiguity_rule_and_gaps():
+    rows = [(100, 100, 100, 100), (100, 100, 99, 99.5), (99, 106, 96, 100)]
+    assert run(rows, 99.5, 97, 105, ambiguity="stop").exit_reason[0] == EXIT_STOP
+    assert run(rows, 99.5, 97, 105, ambiguity="target").exit_reason[0] == EXIT_TARGET
+    assert run(rows, 99.5, 97, 105, ambiguity="nearest").exit_reason[0] == EXIT_STOP
+
+    gap_down = [(100, 100, 100, 100), (100, 100, 99, 99.5), (95, 96, 94, 95)]
+    result = run(gap_down, 99.5, 97, 105)
+    assert result.exit_price[0] == pytest.approx(95)
+
+
+def test_unfilled_and_time_exit():
+    rows = [(100, 100, 100, 100), (100, 101, 99.8, 100), (100, 101, 99.9, 100)]
+    assert run(rows, 99, 97, 105).exit_reason[0] == EXIT_NONE
+    timed = run(rows, 100, 97, 105, max_hold=2)
+    assert timed.exit_reason[0] == EXIT_TIME
+    assert timed.exit_price[0] == pytest.approx(100)
+
+
+def test_hundred_thousand_trades_is_fast():
+    rng = np.random.default_rng(0)
+    total, symbols, count = 2000, 200, 100_000
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.002, (total, symbols)), axis=0))
+    high, low = close * 1.001, close * 0.999
+    bars = rng.integers(0, total - 1, count)
+    cols = rng.integers(0, symbols, count)
+    entry = close[bars, cols]
+    started = time.perf_counter()
+    result = simulate_brackets(
+        close, high, low, close, cols, bars, entry, entry * 0.99, entry * 1.02, np.full(count, 10),
+        BacktestConfig(entry_window=30, max_hold=120),
+    )
+    metrics = backtest_metrics(result, total)
+    assert time.perf_counter() - started < 10
+    assert metrics["trades"] == int(result.filled.sum()) > 0
+    assert set(metrics) == {"sharpe", "max_drawdown", "trades", "win_rate"}
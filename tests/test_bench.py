@@ -0,0 +1,48 @@
+from dataclasses import replace
+
+import pytest
+
+from apps.worker.bench import CASES, BenchConfig, compare, load_baseline, run_suite, save_baseline, synthetic_panel
+from apps.worker.cli import bench
+
+SMALL = BenchConfig(
+    symbols=300, days=12, research_symbols=3, train_window=390 * 4, val_window=390, step=390, records=50, repeat=2
+)
+
+
+def test_synthetic_panel_is_deterministic():
+    first, second = synthetic_panel(SMALL), synthetic_panel(SMALL)
+    assert first["close"].shape == (12 * 390, 3)
+    assert all((first[key] == second[key]).all() for key in first)
+
+
+def test_suite_round_trips_baseline_and_flags_regressions(tmp_path):
+    run = run_suite(SMALL)
+    assert set(run.results) | set(run.skipped) == set(CASES)
+    baseline = load_baseline(str(save_baseline(run, str(tmp_path / "baseline.json"))))
+    assert compare(run, baseline) == []
+
+    baseline["results"]["rank"]["min_s"] = run.results["rank"].min_s / 10
+    assert [regression.name for regression in compare(run, baseline)] == ["rank"]
+
+    baseline["config"]["symbols"] = 10
+    with pytest.raises(ValueError):
+        compare(run, baseline)
+
+
+def test_cli_bench_fails_without_baseline_unless_asked_to_record(tmp_path, capsys):
+    path = str(tmp_path / "baseline.json")
+    assert not bench(SMALL, ["rank"], path)
+    assert "No baseline" in capsys.readouterr().out
+    assert bench(SMALL, ["rank"], path, update_baseline=True)
+    assert bench(SMALL, ["rank"], path, threshold=100.0)
+
+
+def test_cli_bench_reports_bad_input_instead_of_raising(tmp_path, capsys):
+    path = str(tmp_path / "baseline.json")
+    assert not bench(SMALL, ["nope"], path)
+    assert "unknown benchmarks" in capsys.readouterr().out
+
+    assert bench(SMALL, ["rank"], path, update_baseline=True)
+    assert not bench(replace(SMALL, symbols=200), ["rank"], path)
+    assert "different benchmark config" in capsys.readouterr().out
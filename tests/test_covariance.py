@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from apps.worker.covariance import PortfolioVariance, RollingCovariance
+from apps.worker.features import Bar
+from apps.worker.risk import RiskConfig, allocate_trades
+
+
+def factor_returns(rows: int, names: int, seed: int = 3) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0.0, 0.001, (rows, 2))
+    loadings = rng.normal(1.0, 0.4, (names, 2))
+    return factors @ loadings.T + rng.normal(0.0, 0.0004, (rows, names))
+
+
+def test_incremental_updates_match_ew_recompute_and_sketch_tracks_it():
+    returns = factor_returns(1500, 60)
+    tickers = [f"S{idx}" for idx in range(60)]
+    dense = RollingCovariance(tickers, halflife=200)
+    sketch = RollingCovariance(tickers, halflife=200, rank=6)
+    for row in returns:
+        dense.update(row)
+        sketch.update(row)
+
+    decay = dense.decay
+    mean, expected = np.zeros(60), np.zeros((60, 60))
+    for row in returns:
+        delta = row - mean
+        mean += (1 - decay) * delta
+        expected = decay * (expected + (1 - decay) * np.outer(delta, delta))
+    np.testing.assert_allclose(dense.covariance(tickers) / dense.periods_per_day, expected, rtol=1e-9, atol=1e-18)
+
+    weights = np.linspace(-1.0, 1.0, 60) * 1_000
+    exact = dense.dot(weights)
+    assert np.linalg.norm(sketch.dot(weights) - exact) / np.linalg.norm(exact) < 0.05
+    np.testing.assert_allclose(sketch.diagonal(), dense.diagonal())
+
+
+def test_observe_steps_once_per_minute():
+    model = RollingCovariance(["A", "B"], min_periods=2)
+    start = datetime(2024, 1, 2, 14, 30)
+    for minute, (a, b) in enumerate([(10.0, 20.0), (10.1, 20.2), (10.0, 20.0), (10.2, 20.4)]):
+        stamp = start + timedelta(minutes=minute)
+        model.observe([Bar("A", stamp, a, a, a, a, 1.0), Bar("B", stamp, b, b, b, b, 1.0)])
+    model.flush()
+    assert model.count == 3
+    assert model.correlation(["A", "B"])[0, 1] == pytest.approx(1.0)
+
+
+def test_correlated_candidate_gets_less_of_the_variance_budget():
+    tickers = ["HELD", "TWIN", "HEDGE"]
+    rng = np.random.default_rng(5)
+    model = RollingCovariance(tickers, halflife=100)
+    for _ in range(500):
+        base = rng.normal(0.0, 0.002)
+        model.update(np.array([base, base + rng.normal(0.0, 0.0002), rng.normal(0.0, 0.002)]))
+    config = RiskConfig(0.01, 0.55, 10, 2.0, 1.0, 0.03, 0.1, max_portfolio_vol=0.015)
+
+    def admit(ticker, held=20_000.0):
+        portfolio = PortfolioVariance(model, {"HELD": held})
+        decision = allocate_trades(
+            100_000.0,
+            np.array([100.0]),
+            np.array([1.0]),
+            np.array([0.9]),
+            ["any"],
+            config,
+            tickers=[ticker],
+            portfolio=portfolio,
+        )[0]
+        assert not decision.allowed or portfolio.variance <= (0.015 * 100_000.0) ** 2 * (1 + 1e-9)
+        return decision
+
+    twin, hedge = admit("TWIN"), admit("HEDGE")
+    assert twin.rationale == "trimmed to portfolio variance limit"
+    assert 0 < twin.qty < hedge.qty
+    blocked = admit("TWIN", held=200_000.0)
+    assert not blocked.allowed and blocked.rationale == "portfolio variance limit reached"
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from apps.worker.equity import EquityTracker, Holding
+from apps.worker.risk import DAILY_LOSS, RiskConfig
+
+CONFIG = RiskConfig(
+    base_risk=0.0025,
+    c_min=0.55,
+    max_positions=10,
+    max_gross_exposure=1.5,
+    sector_concentration=0.25,
+    daily_max_loss=0.03,
+    drawdown_max=0.1,
+)
+
+
+def test_fills_and_quotes_update_pnl_incrementally():
+    tracker = EquityTracker(CONFIG, 100_000.0)
+    tracker.on_fill("AAPL", "buy", 100, 50.0)
+    tracker.on_fill("AAPL", "buy", 100, 52.0)
+    assert tracker.holdings["AAPL"].avg_entry == pytest.approx(51.0)
+
+    tracker.on_quote("AAPL", 61.0)
+    assert tracker.unrealized == pytest.approx(2_000.0)
+    assert tracker.high_water == pytest.approx(102_000.0)
+
+    tracker.on_fill("AAPL", "sell", 150, 56.0)
+    assert tracker.realized == pytest.approx(750.0)
+    assert tracker.unrealized == pytest.approx(250.0)
+    assert tracker.equity == pytest.approx(101_000.0)
+    assert tracker.drawdown == pytest.approx(1 - 101_000 / 102_000)
+
+    tracker.on_fill("AAPL", "sell", 50, 56.0)
+    assert "AAPL" not in tracker.holdings
+    assert tracker.unrealized == 0.0
+    assert tracker.equity == pytest.approx(101_000.0)
+
+
+def test_breaker_trips_once_flattens_and_daily_halt_ends_with_session():
+    halts = []
+
+    async def flatten(state):
+        halts.append(state.reason)
+
+    async def scenario():
+        tracker = EquityTracker(CONFIG, 100_000.0, on_trip=flatten)
+        tracker.reset(100_000.0, {"MSFT": Holding(1_000, 100.0, 100.0)})
+        tracker.on_quote("MSFT", 98.0, datetime(2024, 1, 2, 15, 0))
+        assert not tracker.state.tripped
+        tracker.on_quote("MSFT", 96.5, datetime(2024, 1, 2, 15, 1))
+        tracker.on_quote("MSFT", 96.0, datetime(2024, 1, 2, 15, 2))
+        await asyncio.sleep(0)
+        assert tracker.state.reason == DAILY_LOSS
+        assert halts == [DAILY_LOSS]
+
+        tracker.on_quote("MSFT", 96.0, datetime(2024, 1, 3, 15, 0))
+        assert not tracker.state.tripped
+        assert tracker.session_open == pytest.approx(96_000.0)
+
+    asyncio.run(scenario())
+
+
+def test_failed_trip_handler_is_logged(caplog):
+    async def flatten(state):
+        raise RuntimeError("broker down")
+
+    async def scenario():
+        tracker = EquityTracker(CONFIG, 100_000.0, on_trip=flatten)
+        tracker.reset(90_000.0)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert "circuit breaker handler failed" in caplog.text
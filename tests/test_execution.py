@@ -1,9 +1,18 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+import websockets
+
 from apps.worker.alpaca import AlpacaClient
 from apps.worker.config import Settings
+from apps.worker.execution import OrderLedger, build_bracket_order, submit_orders
+from apps.worker.trade_stream import TradeBook, TradeStream
 
 
-def test_idempotent_order_key_stable():
-    settings = Settings(
+def make_settings() -> Settings:
+    return Settings(
         alpaca_api_key="key",
         alpaca_api_secret="secret",
         alpaca_base_url="https://paper-api.alpaca.markets",
@@ -23,6 +32,310 @@ def test_idempotent_order_key_stable():
         daily_max_loss=0.03,
         drawdown_max=0.1,
     )
-    client = AlpacaClient(settings)
+
+
+def test_idempotent_order_key_stable():
+    client = AlpacaClient(make_settings())
     order = {"symbol": "AAPL", "qty": 10, "side": "buy", "type": "market"}
     assert client.build_idempotency_key(order) == client.build_idempotency_key(order)
+
+
+def test_idempotency_key_is_scoped_to_session():
+    client = AlpacaClient(make_settings())
+    order = build_bracket_order("AAA", 10, 100.0, 98.0, 104.0)
+    assert client.build_idempotency_key(order, "2024-01-02") != client.build_idempotency_key(order, "2024-01-03")
+
+
+def test_ledger_compacts_old_sessions_and_reconciles_inflight(tmp_path):
+    path = tmp_path / "ledger.jsonl"
+    lines = [
+        {"key": "old", "status": "submitted", "order_id": "o0", "message": "ok", "session": "2024-01-01"},
+        {"key": "landed", "status": "inflight", "order_id": None, "message": "", "session": "2024-01-02"},
+        {"key": "lost", "status": "inflight", "order_id": None, "message": "", "session": "2024-01-02"},
+    ]
+    path.write_text("".join(json.dumps(line) + "\n" for line in lines))
+    requests = []
+
+    def fake_broker(request: httpx.Request) -> httpx.Response:
+        requests.append(dict(request.url.params))
+        return httpx.Response(200, json=[{"id": "o1", "client_order_id": "landed"}])
+
+    async def scenario():
+        client = AlpacaClient(make_settings(), transport=httpx.MockTransport(fake_broker))
+        ledger = OrderLedger(str(path), session="2024-01-02")
+        assert len(path.read_text().splitlines()) == 2
+        assert await ledger.reconcile(client) == 2
+        await client.close()
+        return ledger
+
+    ledger = asyncio.run(scenario())
+    assert requests[0]["status"] == "all" and requests[0]["after"].startswith("2024-01-02T00:00:00")
+    assert "old" not in ledger.entries
+    assert ledger.entries["landed"]["order_id"] == "o1" and ledger.status("landed") == "submitted"
+    assert ledger.status("lost") == "error"
+
+
+def test_cancelled_submission_releases_duplicates(tmp_path):
+    order = build_bracket_order("AAA", 10, 100.0, 98.0, 104.0)
+    reached = asyncio.Event()
+
+    async def stuck_broker(request: httpx.Request) -> httpx.Response:
+        reached.set()
+        await asyncio.Event().wait()
+
+    async def scenario():
+        client = AlpacaClient(make_settings(), transport=httpx.MockTransport(stuck_broker))
+        ledger = OrderLedger(str(tmp_path / "ledger.jsonl"))
+        first = asyncio.create_task(submit_orders(client, [order], ledger))
+        await reached.wait()
+        duplicate = asyncio.create_task(submit_orders(client, [order], ledger))
+        await asyncio.sleep(0)
+        first.cancel()
+        (result,) = await asyncio.wait_for(duplicate, 1)
+        await client.close()
+        return ledger, result
+
+    ledger, result = asyncio.run(scenario())
+    assert result.result.status == "duplicate"
+    # Unknown outcome stays "inflight" so it is neither resent nor forgotten before reconcile.
+    assert ledger.status(result.key) == "inflight"
+    assert OrderLedger(str(tmp_path / "ledger.jsonl")).status(result.key) == "inflight"
+
+
+def test_ledger_batches_writes_off_the_event_loop(tmp_path):
+    orders = [build_bracket_order(ticker, 10, 100.0, 98.0, 104.0) for ticker in ("AAA", "BBB", "CCC")]
+    ledger = OrderLedger(str(tmp_path / "ledger.jsonl"))
+    writes = []
+    append = ledger._append
+    ledger._append = lambda lines: writes.append(len(lines)) or append(lines)
+
+    async def scenario():
+        broker = httpx.MockTransport(lambda request: httpx.Response(200, json={"id": "o"}))
+        client = AlpacaClient(make_settings(), transport=broker)
+        await submit_orders(client, orders, ledger)
+        await client.close()
+
+    asyncio.run(scenario())
+    # Six records (inflight + result per order) share fewer fsyncs, and all of them reach the file.
+    assert sum(writes) == 6 and len(writes) < 6
+    assert len((tmp_path / "ledger.jsonl").read_text().splitlines()) == 6
+
+
+def test_fetch_bars_bulk_follows_pagination():
+    requests = []
+
+    def fake_data_server(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        assert request.url.host == "data.alpaca.markets"
+        symbols = request.url.params["symbols"].split(",")
+        token = request.url.params.get("page_token")
+        page = int(token) if token else 0
+        bars = {symbol: [{"t": f"2024-01-02T14:3{page}:00Z", "c": 1.0}] for symbol in symbols}
+        next_token = str(page + 1) if page < 2 else None
+        return httpx.Response(200, json={"bars": bars, "next_page_token": next_token})
+
+    client = AlpacaClient(make_settings(), transport=httpx.MockTransport(fake_data_server))
+    pages = []
+    symbols = [f"S{i}" for i in range(5)]
+    total = asyncio.run(
+        client.fetch_bars_bulk(symbols, "1Min", "2024-01-02", pages.append, chunk_size=2, concurrency=2)
+    )
+    assert total == 15
+    assert len(requests) == 9
+    assert sorted({symbol for page in pages for symbol in page}) == symbols
+
+
+def test_fetch_bars_bulk_stops_sibling_drains_on_failure():
+    finished = []
+
+    async def slow_data_server(request: httpx.Request) -> httpx.Response:
+        symbols = request.url.params["symbols"].split(",")
+        if symbols != ["S0"]:
+            await asyncio.sleep(0.2)
+            finished.append(symbols)
+        return httpx.Response(200, json={"bars": {symbol: [{"t": "2024-01-02T14:30:00Z"}] for symbol in symbols}})
+
+    def consumer(page):
+        if "S0" in page:
+            raise RuntimeError("bad page")
+
+    async def scenario():
+        client = AlpacaClient(make_settings(), transport=httpx.MockTransport(slow_data_server))
+        with pytest.raises(RuntimeError, match="bad page"):
+            await client.fetch_bars_bulk(["S0", "S1", "S2"], "1Min", "2024-01-02", consumer, chunk_size=1)
+        # Nothing is left running against the client once the call has raised.
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+        await client.close()
+        await asyncio.sleep(0.3)
+
+    asyncio.run(scenario())
+    assert finished == []
+
+
+def test_submit_orders_concurrent_and_deduplicated(tmp_path):
+    submitted = []
+
+    def fake_broker(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        submitted.append(body["client_order_id"])
+        return httpx.Response(200, json={"id": f"order-{len(submitted)}"})
+
+    orders = [
+        build_bracket_order("AAA", 10, 100.0, 98.0, 104.0),
+        build_bracket_order("BBB", 5, 50.0, 49.0, 52.0),
+        build_bracket_order("AAA", 10, 100.0, 98.0, 104.0),
+    ]
+    ledger_path = tmp_path / "ledger.jsonl"
+
+    async def scenario():
+        client = AlpacaClient(make_settings(), transport=httpx.MockTransport(fake_broker))
+        first = await submit_orders(client, orders, OrderLedger(str(ledger_path)))
+        restarted = await submit_orders(client, orders[:2], OrderLedger(str(ledger_path)))
+        await client.close()
+        return first, restarted
+
+    first, restarted = asyncio.run(scenario())
+    assert len(submitted) == 2
+    assert [item.result.status for item in first] == ["submitted", "submitted", "duplicate"]
+    assert first[2].result.order_id == first[0].result.order_id
+    assert all(item.latency >= 0 for item in first)
+    assert [item.result.status for item in restarted] == ["duplicate", "duplicate"]
+
+
+def trade_update(event, order_id, status, filled, position_qty, price, timestamp, execution_id):
+    return {
+        "stream": "trade_updates",
+        "data": {
+            "event": event,
+            "execution_id": execution_id,
+            "timestamp": timestamp,
+            "price": str(price),
+            "qty": "5",
+            "position_qty": str(position_qty),
+            "order": {
+                "id": order_id,
+                "symbol": "AAA",
+                "side": "buy",
+                "qty": "10",
+                "type": "limit",
+                "limit_price": "100",
+                "status": status,
+                "filled_qty": str(filled),
+                "submitted_at": "2024-01-02T14:30:00Z",
+                "updated_at": timestamp,
+            },
+        },
+    }
+
+
+def test_trade_stream_reconnects_and_resyncs_book():
+    connections = []
+    rest_calls = []
+    first = trade_update("partial_fill", "o1", "partially_filled", 5, 5, 100.0, "2024-01-02T14:31:00Z", "e1")
+    second = trade_update("fill", "o1", "filled", 10, 10, 102.0, "2099-01-02T14:32:00Z", "e2")
+
+    async def fake_stream(socket):
+        connections.append(socket)
+        assert json.loads(await socket.recv())["action"] == "auth"
+        await socket.send(json.dumps({"stream": "authorization", "data": {"status": "authorized"}}))
+        assert json.loads(await socket.recv())["action"] == "listen"
+        await socket.send(json.dumps({"stream": "listening", "data": {"streams": ["trade_updates"]}}))
+        if len(connections) == 1:
+            await socket.send(json.dumps(first))
+            await socket.close()
+        else:
+            # A replayed execution must not be applied twice.
+            await socket.send(json.dumps(first))
+            await socket.send(json.dumps(second))
+            await socket.wait_closed()
+
+    def fake_broker(request: httpx.Request) -> httpx.Response:
+        rest_calls.append((request.url.path, request.url.params.get("status")))
+        if request.url.path == "/v2/positions":
+            positions = [{"symbol": "AAA", "qty": "5", "avg_entry_price": "100", "current_price": "101"}]
+            return httpx.Response(200, json=positions if len(connections) > 1 else [])
+        return httpx.Response(200, json=[])
+
+    async def scenario():
+        updates = []
+        async with websockets.serve(fake_stream, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            client = AlpacaClient(make_settings(), transport=httpx.MockTransport(fake_broker))
+            book = TradeBook()
+            stream = TradeStream(
+                make_settings(),
+                book,
+                client,
+                on_update=lambda book: updates.append(book.version),
+                url=f"ws://127.0.0.1:{port}",
+            )
+            stream.backoff.jitter = False
+            stream.backoff.base_delay = 0.01
+            task = asyncio.create_task(stream.run())
+            while book.orders.get("o1") is None or book.orders["o1"].status != "filled":
+                await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await client.close()
+            return book, stream, updates
+
+    book, stream, updates = asyncio.run(asyncio.wait_for(scenario(), 10))
+    assert stream.connects == 2
+    assert ("/v2/orders", "closed") in rest_calls
+    assert book.order_records()[0]["filled_qty"] == 10
+    position = book.positions["AAA"]
+    assert position.qty == 10 and position.avg_entry == 101.0
+    assert book.risk_inputs({"AAA": "tech"}) == {
+        "open_positions": 1,
+        "gross_exposure": 1020.0,
+        "sector_exposure": {"tech": 1020.0},
+    }
+    assert updates == sorted(updates)
+
+
+def test_trade_stream_skips_bad_frames_and_reconnects_on_bad_updates():
+    connections = []
+    fill = trade_update("fill", "o1", "filled", 10, 10, 100.0, "2024-01-02T14:31:00Z", "e1")
+
+    async def fake_stream(socket):
+        connections.append(socket)
+        await socket.recv()
+        await socket.send(json.dumps({"stream": "authorization", "data": {"status": "authorized"}}))
+        await socket.recv()
+        await socket.send(json.dumps({"stream": "listening", "data": {"streams": ["trade_updates"]}}))
+        if len(connections) == 1:
+            await socket.send("not json")
+            await socket.send(json.dumps({"stream": "trade_updates"}))
+        else:
+            await socket.send(json.dumps(fill))
+        await socket.wait_closed()
+
+    async def scenario():
+        async with websockets.serve(fake_stream, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            book = TradeBook()
+            stream = TradeStream(make_settings(), book, url=f"ws://127.0.0.1:{port}")
+            stream.backoff.jitter = False
+            stream.backoff.base_delay = 0.01
+            task = asyncio.create_task(stream.run())
+            while "o1" not in book.orders:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return stream
+
+    stream = asyncio.run(asyncio.wait_for(scenario(), 10))
+    assert stream.connects == 2
+    assert stream.events == 2
+
+
+def test_open_market_buy_is_valued_at_last_mark():
+    book = TradeBook()
+    book.upsert_order(
+        {"id": "m1", "symbol": "BBB", "side": "buy", "qty": "10", "type": "market", "status": "new",
+         "filled_qty": "0", "submitted_at": "2024-01-02T14:30:00Z"}
+    )
+    assert book.exposures() == {"BBB": 0.0}
+    marks = {"BBB": 25.0}.get
+    assert book.exposures(marks) == {"BBB": 250.0}
+    assert book.risk_inputs({"BBB": "tech"}, marks)["sector_exposure"] == {"tech": 250.0}
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from apps.worker.features import (
+    Bar,
+    FeatureEngine,
+    FeatureParams,
+    RollingWindow,
+    compute_feature_panel,
+    session_starts,
+)
+from apps.worker.store import BarStore, load_panel
+
+
+def test_rolling_window_mean():
+    window = RollingWindow(3)
+    for value in [1, 2, 3, 4, 5]:
+        window.push(value)
+    assert window.mean == pytest.approx(4.0)
+
+
+def test_engine_emits_only_changed_symbols():
+    engine = FeatureEngine(FeatureParams(volume_window=2, atr_fast=1, atr_slow=2, ma_fast=1, ma_slow=2))
+    day1 = datetime(2024, 1, 2, 15, 59)
+    day2 = datetime(2024, 1, 3, 9, 30)
+    engine.update([Bar("AAA", day1, 10, 10, 10, 10, 100), Bar("BBB", day1, 5, 5, 5, 5, 100)])
+    emitted = engine.update([Bar("AAA", day2, 11, 12, 11, 12, 300)])
+    assert [snap.ticker for snap in emitted] == ["AAA"]
+    snap = emitted[0]
+    assert snap.gap_pct == pytest.approx(0.1)
+    assert snap.volume_surge == pytest.approx(1.5)
+    assert snap.volatility_expansion == pytest.approx(2 / 1 - 1)
+    assert snap.trend_alignment == pytest.approx(2 / 3)
+    assert set(engine.latest) == {"AAA", "BBB"}
+
+
+def test_engine_gap_uses_prior_session_close():
+    engine = FeatureEngine()
+    start = datetime(2024, 1, 2, 9, 30)
+    bars = [Bar("AAA", start + timedelta(minutes=i), 10, 10, 10, 10, 100) for i in range(5)]
+    engine.update(bars)
+    snap = engine.update([Bar("AAA", start + timedelta(days=1), 9, 9, 9, 9, 100)])[0]
+    assert snap.gap_pct == pytest.approx(-0.1)
+
+
+def test_feature_panel_matches_streaming_engine():
+    rng = np.random.default_rng(1)
+    total, symbols = 60, 3
+    close = 10 + np.cumsum(rng.normal(0, 0.1, (total, symbols)), axis=0)
+    open_ = close + rng.normal(0, 0.05, (total, symbols))
+    high = np.maximum(open_, close) + 0.05
+    low = np.minimum(open_, close) - 0.05
+    volume = rng.uniform(100, 1000, (total, symbols))
+    times = [datetime(2024, 1, 2, 9, 30) + timedelta(days=t // 25, minutes=t % 25) for t in range(total)]
+    session_start = np.array([t == 0 or times[t].date() != times[t - 1].date() for t in range(total)])
+
+    panel = compute_feature_panel(open_, high, low, close, volume, session_start)
+    engine = FeatureEngine()
+    for t in range(total):
+        bars = [
+            Bar(f"S{s}", times[t], open_[t, s], high[t, s], low[t, s], close[t, s], volume[t, s])
+            for s in range(symbols)
+        ]
+        for s, snap in enumerate(engine.update(bars)):
+            expected = [snap.volume_surge, snap.gap_pct, snap.volatility_expansion, snap.trend_alignment]
+            assert panel[t, s] == pytest.approx(expected)
+
+
+def test_feature_panel_masks_late_listing_symbol(tmp_path):
+    rng = np.random.default_rng(2)
+    closes = 10 + np.cumsum(rng.normal(0, 0.1, 40))
+
+    def bars(minutes):
+        return [
+            {"t": f"2024-01-02T14:{m:02d}:00Z", "o": closes[m], "h": closes[m] + 0.1, "l": closes[m] - 0.1,
+             "c": closes[m], "v": 100 + m}
+            for m in minutes
+        ]
+
+    store = BarStore(str(tmp_path))
+    store.append_page("1Min", {"AAA": bars(range(40)), "BBB": bars(range(20, 40))})
+    store.flush("1Min")
+    panel = load_panel(store, ["AAA", "BBB"], "1Min")
+    params = FeatureParams(volume_window=5, atr_fast=2, atr_slow=5, ma_fast=3, ma_slow=6)
+    fields = [panel[name] for name in ("open", "high", "low", "close", "volume")]
+    features = compute_feature_panel(*fields, session_starts(panel["t"]), params)
+
+    assert np.isnan(features[:20, 1]).all()
+    # Once listed, the late symbol matches a panel computed from its own first bar.
+    alone = compute_feature_panel(*(field[20:, 1:] for field in fields), None, params)
+    assert np.allclose(features[20:, 1], alone[:, 0])
+    assert np.isfinite(features[:, 0]).all()
@@ -0,0 +1,44 @@
+import asyncio
+
+import instrumentation
+from apps.worker.rate_limiter import TokenBucket
+
+
+def sample_count(stage: str) -> float:
+    return instrumentation.REGISTRY.get_sample_value("worker_stage_seconds_count", {"stage": stage}) or 0.0
+
+
+def test_timed_records_sync_and_async_calls_and_renders():
+    @instrumentation.timed("test_sync")
+    def double(value):
+        return value * 2
+
+    @instrumentation.timed("test_async")
+    async def triple(value):
+        return value * 3
+
+    assert double(2) == 4
+    assert asyncio.run(triple(2)) == 6
+    assert sample_count("test_sync") == 1
+    assert sample_count("test_async") == 1
+
+    asyncio.run(TokenBucket(rate_per_minute=60).acquire())
+    text = instrumentation.render().decode()
+    assert 'worker_stage_seconds_count{stage="test_sync"} 1.0' in text
+    assert 'rate_limiter_wait_seconds_count{priority="default"}' in text
+
+
+def test_disabled_instrumentation_records_nothing():
+    @instrumentation.timed("test_disabled")
+    def work():
+        return "done"
+
+    instrumentation.set_enabled(False)
+    try:
+        assert work() == "done"
+        instrumentation.increment(instrumentation.RETRIES_EXHAUSTED)
+    finally:
+        instrumentation.set_enabled(True)
+    assert sample_count("test_disabled") == 0
+    work()
+    assert sample_count("test_disabled") == 1
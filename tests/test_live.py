@@ -0,0 +1,169 @@
+import asyncio
+import json
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+import pytest
+
+from apps.worker.alpaca import AlpacaClient
+from apps.worker.execution import OrderLedger
+from apps.worker.features import Bar
+from apps.worker.live import LivePipeline, LiveTrader, Stage, Tick
+from apps.worker.rate_limiter import RetryPolicy
+from apps.worker.risk import DAILY_LOSS, CircuitBreakerState
+from apps.worker.trade_stream import PositionState, TradeBook
+from test_execution import make_settings
+
+START = datetime(2024, 1, 2, 14, 30)
+
+
+def bars_for(minute: int, tickers, volume: float = 1000.0):
+    stamp = START + timedelta(minutes=minute)
+    return [Bar(ticker, stamp, 10.0, 10.2, 9.9, 10.1, volume) for ticker in tickers]
+
+
+async def replay(batches, pause: float = 0.0):
+    for batch in batches:
+        yield batch
+        await asyncio.sleep(pause)
+
+
+def test_pipeline_keeps_every_bar_but_drops_superseded_ticks():
+    seen_bars = []
+    slow_ticks = []
+
+    async def slow(tick):
+        await asyncio.sleep(0.02)
+        slow_ticks.append(tick.seq)
+
+    stages = [
+        Stage("features", lambda tick: seen_bars.extend(tick.bars), coalesce=True),
+        Stage("execute", slow),
+    ]
+    batches = [bars_for(minute, ["AAA"]) for minute in range(50)]
+    pipeline = LivePipeline(replay(batches), stages)
+    asyncio.run(asyncio.wait_for(pipeline.run(), 10))
+
+    assert len(seen_bars) == 50
+    assert pipeline.dropped["execute"] > 0
+    assert len(slow_ticks) + pipeline.dropped["execute"] == pipeline.processed["features"]
+    assert slow_ticks == sorted(slow_ticks) and slow_ticks[-1] == 50
+    report = pipeline.report()["latency"]
+    assert report["execute"]["p99_ms"] >= report["execute"]["p50_ms"] >= 20
+
+
+def test_pipeline_drops_stale_ticks():
+    async def stamped():
+        yield bars_for(0, ["AAA"])
+
+    ran = []
+    stages = [Stage("features", lambda tick: None, coalesce=True), Stage("risk", ran.append)]
+    pipeline = LivePipeline(stamped(), stages, max_age=0.0)
+    asyncio.run(pipeline.run())
+    assert ran == [] and pipeline.dropped["risk"] == 1
+
+
+def test_live_trader_submits_once_per_signal_and_tracks_latency(tmp_path):
+    submitted = []
+
+    def fake_broker(request: httpx.Request) -> httpx.Response:
+        submitted.append(json.loads(request.content))
+        return httpx.Response(200, json={"id": f"order-{len(submitted)}"})
+
+    async def scenario():
+        client = AlpacaClient(make_settings(), transport=httpx.MockTransport(fake_broker))
+        ledger = OrderLedger(str(tmp_path / "orders.jsonl"))
+        trader = LiveTrader(client, make_settings(), TradeBook(), ledger, 100_000.0)
+        batches = [bars_for(minute, ["AAA", "BBB"]) for minute in range(30)]
+        batches += [bars_for(30, ["AAA"], volume=20_000.0), bars_for(31, ["AAA"], volume=25_000.0)]
+        pipeline = LivePipeline(replay(batches, pause=0.005), trader.stages(), latency=trader.latency)
+        await pipeline.run()
+        await client.close()
+        return trader, pipeline
+
+    trader, pipeline = asyncio.run(asyncio.wait_for(scenario(), 10))
+    assert [order["symbol"] for order in submitted] == ["AAA"]
+    order = submitted[0]
+    assert order["order_class"] == "bracket" and order["qty"] > 0
+    assert order["stop_loss"]["stop_price"] < order["limit_price"] < order["take_profit"]["limit_price"]
+    summary = pipeline.report()["latency"]
+    assert summary["bar_to_order"]["count"] == 1
+    assert sum(pipeline.errors.values()) == 0
+
+
+def test_busy_tickers_do_not_consume_allocation_slots(tmp_path):
+    settings = replace(make_settings(), max_positions=1)
+    trader = LiveTrader(None, settings, TradeBook(), OrderLedger(str(tmp_path / "orders.jsonl")), 100_000.0)
+    trader.engine.update(bars_for(0, ["AAA", "BBB"]))
+    trader._submitted["AAA"] = time.monotonic()
+    tick = Tick(0, [], time.perf_counter())
+    tick.data.update(tickers=["AAA", "BBB"], certainty=np.array([0.9, 0.8]), rationale=[["a"], ["b"]])
+
+    assert asyncio.run(trader.risk(tick))
+    assert tick.data["tickers"] == ["BBB"]
+    assert [order["symbol"] for order in tick.data["orders"]] == ["BBB"]
+
+
+def test_halt_retries_flatten_until_it_succeeds(tmp_path):
+    calls = []
+
+    def broker(request: httpx.Request) -> httpx.Response:
+        calls.append((request.method, request.url.path, dict(request.url.params)))
+        return httpx.Response(403 if len(calls) < 3 else 200, json={})
+
+    async def scenario():
+        client = AlpacaClient(make_settings(), transport=httpx.MockTransport(broker))
+        book = TradeBook()
+        book.positions["AAA"] = PositionState("AAA", 10.0, 10.0, 10.0, 0)
+        trader = LiveTrader(
+            client,
+            make_settings(),
+            book,
+            OrderLedger(str(tmp_path / "orders.jsonl")),
+            100_000.0,
+            flatten_backoff=RetryPolicy(base_delay=0.0, jitter=False),
+        )
+        await trader._halt(CircuitBreakerState(True, DAILY_LOSS))
+        await client.close()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert calls == [("DELETE", "/v2/positions", {"cancel_orders": "true"})] * 3
+
+
+def test_tripped_breaker_drops_orders_between_stages(tmp_path):
+    trader = LiveTrader(None, make_settings(), TradeBook(), OrderLedger(str(tmp_path / "orders.jsonl")), 100_000.0)
+    trader.engine.update(bars_for(0, ["AAA"]))
+    tick = Tick(0, [], time.perf_counter())
+    tick.data.update(tickers=["AAA"], certainty=np.array([0.9]), rationale=[["a"]])
+    assert asyncio.run(trader.risk(tick))
+
+    trader.tracker.state = CircuitBreakerState(True, DAILY_LOSS)
+    asyncio.run(trader.execute(tick))
+    assert trader._submitted == {}
+    assert not asyncio.run(trader.risk(tick))
+
+
+def test_trader_refuses_live_endpoint_without_opt_ins(tmp_path):
+    ledger = OrderLedger(str(tmp_path / "orders.jsonl"))
+    live = replace(make_settings(), alpaca_base_url="https://api.alpaca.markets")
+    with pytest.raises(RuntimeError, match="ENABLE_LIVE_TRADING"):
+        LiveTrader(None, live, TradeBook(), ledger, 100_000.0)
+    with pytest.raises(RuntimeError, match="ADMIN_SECRET"):
+        placeholder = replace(live, enable_live_trading=True, admin_secret="change_me")
+        LiveTrader(None, placeholder, TradeBook(), ledger, 100_000.0)
+
+    armed = replace(live, enable_live_trading=True, admin_secret="s3cret")
+    assert LiveTrader(None, armed, TradeBook(), ledger, 100_000.0).config.max_positions == armed.max_positions
+
+
+def test_trader_uses_bundle_parameters(tmp_path):
+    parameters = {"ma_fast": 4, "weights": [1.0, 0.0, 0.0, 0.0], "c_min": 0.8, "threshold": 0.1}
+    ledger = OrderLedger(str(tmp_path / "orders.jsonl"))
+    trader = LiveTrader(None, make_settings(), TradeBook(), ledger, 100_000.0, parameters=parameters)
+    assert trader.engine.params.ma_fast == 4
+    assert trader.engine.params.ma_slow == 30
+    assert trader.weights.tolist() == [1.0, 0.0, 0.0, 0.0]
+    assert trader.config.c_min == 0.8
@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from apps.worker.rate_limiter import (
+    LocalTokenStore,
+    Priority,
+    RetryBudget,
+    RetryPolicy,
+    TokenBucket,
+    retry_after,
+    with_retry,
+)
+
+
+def test_acquire_blocks_until_token_available():
+    async def scenario():
+        bucket = TokenBucket(rate_per_minute=600, capacity=1)
+        first = await bucket.acquire()
+        started = time.monotonic()
+        second = await bucket.acquire()
+        return first, second, time.monotonic() - started
+
+    first, second, elapsed = asyncio.run(scenario())
+    assert first.allowed and first.wait_time == 0
+    assert second.allowed
+    assert elapsed >= 0.08
+
+
+def test_priority_lanes_served_before_bulk_fifo():
+    async def scenario():
+        bucket = TokenBucket(rate_per_minute=1200, capacity=1)
+        await bucket.acquire()
+        served = []
+
+        async def worker(name, priority):
+            await bucket.acquire(priority)
+            served.append(name)
+
+        tasks = [asyncio.create_task(worker("bulk-1", Priority.BULK))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(worker("bulk-2", Priority.BULK)))
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(worker("order", Priority.ORDERS)))
+        await asyncio.gather(*tasks)
+        return served
+
+    assert asyncio.run(scenario()) == ["order", "bulk-1", "bulk-2"]
+
+
+def test_buckets_share_budget_through_store():
+    async def scenario():
+        store = LocalTokenStore()
+        first = TokenBucket(rate_per_minute=60, capacity=2, store=store)
+        second = TokenBucket(rate_per_minute=60, capacity=2, store=store)
+        return [await first.try_acquire(), await second.try_acquire(), await second.try_acquire()]
+
+    results = asyncio.run(scenario())
+    assert [result.allowed for result in results] == [True, True, False]
+    assert results[2].wait_time > 0
+
+
+def status_error(code, headers=None):
+    request = httpx.Request("POST", "https://paper-api.alpaca.markets/v2/orders")
+    response = httpx.Response(code, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"{code}", request=request, response=response)
+
+
+def test_terminal_errors_are_not_retried():
+    calls = []
+
+    async def rejected():
+        calls.append(1)
+        raise status_error(422)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(with_retry(rejected, budget=RetryBudget()))
+    assert len(calls) == 1
+
+
+def test_nested_wrappers_share_one_budget():
+    calls = []
+
+    async def unavailable():
+        calls.append(1)
+        raise status_error(503)
+
+    async def submit():
+        return await with_retry(unavailable)
+
+    policy = RetryPolicy(max_retries=3, base_delay=0.001)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(with_retry(submit, policy=policy, budget=RetryBudget()))
+    assert len(calls) == 4
+
+
+def test_global_budget_caps_retries_across_calls():
+    budget = RetryBudget(max_retries=2)
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        raise httpx.ConnectError("down")
+
+    policy = RetryPolicy(max_retries=5, base_delay=0.001)
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectError):
+            asyncio.run(with_retry(flaky, policy=policy, budget=budget))
+    assert len(calls) == 4
+
+
+def test_retry_after_header_sets_minimum_delay():
+    assert retry_after(status_error(429, {"Retry-After": "7"})) == 7.0
+    assert retry_after(status_error(429)) is None
+    policy = RetryPolicy(base_delay=0.1, jitter=False)
+    assert policy.delay(1, retry_after=7.0) == 7.0
+    assert policy.delay(3) == pytest.approx(0.4)
@@ -0,0 +1,91 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from apps.api import main as api
+from apps.api.bundle_index import BundleIndex
+from apps.worker.bundle import create_bundle
+from apps.worker.registry import BundleRegistry
+
+
+def make_bundle(index: int, sharpe: float, parameters=None):
+    metrics = {"sharpe": sharpe, "max_drawdown": 0.1, "trades": 10, "win_rate": 0.5}
+    return create_bundle(
+        bundle_id=f"bundle-{index:05d}",
+        name="baseline",
+        parameters=parameters or {"quantile": 0.99},
+        metrics=metrics,
+        holdout_metrics=metrics,
+        metadata={"timeframe": "1Min"},
+    )
+
+
+def test_registry_dedups_payloads_and_pages_by_metric(tmp_path):
+    registry = BundleRegistry(str(tmp_path / "registry.db"))
+    for index, sharpe in enumerate([0.5, 2.0, 1.0, 2.0]):
+        registry.save(make_bundle(index, sharpe))
+    assert registry.count() == 4
+    assert registry._conn.execute("SELECT COUNT(*) FROM payloads").fetchone()[0] == 3
+
+    first = registry.query(sort="sharpe", limit=2)
+    second = registry.query(sort="sharpe", limit=2, offset=2)
+    assert [record.bundle_id for record in first + second] == [
+        "bundle-00003",
+        "bundle-00001",
+        "bundle-00002",
+        "bundle-00000",
+    ]
+    assert registry.load("bundle-00002").metrics["sharpe"] == 1.0
+    with pytest.raises(ValueError):
+        registry.query(sort="sharpe; DROP TABLE bundles")
+
+
+def test_select_requires_promotion_and_keeps_one_active(tmp_path):
+    registry = BundleRegistry(str(tmp_path / "registry.db"))
+    registry.save(make_bundle(1, 1.0))
+    registry.save(make_bundle(2, 1.5, {"quantile": 0.95}))
+    with pytest.raises(ValueError):
+        registry.select("bundle-00001")
+    with pytest.raises(KeyError):
+        registry.promote("missing")
+
+    registry.promote("bundle-00001")
+    registry.promote("bundle-00002")
+    registry.select("bundle-00001")
+    registry.select("bundle-00002")
+    assert registry.active().parameters == {"quantile": 0.95}
+    assert [record.active for record in registry.query(sort="name", descending=False)] == [False, True]
+
+
+def test_bundles_endpoint_reads_registry_pages(tmp_path, monkeypatch):
+    registry = BundleRegistry(str(tmp_path / "registry.db"))
+    for index in range(5):
+        registry.save(make_bundle(index, float(index)))
+    monkeypatch.setattr(api.bundle_index, "path", tmp_path / "registry.db")
+
+    with TestClient(api.app) as client:
+        resp = client.get("/bundles", params={"sort": "sharpe", "limit": 2, "offset": 1})
+        assert [bundle["bundle_id"] for bundle in resp.json()] == ["bundle-00003", "bundle-00002"]
+        assert resp.json()[0]["metrics"]["sharpe"] == 3.0
+        params = {"sort": "sharpe", "limit": 2, "offset": 1}
+        cached = client.get("/bundles", params=params, headers={"If-None-Match": resp.headers["etag"]})
+        assert cached.status_code == 304
+        assert client.get("/bundles", params={"sort": "bogus"}).status_code == 400
+
+
+def test_bundles_endpoint_caches_pages_per_registry_version(tmp_path, monkeypatch):
+    registry = BundleRegistry(str(tmp_path / "registry.db"))
+    registry.save(make_bundle(0, 0.5))
+    rendered = []
+    render = api.render_bundles
+    monkeypatch.setattr(api, "render_bundles", lambda rows: rendered.append(len(rows)) or render(rows))
+    monkeypatch.setattr(api, "bundle_index", BundleIndex(str(tmp_path / "registry.db")))
+
+    with TestClient(api.app) as client:
+        first = client.get("/bundles")
+        assert client.get("/bundles").headers["etag"] == first.headers["etag"]
+        assert rendered == [1]
+        registry.save(make_bundle(1, 1.5))
+        changed = client.get("/bundles")
+        assert changed.headers["etag"] != first.headers["etag"]
+        assert [bundle["bundle_id"] for bundle in changed.json()] == ["bundle-00001", "bundle-00000"]
+        assert rendered == [1, 2]
@@ -1,4 +1,15 @@
-from apps.worker.research import no_lookahead, time_split, walk_forward_splits
+import numpy as np
+
+from apps.worker.research import (
+    SharedArrays,
+    check_lookahead,
+    lag,
+    lag_view,
+    no_lookahead,
+    run_walk_forward,
+    time_split,
+    walk_forward_splits,
+)
 
 
 def test_no_lookahead_shift():
@@ -18,3 +29,61 @@ def test_walk_forward_splits():
     splits = list(walk_forward_splits(total=100, train_window=60, val_window=10, step=10))
     assert splits[0] == (slice(0, 60), slice(60, 70))
     assert splits[1] == (slice(0, 70), slice(70, 80))
+
+
+def make_arrays(total=400, symbols=8, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.01, (total, symbols)), axis=0))
+    features = rng.normal(0, 1, (total, symbols, 4))
+    return {"close": close, "features": features}
+
+
+def test_run_walk_forward_parallel_matches_inline():
+    arrays = make_arrays()
+    params = {"quantile": 0.9}
+    inline = run_walk_forward(arrays, train_window=100, val_window=50, step=50, params=params, max_workers=0)
+    pooled = run_walk_forward(arrays, train_window=100, val_window=50, step=50, params=params, max_workers=2)
+    assert len(inline.folds) == 4
+    assert inline.folds[-1].val.stop <= time_split(400).val.stop
+    assert pooled.metrics == inline.metrics
+    assert pooled.holdout_metrics == inline.holdout_metrics
+    assert inline.metrics["trades"] == sum(fold.metrics["trades"] for fold in inline.folds)
+
+
+def test_run_walk_forward_accepts_preallocated_shared_arrays():
+    arrays = make_arrays()
+    params = {"quantile": 0.9}
+    inline = run_walk_forward(arrays, train_window=100, val_window=50, step=50, params=params, max_workers=0)
+    with SharedArrays() as shared:
+        for name, array in arrays.items():
+            shared.allocate(name, array.shape)[...] = array
+        pooled = run_walk_forward(shared, train_window=100, val_window=50, step=50, params=params, max_workers=2)
+        # The caller's blocks are reused, not copied, and stay open until the caller exits.
+        assert len(shared.specs) == 2 and shared.arrays["close"][0, 0] == arrays["close"][0, 0]
+    assert pooled.metrics == inline.metrics
+    assert pooled.holdout_metrics == inline.holdout_metrics
+
+
+def test_lag_panel_multi_step_and_per_column():
+    panel = np.arange(12, dtype=float).reshape(4, 3)
+    shifted = lag(panel, 2)
+    assert np.isnan(shifted[:2]).all()
+    assert np.array_equal(shifted[2:], panel[:2])
+
+    per_column = lag(panel, [0, 1, -1])
+    assert np.array_equal(per_column[:, 0], panel[:, 0])
+    assert np.isnan(per_column[0, 1]) and per_column[1, 1] == panel[0, 1]
+    assert per_column[0, 2] == panel[1, 2] and np.isnan(per_column[-1, 2])
+
+    assert np.array_equal(no_lookahead(panel)[1:], panel[:-1])
+    past, rows = lag_view(panel, 1)
+    assert np.shares_memory(past, panel)
+    assert np.array_equal(past, panel[:-1]) and rows == slice(1, 4)
+
+
+def test_check_lookahead_flags_leaky_pipeline():
+    panel = np.random.default_rng(0).normal(size=(50, 4))
+    assert check_lookahead(lambda x: lag(x, 1), panel).passed
+    assert check_lookahead(lambda x: np.cumsum(x, axis=0), panel).passed
+    report = check_lookahead(lambda x: lag(x, -1), panel)
+    assert not report.passed and report.leaking_cutoffs
@@ -1,4 +1,14 @@
-from apps.worker.risk import RiskConfig, check_circuit_breaker
+import numpy as np
+import pytest
+
+from apps.worker.risk import (
+    RiskConfig,
+    allocate_trades,
+    check_circuit_breaker,
+    evaluate_trade,
+    reward_multiplier,
+    risk_multiplier,
+)
 
 
 def test_circuit_breaker_daily_loss():
@@ -14,3 +24,41 @@ def test_circuit_breaker_daily_loss():
     state = check_circuit_breaker(daily_loss=-0.04, drawdown=0.02, config=config)
     assert state.tripped is True
     assert state.reason == "daily loss limit exceeded"
+
+
+def test_allocate_trades_respects_portfolio_caps():
+    config = RiskConfig(
+        base_risk=0.01,
+        c_min=0.55,
+        max_positions=2,
+        max_gross_exposure=1.0,
+        sector_concentration=0.25,
+        daily_max_loss=0.03,
+        drawdown_max=0.1,
+    )
+    decisions = allocate_trades(
+        equity=100_000,
+        entries=np.array([100.0, 50.0, 20.0, 30.0]),
+        atrs=np.array([1.0, 1.0, 0.5, 0.5]),
+        certainties=np.array([0.9, 0.8, 0.5, 0.7]),
+        sectors=["tech", "tech", "energy", "energy"],
+        config=config,
+    )
+    assert decisions[2].rationale == "certainty below threshold"
+    assert decisions[0].allowed and decisions[0].qty == 250
+    assert decisions[0].rationale == "trimmed to sector concentration limit"
+    assert not decisions[1].allowed
+    assert decisions[1].rationale == "sector concentration limit reached"
+    assert decisions[3].allowed
+    assert sum(decision.allowed for decision in decisions) <= config.max_positions
+
+    single = evaluate_trade(100_000, 30.0, 0.5, 0.7, config)
+    assert decisions[3].stop == pytest.approx(single.stop)
+    assert decisions[3].target == pytest.approx(single.target)
+
+
+def test_multipliers_match_for_scalars_and_arrays():
+    certainties = np.array([0.0, 0.4, 0.9, 1.5])
+    assert risk_multiplier(certainties).tolist() == [risk_multiplier(c) for c in certainties.tolist()]
+    assert reward_multiplier(certainties).tolist() == [reward_multiplier(c) for c in certainties.tolist()]
+    assert risk_multiplier(1.5) == 2.0 and reward_multiplier(1.5) == 4.0
@@ -0,0 +1,29 @@
+import random
+
+from apps.worker.scanner import FeatureSnapshot, compute_score, rank_candidates
+
+
+def test_rank_candidates_matches_full_sort():
+    rng = random.Random(7)
+    features = [
+        FeatureSnapshot(
+            ticker=f"T{i}",
+            volume_surge=rng.choice([0.0, 0.5, 1.0, rng.random()]),
+            gap_pct=rng.random(),
+            volatility_expansion=rng.random(),
+            trend_alignment=rng.random(),
+        )
+        for i in range(1000)
+    ]
+    expected = sorted(features, key=compute_score, reverse=True)[:200]
+    ranked = rank_candidates(features)
+    assert [item.ticker for item in ranked] == [item.ticker for item in expected]
+    assert ranked[0].features is expected[0]
+    assert len({item.timestamp for item in ranked}) == 1
+
+
+def test_rank_candidates_small_universe():
+    features = [FeatureSnapshot("AAA", 1, 0, 0, 0), FeatureSnapshot("BBB", 2, 0, 0, 0)]
+    ranked = rank_candidates(features)
+    assert [item.ticker for item in ranked] == ["BBB", "AAA"]
+    assert rank_candidates([]) == []
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from apps.worker.certainty import CertaintyInputs, certainty_score, passing_signals
+from apps.worker.signals import ensemble_signals, ensemble_signals_batch
+
+
+def test_batch_matches_per_ticker_ensemble():
+    rows = [
+        {"volume_surge": 1.2, "gap_pct": 0.3, "volatility_expansion": 0.4, "trend_alignment": 0.9},
+        {"volume_surge": 0.1, "gap_pct": -1.5, "volatility_expansion": 2.0, "trend_alignment": -0.2},
+    ]
+    matrix = np.array(
+        [[row["volume_surge"], row["gap_pct"], row["volatility_expansion"], row["trend_alignment"]] for row in rows]
+    )
+    batch = ensemble_signals_batch(["AAA", "BBB"], matrix)
+    for idx, row in enumerate(rows):
+        expected = ensemble_signals(row)
+        assert [s.confidence for s in batch.signals_for(idx)] == pytest.approx([s.confidence for s in expected])
+
+    inputs = CertaintyInputs(0.5, 0.1, 0.5, 0.5)
+    scores = certainty_score(batch.confidence, inputs)
+    for idx, row in enumerate(rows):
+        assert scores[idx] == pytest.approx(certainty_score(ensemble_signals(row), inputs))
+
+
+def test_passing_signals_only_builds_survivors():
+    matrix = np.array([[0, 0, 1.0, 1.0], [0, 0, 0.0, 0.0]])
+    batch = ensemble_signals_batch(["AAA", "BBB"], matrix)
+    selected = passing_signals(batch, np.array([0.7, 0.3]), c_min=0.55)
+    assert list(selected) == ["AAA"]
+    assert [signal.name for signal in selected["AAA"]] == [
+        "momentum_breakout",
+        "mean_reversion",
+        "volatility_breakout",
+    ]
@@ -0,0 +1,33 @@
+import numpy as np
+
+from apps.worker.store import BarStore, bars_to_records
+
+
+def make_bars(minutes):
+    return [
+        {"t": f"2024-01-02T14:{minute:02d}:00Z", "o": 1.0, "h": 2.0, "l": 0.5, "c": 1.5, "v": 100 + minute}
+        for minute in minutes
+    ]
+
+
+def test_append_only_writes_missing_tail(tmp_path):
+    store = BarStore(str(tmp_path))
+    assert store.append_page("1Min", {"AAA": make_bars(range(0, 10))}) == 10
+    assert store.append_page("1Min", {"AAA": make_bars(range(5, 15))}) == 5
+
+    reopened = BarStore(str(tmp_path))
+    bars = reopened.read("AAA", "1Min")
+    assert len(bars) == 15
+    assert np.all(np.diff(bars["t"]) > 0)
+    assert reopened.last_timestamp("AAA", "1Min") == int(bars["t"][-1])
+
+
+def test_read_time_range_is_memory_mapped(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.append("AAA", "1Min", bars_to_records(make_bars(range(30))))
+    store.flush("1Min")
+    window = store.read("AAA", "1Min", "2024-01-02T14:10:00Z", "2024-01-02T14:19:00Z")
+    assert len(window) == 10
+    assert isinstance(window, np.memmap)
+    assert window["volume"][0] == 110
+    assert len(store.read("BBB", "1Min")) == 0
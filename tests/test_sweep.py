@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from apps.worker.features import FeatureParams, compute_feature_panel, session_starts
+from apps.worker.research import evaluate_fold, run_walk_forward
+from apps.worker.sweep import ArrayCache, ParameterSweep, expand_grid
+
+
+def make_panel(total=600, symbols=6, seed=2):
+    rng = np.random.default_rng(seed)
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.01, (total, symbols)), axis=0))
+    return {
+        "t": np.arange(total, dtype=np.int64) * 60 * 10**9,
+        "open": close,
+        "high": close * 1.002,
+        "low": close * 0.998,
+        "close": close,
+        "volume": rng.uniform(100, 1000, (total, symbols)),
+    }
+
+
+def test_array_cache_evicts_least_recently_used():
+    cache = ArrayCache(max_bytes=200)
+    cache.get_or_compute("a", lambda: np.zeros(10))
+    cache.get_or_compute("b", lambda: np.zeros(10))
+    cache.get_or_compute("a", lambda: np.zeros(10))
+    cache.get_or_compute("c", lambda: np.zeros(10))
+    assert cache.hits == 1
+    assert cache.used_bytes <= 200
+    cache.get_or_compute("a", lambda: np.zeros(10))
+    assert cache.hits == 2
+
+
+def test_sweep_reuses_features_and_matches_walk_forward():
+    panel = make_panel()
+    grid = {"quantile": [0.9, 0.95, 0.99], "ma_fast": [5, 10]}
+    sweep = ParameterSweep(panel, train_window=200, val_window=50, step=50)
+    result = sweep.run(grid)
+    assert len(result.points) == len(expand_grid(grid)) == 6
+    # Both feature panels the grid needed are still cached: asking again only adds hits.
+    hits, misses = sweep.cache.hits, sweep.cache.misses
+    for ma_fast in grid["ma_fast"]:
+        sweep.features(FeatureParams(ma_fast=ma_fast))
+    assert (sweep.cache.hits, sweep.cache.misses) == (hits + 2, misses)
+
+    params = result.best.parameters
+    feature_params = FeatureParams(ma_fast=params["ma_fast"])
+    arrays = {
+        "close": panel["close"],
+        "features": compute_feature_panel(
+            panel["open"], panel["high"], panel["low"], panel["close"], panel["volume"],
+            session_starts(panel["t"]), feature_params,
+        ),
+    }
+    direct = run_walk_forward(arrays, 200, 50, 50, params, evaluate=evaluate_fold, max_workers=0)
+    assert direct.metrics == result.best.metrics
+    assert direct.holdout_metrics == result.holdout_metrics
+
+
+def test_sweep_rejects_unknown_keys():
+    sweep = ParameterSweep(make_panel(), train_window=200, val_window=50, step=50)
+    with pytest.raises(ValueError, match="bogus"):
+        sweep.run({"quantile": [0.9], "bogus": [1, 2]})
+
+
+def test_sweep_gates_on_certainty_and_simulates_brackets():
+    sweep = ParameterSweep(make_panel(), train_window=200, val_window=50, step=50)
+    ungated = sweep.run({"quantile": [0.9]}).best.metrics
+    points = sweep.run({"quantile": [0.9], "c_min": [0.0, 1.1]}).points
+    gated = {point.parameters["c_min"]: point.metrics for point in points}
+    assert gated[0.0] == ungated
+    assert gated[1.1]["trades"] == 0
+
+    points = sweep.run({"quantile": [0.9], "stop_mult": [0.5, 3.0], "target_mult": [1.0, 2.0]}).points
+    metrics = [point.metrics for point in points]
+    assert len(points) == 4 and all(item["trades"] > 0 for item in metrics)
+    assert len({(item["sharpe"], item["win_rate"]) for item in metrics}) == 4
@@ -0,0 +1,38 @@
+import random
+
+from apps.worker.universe import UniverseBuilder, UniverseEntry
+
+
+def test_build_universe_matches_sorted_filter():
+    rng = random.Random(3)
+    raw = [
+        UniverseEntry(f"T{i}", rng.choice([1e6, rng.uniform(0, 1e9)]), rng.uniform(1, 600), 0.01)
+        for i in range(5000)
+    ]
+    expected = sorted(
+        (entry for entry in raw if 2 <= entry.last_price <= 500),
+        key=lambda item: item.avg_dollar_volume,
+        reverse=True,
+    )[:2000]
+    builder = UniverseBuilder()
+    assert [e.ticker for e in builder.build_universe(raw)] == [e.ticker for e in expected]
+
+
+def test_update_universe_returns_delta():
+    builder = UniverseBuilder(size=2)
+    builder.build_universe(
+        [
+            UniverseEntry("AAA", 300, 10, 0.01),
+            UniverseEntry("BBB", 200, 10, 0.01),
+            UniverseEntry("CCC", 100, 10, 0.01),
+        ]
+    )
+    delta = builder.update_universe([UniverseEntry("CCC", 400, 10, 0.01)], delisted=["AAA"])
+    assert delta.added == ["CCC"]
+    assert delta.removed == ["AAA"]
+    assert delta.unchanged == ["BBB"]
+    assert [entry.ticker for entry in builder.universe] == ["CCC", "BBB"]
+
+    delta = builder.update_universe([UniverseEntry("BBB", 200, 900, 0.01)])
+    assert delta.removed == ["BBB"]
+    assert [entry.ticker for entry in builder.universe] == ["CCC"]
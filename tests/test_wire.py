@@ -0,0 +1,108 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+
+from apps.api.feed import SnapshotFeed
+from apps.api.hub import BroadcastHub
+from apps.api.snapshots import create_snapshot_store
+from apps.shared.wire_schema import FULL, decode, encode_full
+from apps.worker.wire import MemoryTransport, SnapshotPublisher, table_from_records
+
+STAMP = datetime(2024, 1, 2, 15, 30, tzinfo=timezone.utc)
+
+
+def candidates(count: int, ev: float = 0.1) -> list:
+    return [
+        {
+            "ticker": f"T{i:04d}",
+            "side": "buy",
+            "entry_hint": 10.0 + i,
+            "stop": 9.5 + i,
+            "target": 11.0 + i,
+            "ev": ev,
+            "certainty": 0.6,
+            "rationale": ["volume surge"],
+            "timestamp": STAMP,
+        }
+        for i in range(count)
+    ]
+
+
+def test_full_frame_round_trip_is_compact():
+    records = candidates(2000)
+    frame = encode_full("candidates", 7, table_from_records(records))
+    decoded = decode(frame)
+    assert decoded.kind == FULL and decoded.seq == 7
+    assert decoded.data["ticker"][1999] == "T1999"
+    np.testing.assert_array_equal(decoded.data["entry_hint"], 10.0 + np.arange(2000))
+    assert decoded.data["timestamp"][0] == np.datetime64("2024-01-02T15:30:00", "us")
+    assert len(frame) < len(json.dumps(records, default=str)) / 2
+
+
+def test_publisher_deltas_feed_api_snapshots_and_hub():
+    async def scenario():
+        transport = MemoryTransport()
+        publisher = SnapshotPublisher(transport, full_every=100)
+        store = create_snapshot_store()
+        hub = BroadcastHub()
+        feed = SnapshotFeed(store, hub)
+        frames = transport.frames()
+
+        book = candidates(10)
+        await publisher.publish("candidates", book)
+        assert feed.apply(await frames.__anext__())
+
+        book[3] = dict(book[3], ev=0.9)
+        delta = await publisher.publish("candidates", book[:-1])
+        assert len(delta) < 400
+        assert feed.apply(await frames.__anext__())
+        assert await publisher.publish("candidates", book[:-1]) is None
+
+        await publisher.publish("candidates", book[:-2])
+        await frames.__anext__()
+        book[4] = dict(book[4], ev=0.5)
+        await publisher.publish("candidates", book[:-2])
+        assert not feed.apply(await frames.__anext__())
+
+        await publisher.publish("risk", {"equity": 1000.0, "gross_exposure": 0.5, "max_positions": 10,
+                                         "daily_loss_limit": 0.03, "drawdown_limit": 0.1,
+                                         "circuit_breaker_tripped": False})
+        assert feed.apply(await frames.__anext__())
+        return store, hub, feed
+
+    store, hub, feed = asyncio.run(scenario())
+    served = json.loads(store.get("candidates").body)
+    assert len(served) == 9 and served[3]["ev"] == 0.9 and served[4]["ev"] == 0.1
+    assert served[0]["timestamp"].startswith("2024-01-02T15:30:00")
+    assert hub.candidates.items["T0003"]["ev"] == 0.9 and "T0009" not in hub.candidates.items
+    assert feed.gaps == 1
+    assert json.loads(store.get("risk").body)["equity"] == 1000.0
+
+
+def test_worker_frames_round_trip_through_api_feed():
+    # Encoded by the worker's publisher, decoded by the API's feed: both sides must agree on the schema.
+    async def scenario():
+        transport = MemoryTransport()
+        publisher = SnapshotPublisher(transport)
+        store = create_snapshot_store()
+        feed = SnapshotFeed(store, BroadcastHub())
+        frames = transport.frames()
+        book = candidates(4)
+        await publisher.publish("candidates", book)
+        feed.apply(await frames.__anext__())
+        book[1] = dict(book[1], certainty=0.75)
+        await publisher.publish("candidates", book[:3])
+        delta = await frames.__anext__()
+        assert decode(delta).removed == ("T0003",)
+        assert feed.apply(delta)
+        return store, book[:3]
+
+    store, expected = asyncio.run(scenario())
+    served = {record["ticker"]: record for record in json.loads(store.get("candidates").body)}
+    assert sorted(served) == [record["ticker"] for record in expected]
+    for record in expected:
+        got = served[record["ticker"]]
+        assert datetime.fromisoformat(got.pop("timestamp").replace("Z", "+00:00")) == record["timestamp"]
+        assert got == {name: value for name, value in record.items() if name != "timestamp"}